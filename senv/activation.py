@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Mapping, NamedTuple, Optional
+
+from pydantic import BaseSettings, Field
+
+from senv.utils import atomic_write
+
+# prints the environment of the process activated by `conda run`
+_DUMP_ENVIRON_SCRIPT = "import json, os; print(json.dumps(dict(os.environ)))"
+# variables the shells change on their own, they are not part of the activation
+_SHELL_VARS = {"_", "SHLVL", "PWD", "OLDPWD"}
+# variables of the conda environments activated in the caller (CONDA_PREFIX_1...)
+_ACTIVE_ENV_VARS = (
+    "CONDA_PREFIX",
+    "CONDA_DEFAULT_ENV",
+    "CONDA_PROMPT_MODIFIER",
+    "CONDA_SHLVL",
+)
+# variables conda needs to run, the rest of the caller's environment is left out
+# of the capture so every variable the activation sets is recorded
+_CAPTURE_VARS = {
+    "PATH",
+    "HOME",
+    "USER",
+    "LOGNAME",
+    "SHELL",
+    "LANG",
+    "TMPDIR",
+    "TEMP",
+    "TMP",
+    "SYSTEMROOT",
+    "SYSTEMDRIVE",
+    "WINDIR",
+    "COMSPEC",
+    "PATHEXT",
+    "USERPROFILE",
+    "APPDATA",
+    "LOCALAPPDATA",
+    "PROGRAMDATA",
+}
+_CAPTURE_VAR_PREFIXES = ("LC_", "CONDA_")
+
+
+class ActivationCacheSettings(BaseSettings):
+    PATH: Path = Field(Path.home() / ".senv" / "cache" / "activation")
+
+    class Config:
+        env_prefix = "SENV_ACTIVATION_CACHE_"
+
+
+class Activation(NamedTuple):
+    """
+    What activating a conda environment changes in the process environment
+    """
+
+    # directories added to PATH, in order
+    path_entries: List[str]
+    set_vars: Dict[str, str]
+    unset_vars: List[str]
+
+    @classmethod
+    def from_environs(
+        cls, environ: Mapping[str, str], activated_environ: Mapping[str, str]
+    ) -> "Activation":
+        """
+        :param environ: environ the activation was captured from, the variables the
+            activation sets to the value they already had in it are not recorded
+
+        >>> Activation.from_environs({"PATH": "/bin", "A": "1"}, {"PATH": "/env/bin:/bin", "B": "2"})
+        Activation(path_entries=['/env/bin'], set_vars={'B': '2'}, unset_vars=['A'])
+        """
+        path = environ.get("PATH", "").split(os.pathsep)
+        activated_path = activated_environ.get("PATH", "").split(os.pathsep)
+        return cls(
+            path_entries=[p for p in activated_path if p not in path],
+            set_vars={
+                k: v
+                for k, v in activated_environ.items()
+                if k != "PATH" and k not in _SHELL_VARS and environ.get(k) != v
+            },
+            unset_vars=sorted(
+                k
+                for k in environ
+                if k not in activated_environ and k not in _SHELL_VARS
+            ),
+        )
+
+    def apply(self, environ: Mapping[str, str]) -> Dict[str, str]:
+        """
+        :return: a copy of environ with the activation applied. The PATH of environ
+            is kept after the env directories, so it can change after the activation is cached
+        """
+        activated_environ = {
+            k: v for k, v in environ.items() if k not in self.unset_vars
+        }
+        activated_environ.update(self.set_vars)
+        path = environ.get("PATH")
+        activated_environ["PATH"] = os.pathsep.join(
+            self.path_entries + ([path] if path else [])
+        )
+        return activated_environ
+
+
+def prefix_path_entries(prefix: Path) -> List[str]:
+    """
+    :return: the directories the activation of a conda env adds to PATH
+    """
+    if sys.platform == "win32":
+        entries = ["Library/mingw-w64/bin", "Library/usr/bin", "Library/bin", "Scripts"]
+        return [str(prefix)] + [str(prefix / e) for e in entries + ["bin"]]
+    return [str(prefix / "bin")]
+
+
+def _normalize_path_entry(entry: str) -> str:
+    return os.path.normcase(os.path.normpath(entry))
+
+
+def deactivated_environ(environ: Mapping[str, str], prefix: Path) -> Dict[str, str]:
+    """
+    :return: environ without the conda envs activated in it (and without prefix in PATH),
+        so the captured activation does not depend on where senv runs
+
+    >>> environ = {"PATH": os.pathsep.join(["/other/bin", "/usr/bin"]), "CONDA_PREFIX": "/other", "SHLVL": "2"}
+    >>> deactivated_environ(environ, Path("/env")) == {"PATH": "/usr/bin"}
+    True
+    """
+    active_prefixes = [prefix] + [
+        Path(v) for k, v in environ.items() if k.startswith("CONDA_PREFIX")
+    ]
+    active_entries = {
+        _normalize_path_entry(e)
+        for p in active_prefixes
+        for e in prefix_path_entries(p)
+    }
+    deactivated = {
+        k: v
+        for k, v in environ.items()
+        if k not in _SHELL_VARS and not k.startswith(_ACTIVE_ENV_VARS)
+    }
+    if "PATH" in environ:
+        deactivated["PATH"] = os.pathsep.join(
+            p
+            for p in environ["PATH"].split(os.pathsep)
+            if _normalize_path_entry(p) not in active_entries
+        )
+    return deactivated
+
+
+def capture_environ(environ: Mapping[str, str], prefix: Path) -> Dict[str, str]:
+    """
+    :return: the deactivated environ with only the variables conda needs to run, so the
+        activation does not depend on the caller's variables and records all the ones it sets
+
+    >>> environ = {"PATH": "/usr/bin", "HOME": "/home/me", "LC_ALL": "C", "EDITOR": "vim"}
+    >>> capture_environ(environ, Path("/env")) == {"PATH": "/usr/bin", "HOME": "/home/me", "LC_ALL": "C"}
+    True
+    """
+    return {
+        k: v
+        for k, v in deactivated_environ(environ, prefix).items()
+        if k in _CAPTURE_VARS or k.startswith(_CAPTURE_VAR_PREFIXES)
+    }
+
+
+def _activation_key(conda_path: Path, prefix: Path) -> str:
+    """
+    Every install or removal in the env is recorded in conda-meta/history, so
+    the activation scripts (etc/conda/activate.d) can only change when its mtime changes
+    """
+    history_path = prefix / "conda-meta" / "history"
+    try:
+        history_mtime_ns = history_path.stat().st_mtime_ns
+    except OSError:
+        history_mtime_ns = None
+    key = dict(conda_path=str(conda_path), prefix=str(prefix), history=history_mtime_ns)
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def capture_activation(conda_path: Path, prefix: Path) -> Activation:
+    """
+    Activates the env once through `conda run` and records what changed
+    """
+    environ = capture_environ(os.environ, prefix)
+    output = subprocess.check_output(
+        [
+            str(conda_path),
+            "run",
+            "--prefix",
+            str(prefix),
+            sys.executable,
+            "-c",
+            _DUMP_ENVIRON_SCRIPT,
+        ],
+        env=environ,
+    )
+    # conda run may print its own messages before the output of the script
+    activated_environ = json.loads(output.decode().strip().splitlines()[-1])
+    return Activation.from_environs(environ, activated_environ)
+
+
+def get_activation(
+    conda_path: Path, prefix: Path, settings: Optional[ActivationCacheSettings] = None
+) -> Activation:
+    """
+    :return: the cached activation of the env, captured again when the env changes
+    """
+    settings = settings or ActivationCacheSettings()
+    cache_path = settings.PATH / f"{_activation_key(conda_path, prefix)}.json"
+    try:
+        return Activation(**json.loads(cache_path.read_text()))
+    except (OSError, ValueError, TypeError):
+        pass
+
+    activation = capture_activation(conda_path, prefix)
+    # the cache is only an optimization
+    atomic_write(cache_path, json.dumps(activation._asdict()), best_effort=True)
+    return activation
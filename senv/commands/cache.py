@@ -0,0 +1,31 @@
+from typing import List
+
+import typer
+
+from senv.command_lambdas import get_conda_channels, get_conda_platforms
+from senv.conda_info import get_pkgs_dirs
+
+app = typer.Typer(add_completion=False)
+
+
+@app.command(
+    short_help="Downloads the repodata of the conda channels to the shared cache",
+    help="""
+    Downloads the repodata of every channel and platform (plus noarch) once, using conditional requests
+    so unchanged repodata is not downloaded again.
+    The cache is shared by all the projects and used by the solves of `senv env lock` and `senv package lock`
+    """,
+)
+def warm(
+    platforms: List[str] = typer.Option(
+        get_conda_platforms,
+        case_sensitive=False,
+        help="conda platforms, for example osx-64 or linux-64",
+    ),
+    conda_channels: List[str] = typer.Option(get_conda_channels),
+):
+    from senv.repodata_cache import warm_repodata_for_solves
+
+    results = warm_repodata_for_solves(conda_channels, platforms, get_pkgs_dirs()[0])
+    updated = len([r for r in results if r.status == "updated"])
+    typer.echo(f"{len(results)} repodata files warmed, {updated} updated")
@@ -1,23 +1,43 @@
 import os.path
 import subprocess
+import sys
 from os import environ
 import shlex
-from typing import List
+from pathlib import Path
+from typing import Dict, List, Optional
 
 import typer
 
 from senv.command_lambdas import get_conda_platforms, get_default_env_build_system
+from senv.conda_info import get_env_prefix, get_pkgs_dirs
+from senv.commands.lock import check_lock_file, check_lock_option
+from senv.lock_file import lock_source_hash, write_combined_lock
 from senv.log import log
+from senv.package_metadata import diff_installed_records, read_installed_records
 from senv.pyproject import BuildSystem, PyProject
-from senv.pyproject_to_conda import (
-    generate_combined_conda_lock_file,
-    pyproject_to_conda_env_dict,
-)
-from senv.shell import spawn_shell
-from senv.utils import cd
+from senv.utils import cd, cd_tmp_dir, get_current_platform, spawn_detached
+
+# heavy modules (conda_lock, requests, pexpect...) are imported in the commands using them,
+# so `senv --help` and the shell completion start fast
 
 app = typer.Typer(add_completion=False)
 
+DEFAULT_MAX_DOWNLOADS = 8
+
+force_lock_option = typer.Option(
+    False,
+    "--force",
+    help="Solve all the platforms, even the ones whose dependencies did not change"
+    " or were already solved by other projects",
+)
+
+current_platform_first_option = typer.Option(
+    False,
+    "--current-platform-first",
+    help="(Conda only) If there is no lock file, lock only the current platform"
+    " and install it right away, the other platforms are locked in the background",
+)
+
 
 @app.command(
     short_help="Install the dependencies and the dev-dependencies in a virtual environment",
@@ -27,17 +47,25 @@ app = typer.Typer(add_completion=False)
     You can configure where the lock files will be stored with the key `tools.senv.env.env-lock-dir
     """,
 )
-def install(build_system: BuildSystem = typer.Option(get_default_env_build_system)):
-    sync(build_system=build_system)
+def install(
+    build_system: BuildSystem = typer.Option(get_default_env_build_system),
+    current_platform_first: bool = current_platform_first_option,
+):
+    sync(build_system=build_system, current_platform_first=current_platform_first)
 
 
 @app.command(
     short_help="Updates the lock files and install the dependencies in your env",
     help="""
-    Updates the lock files and install the dependencies in your env based on the constrains defined in the pyproject.toml
+    Updates the lock files and install the dependencies in your env based on the constrains defined in the pyproject.toml.
+    If packages are given, only those packages (and the locked packages depending on them) are updated,
+    the rest keep their locked versions
     """,
 )
 def update(
+    packages: Optional[List[str]] = typer.Argument(
+        None, help="Only update these packages"
+    ),
     build_system: BuildSystem = typer.Option(get_default_env_build_system),
     platforms: List[str] = typer.Option(
         get_conda_platforms,
@@ -45,12 +73,20 @@ def update(
         help="conda platforms, for example osx-64 or linux-64",
     ),
 ):
+    packages = packages or []
     if build_system == BuildSystem.POETRY:
         with cd(PyProject.get().config_path.parent):
-            subprocess.check_call([PyProject.get().poetry_path, "update"])
+            subprocess.check_call([PyProject.get().poetry_path, "update", *packages])
     elif build_system == BuildSystem.CONDA:
-        lock(build_system=build_system, platforms=platforms)
-        sync(build_system=build_system)
+        if len(packages) > 0:
+            _lock_updating_packages(platforms, packages)
+        else:
+            # updating always solves again, the previous lock and the cached solves
+            # would keep the old versions of the packages
+            lock(
+                build_system=build_system, platforms=platforms, force=True, check=False
+            )
+        sync(build_system=build_system, current_platform_first=False)
 
     else:
         raise NotImplementedError()
@@ -62,22 +98,118 @@ def update(
     Syncs the current env with the lock files. Installs the missing dependencies and removes the ones that are not in the lock file
     """,
 )
-def sync(build_system: BuildSystem = typer.Option(get_default_env_build_system)):
+def sync(
+    build_system: BuildSystem = typer.Option(get_default_env_build_system),
+    current_platform_first: bool = current_platform_first_option,
+):
     c = PyProject.get()
     if build_system == BuildSystem.POETRY:
         with cd(c.config_path.parent):
             subprocess.check_call([c.poetry_path, "install", "--remove-untracked"])
     elif build_system == BuildSystem.CONDA:
         if not c.env.conda_lock_path.exists():
-            log.info("No lock file found, locking environment now")
-            lock(build_system=build_system, platforms=get_conda_platforms())
-        with c.env.platform_conda_lock as lock_file:
+            platforms = get_conda_platforms()
+            current_platform = get_current_platform()
+            if (
+                current_platform_first
+                and current_platform in platforms
+                and len(platforms) > 1
+            ):
+                log.info(f"No lock file found, locking {current_platform} now")
+                lock(
+                    build_system=build_system,
+                    platforms=[current_platform],
+                    force=False,
+                    check=False,
+                )
+                _lock_in_background()
+            else:
+                log.info("No lock file found, locking environment now")
+                lock(
+                    build_system=build_system,
+                    platforms=platforms,
+                    force=False,
+                    check=False,
+                )
+        prefix = get_env_prefix(c.env.name)
+        if prefix is None:
+            _fetch(c.env.platform_tar_links, max_downloads=DEFAULT_MAX_DOWNLOADS)
+            with c.env.platform_conda_lock as lock_file:
+                result = subprocess.run(
+                    [
+                        str(c.conda_path),
+                        "create",
+                        "--file",
+                        str(lock_file.resolve()),
+                        "--yes",
+                        "--name",
+                        c.env.name,
+                    ]
+                )
+            if result.returncode != 0:
+                raise typer.Abort("Failed syncing environment")
+        else:
+            _sync_existing_conda_env(prefix)
+    else:
+        raise NotImplementedError()
+
+
+def _lock_in_background():
+    """
+    Locks all the platforms in a detached process. The platforms already locked
+    are copied from the lock file, so only the missing ones are solved
+    """
+    c = PyProject.get()
+    log_path = Path.home() / ".senv" / "logs" / f"{c.env.name}-lock.log"
+    spawn_detached(
+        [
+            sys.executable,
+            "-m",
+            "senv.main",
+            "env",
+            "--pyproject-file",
+            str(c.config_path.resolve()),
+            "lock",
+            "--build-system",
+            BuildSystem.CONDA.value,
+        ],
+        log_path,
+    )
+    log.info(
+        f"Locking the other platforms in the background, the output is written to {log_path}"
+    )
+
+
+def _sync_existing_conda_env(prefix: Path):
+    c = PyProject.get()
+    to_remove, to_install = diff_installed_records(
+        read_installed_records(prefix), c.env.platform_tar_links
+    )
+    if len(to_remove) == 0 and len(to_install) == 0:
+        log.info(f"Environment {c.env.name} is already in sync with the lock file")
+        return
+
+    if len(to_remove) > 0:
+        log.info(f"Removing {len(to_remove)} packages")
+        result = subprocess.run(
+            [str(c.conda_path), "remove", "--force", "--yes", "--name", c.env.name]
+            + to_remove
+        )
+        if result.returncode != 0:
+            raise typer.Abort("Failed syncing environment")
+
+    if len(to_install) > 0:
+        _fetch(to_install, max_downloads=DEFAULT_MAX_DOWNLOADS)
+        log.info(f"Installing {len(to_install)} packages")
+        with cd_tmp_dir() as tmp_dir:
+            delta_lock_file = tmp_dir / "delta.lock"
+            delta_lock_file.write_text("@EXPLICIT\n" + "\n".join(to_install))
             result = subprocess.run(
                 [
                     str(c.conda_path),
-                    "create",
+                    "install",
                     "--file",
-                    str(lock_file.resolve()),
+                    str(delta_lock_file),
                     "--yes",
                     "--name",
                     c.env.name,
@@ -85,13 +217,45 @@ def sync(build_system: BuildSystem = typer.Option(get_default_env_build_system))
             )
         if result.returncode != 0:
             raise typer.Abort("Failed syncing environment")
-    else:
-        raise NotImplementedError()
+
+
+def _fetch(tar_links: List[str], max_downloads: int):
+    from senv.package_fetcher import fetch_packages
+
+    summary = fetch_packages(tar_links, get_pkgs_dirs(), max_downloads=max_downloads)
+    if summary.downloaded > 0:
+        log.info(
+            f"Downloaded {summary.downloaded} packages"
+            f" ({summary.downloaded_bytes / 1024 ** 2:.1f} MB)"
+            f" in {summary.seconds:.1f}s, {summary.cached} already cached"
+        )
+
+
+@app.command(
+    short_help="Downloads the packages of the lock file to the conda package cache",
+    help="""
+    Downloads concurrently the packages of the current platform lock file that are not in the conda package cache yet.
+    The md5 of the packages is verified and interrupted downloads are resumed.
+    `senv env sync` fetches the packages before installing them.
+    """,
+)
+def fetch(
+    max_downloads: int = typer.Option(
+        DEFAULT_MAX_DOWNLOADS, help="Maximum number of concurrent downloads"
+    ),
+):
+    _fetch(PyProject.get().env.platform_tar_links, max_downloads=max_downloads)
 
 
 @app.command()
 def shell(build_system: BuildSystem = typer.Option(get_default_env_build_system)):
+    from senv.shell import spawn_shell
+
     c = PyProject.get()
+    if build_system == BuildSystem.CONDA:
+        # only returns if the shell does not support the cached activation
+        _exec_activated_shell()
+
     # conda activate does not work using the conda executable path (I am not sure why)
     # force adding the conda executable to the path and then call it
     environ["PATH"] = f"{c.conda_path.parent}{os.path.pathsep}{environ.get('PATH')}"
@@ -113,6 +277,35 @@ def shell(build_system: BuildSystem = typer.Option(get_default_env_build_system)
     )
 
 
+def _exec_activated_shell():
+    """
+    Starts the user shell sourcing the cached activation of the env,
+    instead of typing `conda activate` in it
+    """
+    from senv.activation import get_activation
+    from senv.shell import activated_shell_command, detect_shell
+
+    shell_name, shell_path = detect_shell()
+    prefix = _get_existing_env_prefix()
+    shell_command = activated_shell_command(
+        shell_name,
+        shell_path,
+        get_activation(PyProject.get().conda_path, prefix),
+        dict(environ),
+    )
+    if shell_command is not None:
+        _exec(*shell_command)
+
+
+def _get_existing_env_prefix() -> Path:
+    c = PyProject.get()
+    prefix = get_env_prefix(c.env.name)
+    if prefix is None:
+        log.error(f"Environment {c.env.name} not found, run `senv env install`")
+        raise typer.Exit(1)
+    return prefix
+
+
 @app.command(
     context_settings={"allow_extra_args": True, "ignore_unknown_options": True}
 )
@@ -124,21 +317,83 @@ def run(
         with cd(PyProject.get().config_path.parent):
             subprocess.check_call(["poetry", "run"] + ctx.args)
     elif build_system == BuildSystem.CONDA:
-        subprocess.check_call(
-            [
-                "conda",
-                "run",
-                "-n",
-                PyProject.get().env.name,
-                "--no-capture-output",
-                "--live-stream",
-            ]
-            + ctx.args
-        )
+        from senv.activation import get_activation
+
+        if len(ctx.args) == 0:
+            raise typer.BadParameter("No command given", param_hint="COMMAND")
+        prefix = _get_existing_env_prefix()
+        activation = get_activation(PyProject.get().conda_path, prefix)
+        activated_environ = activation.apply(environ)
+        _exec(ctx.args, activated_environ)
     else:
         raise NotImplementedError()
 
 
+def _exec(args: List[str], env: Dict[str, str]):
+    """
+    Replaces senv with the command, so signals and the exit code go straight to it
+    """
+    try:
+        if sys.platform == "win32":
+            # windows can not replace the current process
+            raise typer.Exit(subprocess.run(args, env=env).returncode)
+        os.execvpe(args[0], args, env)
+    except FileNotFoundError:
+        log.error(f"Command {args[0]} not found in the environment")
+        # same exit codes as the shells
+        raise typer.Exit(127)
+    except PermissionError:
+        log.error(f"Command {args[0]} is not executable")
+        raise typer.Exit(126)
+
+
+def _lock_updating_packages(platforms: List[str], packages: List[str]):
+    """
+    Locks again pinning all the locked packages except the ones to update
+    and their dependents, so the solves are smaller and the rest of the lock does not move
+    """
+    from senv.lock_index import LockIndex
+    from senv.pyproject_to_conda import (
+        generate_combined_conda_lock_file,
+        pyproject_to_conda_env_dict,
+    )
+    from senv.targeted_update import LockedDependsFinder, build_platform_pins
+
+    c = PyProject.get()
+    if not c.env.conda_lock_path.exists():
+        raise typer.BadParameter(
+            f"No lock file found in {c.env.conda_lock_path}, run `senv env lock` first",
+            param_hint="PACKAGES",
+        )
+    lock_index = LockIndex.from_path(c.env.conda_lock_path)
+    not_locked = [p for p in packages if len(lock_index.query(p)) == 0]
+    if len(not_locked) > 0:
+        raise typer.BadParameter(
+            f"{', '.join(not_locked)} not found in {c.env.conda_lock_path}",
+            param_hint="PACKAGES",
+        )
+
+    prefix = get_env_prefix(c.env.name)
+    get_depends = LockedDependsFinder(
+        get_pkgs_dirs(), [prefix] if prefix is not None else []
+    )
+    platform_pins = build_platform_pins(lock_index, packages, platforms, get_depends)
+    combined_lock = generate_combined_conda_lock_file(
+        platforms, pyproject_to_conda_env_dict(), platform_pins=platform_pins
+    )
+    combined_lock.metadata.source_hash = _env_lock_source_hash()
+    write_combined_lock(combined_lock, c.env.conda_lock_path, c.env.conda_lock_format)
+
+
+def _env_lock_source_hash() -> str:
+    c = PyProject.get()
+    return lock_source_hash(
+        dependencies=c.senv.dependencies,
+        dev_dependencies=c.senv.dev_dependencies,
+        channels=c.senv.conda_channels,
+    )
+
+
 @app.command()
 def lock(
     build_system: BuildSystem = typer.Option(get_default_env_build_system),
@@ -147,17 +402,34 @@ def lock(
         case_sensitive=False,
         help="conda platforms, for example osx-64 or linux-64",
     ),
+    force: bool = force_lock_option,
+    check: bool = check_lock_option,
 ):
     c = PyProject.get()
     if build_system == BuildSystem.POETRY:
         with cd(c.config_path.parent):
-            subprocess.check_call([c.poetry_path, "lock"])
+            poetry_lock_args = ["--check"] if check else []
+            subprocess.check_call([c.poetry_path, "lock", *poetry_lock_args])
     elif build_system == BuildSystem.CONDA:
+        if check:
+            check_lock_file(c.env.conda_lock_path, _env_lock_source_hash(), platforms)
+            return
+
+        from senv.pyproject_to_conda import (
+            generate_combined_conda_lock_file,
+            pyproject_to_conda_env_dict,
+        )
+
         c.env.conda_lock_path.parent.mkdir(exist_ok=True, parents=True)
         combined_lock = generate_combined_conda_lock_file(
             platforms,
             pyproject_to_conda_env_dict(),
+            base_lock_path=None if force else c.env.conda_lock_path,
+            use_solve_cache=not force,
+        )
+        combined_lock.metadata.source_hash = _env_lock_source_hash()
+        write_combined_lock(
+            combined_lock, c.env.conda_lock_path, c.env.conda_lock_format
         )
-        c.env.conda_lock_path.write_text(combined_lock.json(indent=2))
     else:
         raise NotImplementedError()
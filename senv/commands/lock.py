@@ -0,0 +1,180 @@
+import json
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import typer
+
+from senv.lock_file import LockFormat, convert_lock_file, find_stale_lock_reasons
+from senv.log import log
+from senv.pyproject import PyProject
+
+app = typer.Typer(add_completion=False)
+
+lock_file_option = typer.Option(
+    None,
+    "--lock-file",
+    "-l",
+    exists=True,
+    dir_okay=False,
+    help="Combined lock file (by default the env lock file of the project)",
+)
+
+
+check_lock_option = typer.Option(
+    False,
+    "--check",
+    help="Do not lock, only check that the lock file is up to date"
+    " with the pyproject.toml (exits with code 1 if it is not)",
+)
+
+
+def check_lock_file(lock_path: Path, source_hash: str, platforms: Iterable[str]):
+    """
+    Used by the lock commands with --check, exits with code 1 if the lock is stale
+    """
+    reasons = find_stale_lock_reasons(lock_path, source_hash, platforms)
+    if len(reasons) > 0:
+        for reason in reasons:
+            log.error(reason)
+        log.error("Lock file is not up to date, lock it again")
+        raise typer.Exit(1)
+    log.info(f"{lock_path} is up to date")
+
+
+def _lock_file_or_default(lock_file: Optional[Path]) -> Path:
+    if lock_file is not None:
+        return lock_file
+    if not PyProject.is_loaded():
+        raise typer.BadParameter(
+            "No pyproject.toml found, the lock file has to be provided",
+            param_hint="--lock-file",
+        )
+    return PyProject.get().env.conda_lock_path
+
+
+@app.command(
+    short_help="Converts a lock file between the json and the compact formats",
+    help="""
+    Converts losslessly a combined lock file between the json format and the compact format
+    (channels and packages stored once, one package per line).
+    If --format is not given, the output is compact when its name ends with .compact.json
+    """,
+)
+def convert(
+    input_lock: Path = typer.Argument(..., exists=True, dir_okay=False),
+    output_lock: Path = typer.Argument(..., dir_okay=False),
+    lock_format: Optional[LockFormat] = typer.Option(None, "--format"),
+):
+    convert_lock_file(input_lock, output_lock, lock_format)
+    log.info(f"Lock file written in {output_lock.resolve()}")
+
+
+@app.command(
+    short_help="Shows the locked version of packages in every platform",
+    help="""
+    Shows the locked version, build and channel of the packages in every platform of a lock file.
+    Exits with code 1 if any of the packages is not locked in any platform
+    """,
+)
+def query(
+    names: List[str] = typer.Argument(...),
+    lock_file: Optional[Path] = lock_file_option,
+    platforms: Optional[List[str]] = typer.Option(
+        None, "--platform", help="Only show these platforms"
+    ),
+    as_json: bool = typer.Option(False, "--json", help="Print the result as json"),
+):
+    from senv.lock_index import LockIndex
+
+    lock_index = LockIndex.from_path(_lock_file_or_default(lock_file))
+    result = {}
+    for name in names:
+        result[name] = {
+            platform: package
+            for platform, package in lock_index.query(name).items()
+            if not platforms or platform in platforms
+        }
+
+    if as_json:
+        typer.echo(
+            json.dumps(
+                {
+                    name: {p: package.to_dict() for p, package in packages.items()}
+                    for name, packages in result.items()
+                },
+                indent=2,
+            )
+        )
+    else:
+        rows = [
+            [package.name, platform, package.version, package.build, package.channel]
+            for packages in result.values()
+            for platform, package in sorted(packages.items())
+        ]
+        widths = [max([len(r[i]) for r in rows], default=0) for i in range(5)]
+        for row in rows:
+            typer.echo("  ".join(v.ljust(w) for v, w in zip(row, widths)).rstrip())
+
+    missing = [name for name, packages in result.items() if len(packages) == 0]
+    if len(missing) > 0:
+        log.error(f"Packages not found in the lock file: {', '.join(missing)}")
+        raise typer.Exit(1)
+
+
+_CHANGE_SYMBOLS = {
+    "added": "+",
+    "removed": "-",
+    "upgraded": "^",
+    "downgraded": "v",
+    "rebuilt": "~",
+}
+
+
+def _format_change(change) -> str:
+    def version(v, build):
+        return f"{v} ({build})" if build else v
+
+    old = version(change.old_version, change.old_build) if change.old_version else ""
+    new = version(change.new_version, change.new_build) if change.new_version else ""
+    versions = f"{old} -> {new}" if old and new else old or new
+    return f"  {_CHANGE_SYMBOLS[change.kind.value]} {change.name} {versions}"
+
+
+@app.command(
+    short_help="Shows the package changes between two lock files",
+    help="""
+    Shows the added, removed, upgraded, downgraded and rebuilt packages of every platform
+    between two combined lock files (in any format).
+    Changes that happened in all the platforms are shown only once
+    """,
+)
+def diff(
+    old_lock: Path = typer.Argument(..., exists=True, dir_okay=False),
+    new_lock: Path = typer.Argument(..., exists=True, dir_okay=False),
+    as_json: bool = typer.Option(False, "--json", help="Print the result as json"),
+):
+    from senv.lock_diff import diff_lock_indexes
+    from senv.lock_index import LockIndex
+
+    lock_diff = diff_lock_indexes(
+        LockIndex.from_path(old_lock), LockIndex.from_path(new_lock)
+    )
+    if as_json:
+        typer.echo(json.dumps(lock_diff.to_dict(), indent=2))
+        return
+
+    if lock_diff.is_empty:
+        typer.echo("No changes")
+    for platform in lock_diff.added_platforms:
+        typer.echo(f"+ platform {platform}")
+    for platform in lock_diff.removed_platforms:
+        typer.echo(f"- platform {platform}")
+    if len(lock_diff.all_platforms) > 0:
+        typer.echo("all platforms:")
+        for change in lock_diff.all_platforms:
+            typer.echo(_format_change(change))
+    for platform, changes in lock_diff.platforms.items():
+        if len(changes) > 0:
+            typer.echo(f"{platform}:")
+            for change in changes:
+                typer.echo(_format_change(change))
@@ -1,6 +1,8 @@
+import hashlib
 import shutil
 import subprocess
 from pathlib import Path
+from shutil import which
 from typing import List, Optional
 
 import typer
@@ -10,22 +12,30 @@ from senv.command_lambdas import (
     get_conda_platforms,
     get_default_package_build_system,
 )
-from senv.conda_publish import (
-    build_conda_package_from_recipe,
-    generate_app_lock_file_based_on_tested_lock_path,
-    publish_conda,
-)
+from senv.commands.lock import check_lock_file, check_lock_option
+from senv.lock_file import lock_source_hash
 from senv.log import log
 from senv.pyproject import BuildSystem, PyProject
-from senv.pyproject_to_conda import (
-    generate_combined_conda_lock_file,
-    locked_package_to_recipe_yaml,
-    pyproject_to_recipe_yaml,
+from senv.utils import (
+    auto_confirm_yes,
+    build_yes_option,
+    cd,
+    cd_tmp_dir,
+    get_current_platform,
+    tmp_env,
 )
-from senv.utils import auto_confirm_yes, build_yes_option, cd, cd_tmp_dir, tmp_env
 
 app = typer.Typer(add_completion=False)
 
+# heavy modules (conda_lock, requests...) are imported in the commands using them,
+# so `senv --help` and the shell completion start fast
+
+DEFAULT_MAX_UPLOADS = 4
+
+max_uploads_option = typer.Option(
+    DEFAULT_MAX_UPLOADS, help="(Conda only) Maximum number of concurrent uploads"
+)
+
 based_on_tested_lock_file_option = typer.Option(
     None,
     help="Create the lock file with the same direct dependencies"
@@ -40,21 +50,77 @@ based_on_tested_lock_file_option = typer.Option(
 def build_package(
     build_system: BuildSystem = typer.Option(get_default_package_build_system),
     python_version: Optional[str] = None,
+    force: bool = typer.Option(
+        False,
+        "--force",
+        help="Build even if the package was already built from the same sources",
+    ),
 ):
+    from senv.build_cache import (
+        RemoteBuildCache,
+        build_cache_key,
+        cached_build,
+        package_source_files,
+    )
+    from senv.conda_publish import build_conda_package_from_recipe
+    from senv.pyproject_to_conda import pyproject_to_recipe_yaml
+
+    c = PyProject.get()
+    project_dir = c.config_path.parent
+    remote_cache = RemoteBuildCache.from_config()
     # todo add progress bar
     if build_system == BuildSystem.POETRY:
-        with cd(PyProject.get().config_path.parent):
-            subprocess.check_call([PyProject.get().poetry_path, "build"])
+
+        def build():
+            with cd(project_dir):
+                subprocess.check_call([c.poetry_path, "build"])
+
+        key = build_cache_key(
+            recipe="",
+            source_root=project_dir,
+            source_files=package_source_files(c),
+            toolchain=dict(poetry=c.poetry_path),
+            build_system=build_system.value,
+        )
+        cached_build(
+            key,
+            project_dir / "dist",
+            [f"*-{c.version}*"],
+            build,
+            force,
+            remote_cache=remote_cache,
+        )
     elif build_system == BuildSystem.CONDA:
         with tmp_env():
-            meta_path = (
-                PyProject.get().config_path.parent / "conda.recipe" / "meta.yaml"
-            )
+            meta_path = project_dir / "conda.recipe" / "meta.yaml"
             pyproject_to_recipe_yaml(
                 python_version=python_version,
                 output=meta_path,
             )
-            build_conda_package_from_recipe(meta_path, python_version)
+
+            def build():
+                build_conda_package_from_recipe(meta_path, python_version)
+
+            key = build_cache_key(
+                recipe=meta_path.read_text(),
+                source_root=project_dir,
+                source_files=package_source_files(c),
+                toolchain=dict(
+                    conda=c.conda_path, conda_mambabuild=which("conda-mambabuild")
+                ),
+                build_system=build_system.value,
+                python_version=python_version,
+                channels=c.senv.conda_channels,
+                platform=get_current_platform(),
+            )
+            cached_build(
+                key,
+                c.senv.package.conda_build_path,
+                [f"*/{c.package_name}-{c.version}-*.tar.bz2"],
+                build,
+                force,
+                remote_cache=remote_cache,
+            )
     else:
         raise NotImplementedError()
 
@@ -72,10 +138,15 @@ def publish_package(
         ..., "--password", "-p", envvar="SENV_PUBLISHER_PASSWORD"
     ),
     yes: bool = build_yes_option(),
+    max_uploads: int = max_uploads_option,
 ):
+    from senv.conda_publish import publish_conda
+
     with auto_confirm_yes(yes):
         if build:
-            build_package(build_system=build_system, python_version=python_version)
+            build_package(
+                build_system=build_system, python_version=python_version, force=False
+            )
         if build_system == BuildSystem.POETRY:
             with cd(PyProject.get().config_path.parent):
                 repository_url = (
@@ -105,11 +176,32 @@ def publish_package(
                     raise NotImplementedError(
                         "repository_url is required to publish a conda environment. "
                     )
-                publish_conda(username, password, repository_url)
+                publish_conda(
+                    username, password, repository_url, max_uploads=max_uploads
+                )
         else:
             raise NotImplementedError()
 
 
+def _package_lock_source_hash(
+    conda_channels: List[str], based_on_tested_lock_file: Optional[Path]
+) -> str:
+    c = PyProject.get()
+    tested_lock_hash = None
+    if based_on_tested_lock_file is not None:
+        tested_lock_hash = hashlib.sha256(
+            based_on_tested_lock_file.read_bytes()
+        ).hexdigest()
+    return lock_source_hash(
+        package_name=c.package_name,
+        version=c.version,
+        channels=conda_channels,
+        # the direct dependencies are pinned to the versions of the tested lock
+        dependencies=sorted(c.senv.dependencies.keys()),
+        tested_lock_hash=tested_lock_hash,
+    )
+
+
 @app.command(name="lock")
 def lock_app(
     build_system: BuildSystem = typer.Option(get_default_package_build_system),
@@ -125,12 +217,23 @@ def lock_app(
     output: Path = typer.Option(
         lambda: PyProject.get().senv.package.conda_lock_path, "--output", "-o"
     ),
+    check: bool = check_lock_option,
 ):
     c = PyProject.get()
     platforms = platforms
     if build_system == BuildSystem.POETRY:
         raise NotImplementedError()
     elif build_system == BuildSystem.CONDA:
+        source_hash = _package_lock_source_hash(
+            conda_channels, based_on_tested_lock_file
+        )
+        if check:
+            check_lock_file(output, source_hash, platforms)
+            return
+
+        from senv.conda_publish import generate_app_lock_file_based_on_tested_lock_path
+        from senv.pyproject_to_conda import generate_combined_conda_lock_file
+
         output.parent.mkdir(exist_ok=True, parents=True)
         if based_on_tested_lock_file is None:
             combined_lock = generate_combined_conda_lock_file(
@@ -141,7 +244,6 @@ def lock_app(
                     dependencies={c.package_name: f"=={c.version}"},
                 ),
             )
-            output.write_text(combined_lock.json(indent=2))
 
         else:
             combined_lock = generate_app_lock_file_based_on_tested_lock_path(
@@ -150,7 +252,8 @@ def lock_app(
                 platforms=platforms,
             )
 
-            output.write_text(combined_lock.json(indent=2))
+        combined_lock.metadata.source_hash = source_hash
+        output.write_text(combined_lock.json(indent=2))
         log.info(f"Package lock file generated in {output.resolve()}")
     else:
         raise NotImplementedError()
@@ -173,7 +276,11 @@ def publish_locked_package(
         exists=True,
     ),
     yes: bool = build_yes_option(),
+    max_uploads: int = max_uploads_option,
 ):
+    from senv.conda_publish import build_conda_package_from_recipe, publish_conda
+    from senv.pyproject_to_conda import locked_package_to_recipe_yaml
+
     c: PyProject = PyProject.get()
     with auto_confirm_yes(yes):
         if build_system == BuildSystem.POETRY:
@@ -197,6 +304,7 @@ def publish_locked_package(
                         password,
                         repository_url,
                         package_name=c.package_name_locked,
+                        max_uploads=max_uploads,
                     )
         else:
             raise NotImplementedError()
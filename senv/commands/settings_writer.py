@@ -2,7 +2,6 @@ from enum import Enum
 from pathlib import Path
 
 import typer
-from poetry.core.pyproject import PyProjectTOML
 from pydantic import ValidationError
 
 from senv.log import log
@@ -20,6 +19,7 @@ class AllowedConfigKeys(str, Enum):
     CONDA_ENV_LOCK_PATH = "env.conda-lock-path"
     ENV_BUILD_SYSTEM = "env.build-system"
     CONDA_PACKAGE_LOCK_PATH = "package.conda-lock-path"
+    BUILD_CACHE_URL = "package.build-cache-url"
 
 
 CONFIG_KEYS_MULTIPLE = {
@@ -41,6 +41,8 @@ def _validate_toml(toml):
 
 
 def set_config_value_to_pyproject(path: Path, key: str, value: str):
+    from poetry.core.pyproject import PyProjectTOML
+
     pyproject = PyProjectTOML(path)
     toml = pyproject.file.read()
 
@@ -73,6 +75,8 @@ def set_new_setting_value(
 
 
 def remove_config_value_from_pyproject(path: Path, key: str):
+    from poetry.core.pyproject import PyProjectTOML
+
     pyproject = PyProjectTOML(path)
     toml = pyproject.file.read()
 
@@ -0,0 +1,85 @@
+import json
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from senv.log import log
+from senv.pyproject import PyProject
+
+# resolves the channels with conda's own models, so channel_alias, custom_channels,
+# default_channels and the credentials (tokens or user:password) are applied
+_CHANNEL_URLS_SCRIPT = """
+import json, sys
+from conda.models.channel import Channel
+urls = {
+    c: [u.rsplit("/", 1)[0] for u in Channel(c).urls(True, ("noarch",))]
+    for c in json.loads(sys.argv[1])
+}
+print(json.dumps(urls))
+"""
+
+
+@lru_cache(maxsize=None)
+def _conda_info(conda_path: Path) -> Dict[str, Any]:
+    return json.loads(subprocess.check_output([str(conda_path), "info", "--json"]))
+
+
+def get_conda_info() -> Dict[str, Any]:
+    return _conda_info(PyProject.get().conda_path)
+
+
+@lru_cache(maxsize=None)
+def _channel_urls(
+    python: str, channels: Tuple[str, ...]
+) -> Optional[Dict[str, List[str]]]:
+    try:
+        output = subprocess.check_output(
+            [python, "-c", _CHANNEL_URLS_SCRIPT, json.dumps(channels)],
+            stderr=subprocess.PIPE,
+        )
+        return json.loads(output.decode().strip().splitlines()[-1])
+    except (OSError, subprocess.CalledProcessError, ValueError, IndexError) as e:
+        log.debug(f"Unable to resolve the channels with conda: {e}")
+        return None
+
+
+def get_channel_urls(channels: List[str]) -> Optional[Dict[str, List[str]]]:
+    """
+    :return: the urls (with credentials) of every channel as conda resolves them,
+        None if the python of conda can not be used (e.g. with micromamba)
+    """
+    python = get_conda_info().get("sys.executable")
+    if python is None:
+        return None
+    return _channel_urls(python, tuple(channels))
+
+
+def get_pkgs_dirs() -> List[Path]:
+    """
+    :return: the conda package cache directories, the first one is the writable one
+    """
+    return [Path(p) for p in get_conda_info()["pkgs_dirs"]]
+
+
+def _default_envs_dirs() -> List[Path]:
+    # conda executables live in <root>/bin, <root>/condabin or <root>/Scripts
+    conda_root = Path(PyProject.get().conda_path).resolve().parent.parent
+    return [conda_root / "envs", Path.home() / ".conda" / "envs"]
+
+
+def get_env_prefix(env_name: str) -> Optional[Path]:
+    """
+    Looks for the env in the default envs directories before asking conda,
+    as `conda info` is slow compared to the commands that only need the prefix
+    :return: the prefix of the conda environment or None if it does not exist
+    """
+    for envs_dir in _default_envs_dirs():
+        prefix = envs_dir / env_name
+        if (prefix / "conda-meta").is_dir():
+            return prefix
+    for envs_dir in get_conda_info()["envs_dirs"]:
+        prefix = Path(envs_dir) / env_name
+        if (prefix / "conda-meta").is_dir():
+            return prefix
+    return None
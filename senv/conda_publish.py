@@ -1,22 +1,39 @@
 import os
 import subprocess
-from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from shutil import which
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-import requests
 import typer
 from conda_lock.conda_lock import run_lock
-from conda_lock.src_parser.pyproject_toml import normalize_pypi_name
 
+from senv.conda_info import get_env_prefix, get_pkgs_dirs
 from senv.errors import SenvNotAllPlatformsInBaseLockFile
+from senv.lock_file import read_combined_lock
+from senv.lock_index import LockIndex, index_tar_links
 from senv.log import log
+from senv.models import SenvCombinedCondaLock
+from senv.package_uploader import upload_packages
+from senv.noarch_projection import platform_virtual_packages, unsatisfied_spec
+from senv.package_metadata import (
+    file_md5,
+    read_tarball_index,
+    resolve_dependency_closure,
+)
+from senv.pypi_names import normalize_pypi_name
 from senv.pyproject import PyProject
-from senv.pyproject_to_conda import combine_conda_lock_files, create_env_yaml
+from senv.pyproject_to_conda import (
+    combine_conda_lock_files,
+    create_env_yaml,
+    solve_input_hash,
+)
+from senv.repodata_cache import WARM_CACHE_SOLVE_ENV, warm_repodata_for_solves
+from senv.solve_cache import SolveCache, solve_cache_key
+from senv.solve_scheduler import SolveScheduler
+from senv.targeted_update import LockedDependsFinder
 from senvx.errors import SenvxMalformedAppLockFile
 from senvx.main import install_from_lock
-from senvx.models import CombinedCondaLock, LockFileMetaData
+from senvx.models import LockFileMetaData
 from senv.utils import cd_tmp_dir, confirm
 
 
@@ -60,6 +77,7 @@ def publish_conda(
     password: str,
     repository_url: str,
     package_name: Optional[str] = None,
+    max_uploads: int = 4,
 ):
     c = PyProject.get()
     conda_dist = c.senv.package.conda_build_path
@@ -77,23 +95,15 @@ def publish_conda(
     if repository_url.endswith("anaconda.org"):
         return publish_conda_to_anaconda_org(username, password, files_to_upload)
 
-    for tar_path in files_to_upload:
-        package = tar_path.name
-        arch = tar_path.parent.name
-        dest = f"{repository_url}/{arch}/{package}"
-        resp = requests.head(dest)
-        if resp.status_code != 404:
-            log.warning("Object already exists not reuploading...")
-        else:
-            subprocess.check_call(
-                [
-                    "curl",
-                    f"-u{username}:{password}",
-                    "-T",
-                    str(tar_path.resolve()),
-                    dest,
-                ],
-            )
+    summary = upload_packages(
+        files_to_upload, repository_url, username, password, max_uploads=max_uploads
+    )
+    log.info(
+        f"Uploaded {summary.uploaded} packages"
+        f" ({summary.uploaded_bytes / 1024 ** 2:.1f} MB) in {summary.seconds:.1f}s"
+        f" ({summary.megabytes_per_second:.1f} MB/s),"
+        f" {summary.skipped} already published"
+    )
 
 
 def publish_conda_to_anaconda_org(
@@ -113,9 +123,103 @@ def publish_conda_to_anaconda_org(
         subprocess.check_call(["anaconda", "upload", str(file_to_upload.resolve())])
 
 
+def _get_artifact_channel_url() -> Optional[str]:
+    publish_url = PyProject.get().senv.package.conda_publish_url
+    # the anaconda.org channel depends on the user publishing the package
+    if publish_url is None or publish_url.rstrip("/").endswith("anaconda.org"):
+        return None
+    return publish_url.rstrip("/")
+
+
+def _find_built_artifact(platform: str) -> Optional[Path]:
+    c = PyProject.get()
+    for subdir in ("noarch", platform):
+        artifacts = sorted(
+            (c.senv.package.conda_build_path / subdir).glob(
+                f"{c.package_name}-{c.version}-*.tar.bz2"
+            ),
+            key=lambda p: p.stat().st_mtime,
+        )
+        if len(artifacts) > 0:
+            return artifacts[-1]
+    return None
+
+
+def tested_lock_closure(
+    tar_links: List[str],
+    artifact_index: Dict[str, Any],
+    platform: str,
+    get_depends: LockedDependsFinder,
+) -> Optional[List[str]]:
+    """
+    :param tar_links: the tested lock of the platform
+    :param artifact_index: info/index.json of the built package
+    :return: the tar links of the tested lock the built package needs (dev-dependencies
+        are dropped), None if their metadata is unknown or if any of their depends
+        or constrains is not satisfied by the tested lock
+    """
+    packages = index_tar_links(tar_links)
+    closure = resolve_dependency_closure(
+        artifact_index.get("depends", []),
+        set(packages.keys()),
+        lambda name: get_depends(packages[name]),
+    )
+    if closure is None:
+        return None
+    locked = {n: p for n, p in packages.items() if n in closure}
+
+    package_specs = {
+        artifact_index.get("name", "the built package"): (
+            artifact_index.get("depends", []),
+            artifact_index.get("constrains", []),
+        )
+    }
+    for name, package in locked.items():
+        depends, constrains = get_depends(package), get_depends.constrains(package)
+        if depends is None or constrains is None:
+            return None
+        package_specs[name] = (depends, constrains)
+
+    virtual_packages = platform_virtual_packages(platform)
+    for name, (depends, constrains) in package_specs.items():
+        spec = unsatisfied_spec(locked, virtual_packages, depends, constrains)
+        if spec is not None:
+            log.info(f"{name} needs {spec}, not satisfied by the tested lock")
+            return None
+    return [p.tar_link for p in locked.values()]
+
+
+def _lock_platform_without_solving(
+    tar_links: List[str],
+    platform: str,
+    channel_url: str,
+    get_depends: LockedDependsFinder,
+) -> Optional[List[str]]:
+    """
+    Builds the app lock of one platform from the tested lock and the built package
+    :return: the tar links or None if the tested lock can not be used (see tested_lock_closure)
+    """
+    artifact = _find_built_artifact(platform)
+    if artifact is None:
+        return None
+    artifact_index = read_tarball_index(artifact)
+    if artifact_index is None:
+        return None
+
+    closure_tar_links = tested_lock_closure(
+        tar_links, artifact_index, platform, get_depends
+    )
+    if closure_tar_links is None:
+        return None
+    artifact_link = (
+        f"{channel_url}/{artifact.parent.name}/{artifact.name}#{file_md5(artifact)}"
+    )
+    return closure_tar_links + [artifact_link]
+
+
 def generate_app_lock_file_based_on_tested_lock_path(
     lock_path: Path, conda_channels: List[str], platforms: List[str]
-) -> CombinedCondaLock:
+) -> SenvCombinedCondaLock:
     platforms_set = set(platforms)
     c = PyProject.get()
     direct_dependencies_name = {
@@ -124,39 +228,90 @@ def generate_app_lock_file_based_on_tested_lock_path(
     # always include python even if it is not in the dependencies
     direct_dependencies_name.add("python")
 
-    combined_lock = CombinedCondaLock.parse_file(lock_path)
+    combined_lock = read_combined_lock(lock_path)
     combined_lock_platforms_set = set(combined_lock.platform_tar_links.keys())
     if not platforms_set.issubset(combined_lock_platforms_set):
         raise SenvNotAllPlatformsInBaseLockFile(
             platforms_set.difference(combined_lock_platforms_set)
         )
 
+    lock_index = LockIndex(combined_lock.platform_tar_links)
+    platform_dependencies = {}
+    for platform in platforms_set:
+        # add the current package
+        dependencies = {
+            c.package_name: f"=={c.version}",
+        }
+        # pin version for all direct dependencies
+        for dependency_name in direct_dependencies_name:
+            package = lock_index.get(dependency_name, platform)
+            if package is not None:
+                dependencies[package.name] = f"=={package.version}"
+        platform_dependencies[platform] = dependencies
+
+    input_hashes = {
+        platform: solve_input_hash(
+            platform, dict(channels=conda_channels, dependencies=dependencies)
+        )
+        for platform, dependencies in platform_dependencies.items()
+    }
+    platform_tar_links = {}
+    channel_url = _get_artifact_channel_url()
+    if channel_url is not None:
+        env_prefix = get_env_prefix(c.env.name)
+        # the metadata of the packages of the other platforms is in the repodata
+        get_depends = LockedDependsFinder(
+            get_pkgs_dirs(), [env_prefix] if env_prefix is not None else []
+        )
+        for platform in platforms_set:
+            tar_links = _lock_platform_without_solving(
+                combined_lock.platform_tar_links[platform],
+                platform,
+                channel_url,
+                get_depends,
+            )
+            if tar_links is not None:
+                log.info(f"{platform} locked from the tested lock file, skipping solve")
+                platform_tar_links[platform] = tar_links
+
+    solve_cache = SolveCache()
+    cache_keys = {
+        platform: solve_cache_key(input_hash, c.conda_path)
+        for platform, input_hash in input_hashes.items()
+        if platform not in platform_tar_links
+    }
+    platform_tar_links.update(solve_cache.get_many(cache_keys))
+    platforms_to_solve = [p for p in platforms_set if p not in platform_tar_links]
+
     with cd_tmp_dir() as tmp_dir:
-        with ProcessPoolExecutor() as executor:
-            for platform in platforms_set:
-                tar_urls = combined_lock.platform_tar_links[platform]
-                # add the current package
-                dependencies = {
-                    c.package_name: f"=={c.version}",
-                }
-                # pin version for all direct dependencies
-                for line in tar_urls:
-                    channel, dep = line.rsplit("/", 1)
-                    name, version, _ = dep.rsplit("-", 2)
-                    if name.lower() in direct_dependencies_name:
-                        dependencies[name] = f"=={version}"
-                yaml_path = create_env_yaml(
-                    channels=conda_channels,
-                    output=Path(tmp_dir) / "env.yaml",
-                    dependencies=dependencies,
-                )
-                executor.submit(
-                    run_lock,
-                    [yaml_path],
-                    conda_exe=str(c.conda_path.resolve()),
-                    platforms=[platform],
-                )
-        return combine_conda_lock_files(tmp_dir, list(platforms))
+        scheduler = SolveScheduler.from_pyproject(env=WARM_CACHE_SOLVE_ENV)
+        for platform in platforms_to_solve:
+            # each platform gets its own spec file as the solves run concurrently
+            yaml_path = create_env_yaml(
+                channels=conda_channels,
+                output=Path(tmp_dir) / f"env-{platform}.yaml",
+                dependencies=platform_dependencies[platform],
+            )
+            scheduler.submit(
+                platform,
+                run_lock,
+                [yaml_path],
+                conda_exe=str(c.conda_path.resolve()),
+                platforms=[platform],
+            )
+        if len(platforms_to_solve) > 0:
+            warm_repodata_for_solves(
+                conda_channels, platforms_to_solve, get_pkgs_dirs()[0]
+            )
+        scheduler.run()
+        solved_lock = combine_conda_lock_files(tmp_dir, platforms_to_solve)
+
+    for platform, tar_links in solved_lock.platform_tar_links.items():
+        solve_cache.put(cache_keys[platform], tar_links)
+    platform_tar_links.update(solved_lock.platform_tar_links)
+    solved_lock.platform_tar_links = {p: platform_tar_links[p] for p in platforms}
+    solved_lock.metadata.input_hashes = input_hashes
+    return solved_lock
 
 
 def _add_app_lockfile_metadata(lockfile: Path):
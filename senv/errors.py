@@ -1,4 +1,5 @@
-from typing import Set
+from pathlib import Path
+from typing import List, Set
 
 
 class SenvError(Exception):
@@ -33,3 +34,57 @@ class SenvNotAllPlatformsInBaseLockFile(SenvError):
         return (
             f"Missing platforms in base lock file: {', '.join(self.missing_platforms)}"
         )
+
+
+class SenvSolveFailed(SenvError):
+    def __init__(self, platform: str, reason: str):
+        self.platform = platform
+        self.reason = reason
+
+    def __str__(self):
+        return f"Failed solving the dependencies for {self.platform}:\n{self.reason}"
+
+
+class SenvSolveTimeout(SenvSolveFailed):
+    def __init__(self, platform: str, timeout: float):
+        super().__init__(platform, f"Solve took longer than {timeout} seconds")
+        self.timeout = timeout
+
+
+class SenvChecksumMismatch(SenvError):
+    def __init__(self, url: str, expected_md5: str, md5: str):
+        self.url = url
+        self.expected_md5 = expected_md5
+        self.md5 = md5
+
+    def __str__(self):
+        return f"md5 of {self.url} is {self.md5}, expected {self.expected_md5}"
+
+
+class SenvOfflineMissingPackages(SenvError):
+    def __init__(self, tar_links: List[str]):
+        self.tar_links = tar_links
+
+    def __str__(self):
+        missing = "\n".join(self.tar_links)
+        return (
+            f"Offline mode, packages not found in the conda package cache:\n{missing}"
+        )
+
+
+class SenvOfflineMissingRepodata(SenvError):
+    def __init__(self, urls: List[str]):
+        self.urls = urls
+
+    def __str__(self):
+        missing = "\n".join(self.urls)
+        return f"Offline mode, repodata not found in the cache:\n{missing}"
+
+
+class SenvPlatformNotInLockFile(SenvError):
+    def __init__(self, platform: str, lock_path: Path):
+        self.platform = platform
+        self.lock_path = lock_path
+
+    def __str__(self):
+        return f"Platform {self.platform} is not locked in {self.lock_path}"
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from shutil import which
+from typing import Callable, Dict, Optional, Union
+
+from pydantic import BaseSettings, Field
+
+from senv.utils import atomic_write
+
+StrPath = Union[str, Path]
+
+
+class ExecutableCacheSettings(BaseSettings):
+    PATH: Path = Field(Path.home() / ".senv" / "cache" / "executables.json")
+
+    class Config:
+        env_prefix = "SENV_EXECUTABLE_CACHE_"
+
+
+_resolved_executables: Dict[str, Optional[Path]] = {}
+
+
+def _path_env_key() -> str:
+    """
+    Executables are discovered through PATH, adding or removing an executable
+    in one of its directories changes the directory mtime
+    """
+    entries = []
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        entries.append([directory, mtime_ns])
+    return hashlib.sha256(json.dumps(entries).encode()).hexdigest()
+
+
+def _mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_disk_cache(cache_path: Path) -> Dict[str, Dict]:
+    try:
+        return json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_disk_cache(cache_path: Path, cache: Dict[str, Dict]):
+    # the cache is only an optimization
+    atomic_write(cache_path, json.dumps(cache), best_effort=True)
+
+
+def resolve_executable(
+    name: str,
+    finder: Callable[[], Optional[StrPath]],
+    settings: Optional[ExecutableCacheSettings] = None,
+) -> Optional[Path]:
+    """
+    Finds an executable at most once per invocation, the result is also kept on disk
+    and reused by the next invocations while PATH and the executable do not change
+    :param name: name of the executable, used as the cache key
+    :param finder: discovers the executable when it is not cached (can be slow)
+    """
+    if name in _resolved_executables:
+        return _resolved_executables[name]
+
+    settings = settings or ExecutableCacheSettings()
+    path_env_key = _path_env_key()
+    cache = _read_disk_cache(settings.PATH)
+    entry = cache.get(name)
+    if (
+        entry is not None
+        and entry["path_env_key"] == path_env_key
+        and entry["mtime_ns"] == _mtime_ns(Path(entry["path"]))
+    ):
+        executable = Path(entry["path"])
+    else:
+        found = finder()
+        executable = Path(found) if found is not None else None
+        # missing executables are not stored, so installing them is noticed right away
+        if executable is not None:
+            cache[name] = dict(
+                path=str(executable),
+                path_env_key=path_env_key,
+                mtime_ns=_mtime_ns(executable),
+            )
+            _write_disk_cache(settings.PATH, cache)
+
+    _resolved_executables[name] = executable
+    return executable
+
+
+@lru_cache(maxsize=None)
+def validate_executable_path(p: Path, path_env: Optional[str] = None) -> Path:
+    """
+    :param p: absolute path or name of an executable in PATH
+    :param path_env: PATH used to look for the executable (part of the memoization key)
+    :return: the resolved executable path
+    """
+    if not p.exists():
+        resolved_p = which(p, path=path_env)
+        if resolved_p is None:
+            raise ValueError(f"Provided path {p} was not found")
+        else:
+            p = Path(resolved_p).resolve()
+    if not os.access(str(p), os.X_OK):
+        raise ValueError(f"Provided path {p} is not executable")
+    return p
+
+
+def clear_executable_cache():
+    """
+    Forgets the executables resolved by this process
+    """
+    _resolved_executables.clear()
+    validate_executable_path.cache_clear()
+    executable_version.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def executable_version(executable: Optional[Path]) -> Optional[str]:
+    """
+    :return: the output of `<executable> --version`, None if it can not be run
+    """
+    if executable is None:
+        return None
+    try:
+        result = subprocess.run(
+            [str(executable), "--version"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.decode(errors="replace").strip()
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from enum import Enum
+from typing import Dict, List, NamedTuple, Optional
+
+from senv.lock_index import LockedPackage, LockIndex
+from senv.package_metadata import compare_versions
+
+
+class ChangeKind(str, Enum):
+    ADDED = "added"
+    REMOVED = "removed"
+    UPGRADED = "upgraded"
+    DOWNGRADED = "downgraded"
+    REBUILT = "rebuilt"
+
+
+class PackageChange(NamedTuple):
+    kind: ChangeKind
+    name: str
+    old_version: Optional[str] = None
+    new_version: Optional[str] = None
+    old_build: Optional[str] = None
+    new_build: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return dict(self._asdict(), kind=self.kind.value)
+
+
+class LockDiff(NamedTuple):
+    # changes that happened in every platform of both locks
+    all_platforms: List[PackageChange]
+    platforms: Dict[str, List[PackageChange]]
+    added_platforms: List[str]
+    removed_platforms: List[str]
+
+    @property
+    def is_empty(self) -> bool:
+        return not (
+            self.all_platforms
+            or any(self.platforms.values())
+            or self.added_platforms
+            or self.removed_platforms
+        )
+
+    def to_dict(self):
+        return dict(
+            all_platforms=[c.to_dict() for c in self.all_platforms],
+            platforms={
+                p: [c.to_dict() for c in changes]
+                for p, changes in self.platforms.items()
+            },
+            added_platforms=self.added_platforms,
+            removed_platforms=self.removed_platforms,
+        )
+
+
+def _package_change(
+    old: Optional[LockedPackage], new: Optional[LockedPackage]
+) -> Optional[PackageChange]:
+    if old is None:
+        return PackageChange(
+            ChangeKind.ADDED, new.name, new_version=new.version, new_build=new.build
+        )
+    if new is None:
+        return PackageChange(
+            ChangeKind.REMOVED, old.name, old_version=old.version, old_build=old.build
+        )
+    if old.version == new.version and old.build == new.build:
+        return None
+    comparison = compare_versions(new.version, old.version)
+    if comparison > 0:
+        kind = ChangeKind.UPGRADED
+    elif comparison < 0:
+        kind = ChangeKind.DOWNGRADED
+    else:
+        kind = ChangeKind.REBUILT
+    return PackageChange(kind, new.name, old.version, new.version, old.build, new.build)
+
+
+def diff_platform(
+    old_packages: Dict[str, LockedPackage], new_packages: Dict[str, LockedPackage]
+) -> List[PackageChange]:
+    changes = []
+    for name in sorted(old_packages.keys() | new_packages.keys()):
+        change = _package_change(old_packages.get(name), new_packages.get(name))
+        if change is not None:
+            changes.append(change)
+    return changes
+
+
+def _shared_key(change: PackageChange):
+    return change.kind, change.name.lower(), change.old_version, change.new_version
+
+
+def diff_lock_indexes(old: LockIndex, new: LockIndex) -> LockDiff:
+    """
+    Diffs two locks in linear time on the number of packages
+    """
+    common_platforms = [p for p in new.platforms if p in old.platform_packages]
+    platforms = {
+        platform: diff_platform(
+            old.platform_packages[platform], new.platform_packages[platform]
+        )
+        for platform in common_platforms
+    }
+
+    all_platforms = []
+    if len(common_platforms) > 1:
+        shared = set.intersection(
+            *({_shared_key(c) for c in changes} for changes in platforms.values())
+        )
+        builds = defaultdict(set)
+        for changes in platforms.values():
+            for c in changes:
+                builds[_shared_key(c)].add((c.old_build, c.new_build))
+        for change in platforms[common_platforms[0]]:
+            if _shared_key(change) not in shared:
+                continue
+            if len(builds[_shared_key(change)]) > 1:
+                # the builds of the platform specific packages are different
+                change = change._replace(old_build=None, new_build=None)
+            all_platforms.append(change)
+        platforms = {
+            platform: [c for c in changes if _shared_key(c) not in shared]
+            for platform, changes in platforms.items()
+        }
+
+    return LockDiff(
+        all_platforms=all_platforms,
+        platforms=platforms,
+        added_platforms=[p for p in new.platforms if p not in old.platform_packages],
+        removed_platforms=[p for p in old.platforms if p not in new.platform_packages],
+    )
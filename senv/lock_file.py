@@ -0,0 +1,284 @@
+import base64
+import hashlib
+import json
+import re
+from enum import Enum
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from senv.errors import SenvPlatformNotInLockFile
+from senv.models import SenvCombinedCondaLock
+from senv.utils import atomic_write
+
+COMPACT_LOCK_FORMAT_ID = "senv-compact-lock-1"
+_COMPACT_MD5_PREFIX = "b64:"
+_MD5_RE = re.compile(r"^[0-9a-f]{32}$")
+COMPACT_LOCK_SUFFIX = ".compact.json"
+
+
+class LockFormat(str, Enum):
+    JSON = "json"
+    COMPACT = "compact"
+
+
+def infer_lock_format(
+    lock_path: Path, lock_format: Optional[LockFormat] = None
+) -> LockFormat:
+    """
+    >>> infer_lock_format(Path("conda_env.lock.compact.json"))
+    <LockFormat.COMPACT: 'compact'>
+    >>> infer_lock_format(Path("conda_env.lock.json"))
+    <LockFormat.JSON: 'json'>
+    """
+    if lock_format is not None:
+        return LockFormat(lock_format)
+    if lock_path.name.endswith(COMPACT_LOCK_SUFFIX):
+        return LockFormat.COMPACT
+    return LockFormat.JSON
+
+
+def _compact_md5(md5: str) -> str:
+    """
+    Only lowercase hex md5s are compacted, so expanding them gives back the same value
+
+    >>> _compact_md5("8c5f9f0ebd0e4e0d9b1e1fbbc8b6e24a")
+    'b64:jF-fDr0OTg2bHh-7yLbiSg'
+    >>> _compact_md5("8C5F9F0EBD0E4E0D9B1E1FBBC8B6E24A")
+    '8C5F9F0EBD0E4E0D9B1E1FBBC8B6E24A'
+    """
+    if not _MD5_RE.match(md5):
+        # not an md5 (or missing), kept as it is
+        return md5
+    digest = bytes.fromhex(md5)
+    return _COMPACT_MD5_PREFIX + base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def _expand_md5(compact_md5: str) -> str:
+    """
+    >>> _expand_md5("b64:jF-fDr0OTg2bHh-7yLbiSg")
+    '8c5f9f0ebd0e4e0d9b1e1fbbc8b6e24a'
+    >>> _expand_md5("jF-fDr0OTg2bHh-7yLbiSg")
+    'jF-fDr0OTg2bHh-7yLbiSg'
+    """
+    if not compact_md5.startswith(_COMPACT_MD5_PREFIX):
+        return compact_md5
+    compact_md5 = compact_md5[len(_COMPACT_MD5_PREFIX) :]
+    return base64.urlsafe_b64decode(compact_md5 + "==").hex()
+
+
+def split_tar_link(tar_link: str) -> Tuple[str, str, str, str]:
+    """
+    >>> split_tar_link("https://conda.anaconda.org/conda-forge/noarch/click-8.0.1-0.tar.bz2#a1")
+    ('https://conda.anaconda.org/conda-forge', 'noarch', 'click-8.0.1-0.tar.bz2', 'a1')
+    """
+    url, _, md5 = tar_link.partition("#")
+    subdir_url, _, file_name = url.rpartition("/")
+    channel, _, subdir = subdir_url.rpartition("/")
+    return channel, subdir, file_name, md5
+
+
+def encode_compact_lock(lock_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Encodes a combined lock dict with every channel url and package record stored once,
+    the platforms only keep the indexes of their records.
+    Packages shared by several platforms (like the noarch ones) are not repeated
+    """
+    channels: List[str] = []
+    channel_indexes: Dict[str, int] = {}
+    packages: List[List[Union[int, str]]] = []
+    package_indexes: Dict[str, int] = {}
+    platforms = {}
+    for platform, tar_links in lock_dict["platform_tar_links"].items():
+        indexes = []
+        for tar_link in tar_links:
+            if tar_link not in package_indexes:
+                channel, subdir, file_name, md5 = split_tar_link(tar_link)
+                if channel not in channel_indexes:
+                    channel_indexes[channel] = len(channels)
+                    channels.append(channel)
+                package_indexes[tar_link] = len(packages)
+                packages.append(
+                    [channel_indexes[channel], subdir, file_name, _compact_md5(md5)]
+                )
+            indexes.append(package_indexes[tar_link])
+        platforms[platform] = indexes
+
+    return dict(
+        format=COMPACT_LOCK_FORMAT_ID,
+        metadata=lock_dict.get("metadata", {}),
+        channels=channels,
+        packages=packages,
+        platforms=platforms,
+    )
+
+
+def _decode_package(channels: List[str], package: List[Union[int, str]]) -> str:
+    channel_index, subdir, file_name, md5 = package
+    tar_link = f"{channels[channel_index]}/{subdir}/{file_name}"
+    return f"{tar_link}#{_expand_md5(md5)}" if md5 else tar_link
+
+
+def decode_compact_lock(compact_lock: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    :return: the combined lock dict (the regular json lock format) of a compact lock
+    """
+    channels = compact_lock["channels"]
+    tar_links = [_decode_package(channels, p) for p in compact_lock["packages"]]
+    return dict(
+        metadata=compact_lock.get("metadata", {}),
+        platform_tar_links={
+            platform: [tar_links[i] for i in indexes]
+            for platform, indexes in compact_lock["platforms"].items()
+        },
+    )
+
+
+def is_compact_lock(lock_dict: Dict[str, Any]) -> bool:
+    return lock_dict.get("format") == COMPACT_LOCK_FORMAT_ID
+
+
+def load_lock_dict(lock_path: Path) -> Dict[str, Any]:
+    """
+    :return: the combined lock dict of a lock file in any of the supported formats
+    """
+    lock_dict = json.loads(Path(lock_path).read_text())
+    if is_compact_lock(lock_dict):
+        return decode_compact_lock(lock_dict)
+    return lock_dict
+
+
+def read_combined_lock(lock_path: Path) -> SenvCombinedCondaLock:
+    return SenvCombinedCondaLock.parse_obj(load_lock_dict(lock_path))
+
+
+@lru_cache(maxsize=None)
+def _read_platform_tar_links(
+    lock_path: Path, platform: str, mtime_ns: int, size: int
+) -> Tuple[str, ...]:
+    lock_dict = json.loads(lock_path.read_bytes())
+    if is_compact_lock(lock_dict):
+        indexes = lock_dict["platforms"].get(platform)
+        if indexes is None:
+            raise SenvPlatformNotInLockFile(platform, lock_path)
+        channels, packages = lock_dict["channels"], lock_dict["packages"]
+        return tuple(_decode_package(channels, packages[i]) for i in indexes)
+
+    tar_links = lock_dict["platform_tar_links"].get(platform)
+    if tar_links is None:
+        raise SenvPlatformNotInLockFile(platform, lock_path)
+    return tuple(tar_links)
+
+
+def read_platform_tar_links(lock_path: Path, platform: str) -> List[str]:
+    """
+    Reads the tar links of one platform without validating the whole lock file,
+    in the compact format only the packages of the platform are decoded.
+    The result is reused while the lock file does not change
+    """
+    lock_path = Path(lock_path).resolve()
+    stat = lock_path.stat()
+    return list(
+        _read_platform_tar_links(lock_path, platform, stat.st_mtime_ns, stat.st_size)
+    )
+
+
+def lock_source_hash(**inputs: Any) -> str:
+    """
+    Hash of the pyproject.toml values a lock file is generated from.
+    It is computed from the raw values (without conda-lock's pypi to conda name mapping),
+    so checking if a lock is up to date does not need the network
+
+    >>> lock_source_hash(channels=["conda-forge"]) == lock_source_hash(channels=["conda-forge"])
+    True
+    """
+    return hashlib.sha256(
+        json.dumps(inputs, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def find_stale_lock_reasons(
+    lock_path: Path, source_hash: str, platforms: Iterable[str]
+) -> List[str]:
+    """
+    :return: why the lock file is not up to date with the current inputs (empty if it is)
+    """
+    if not lock_path.exists():
+        return [f"{lock_path} does not exist"]
+    lock_dict = json.loads(lock_path.read_bytes())
+    metadata = lock_dict.get("metadata") or {}
+    reasons = []
+    if metadata.get("source_hash") is None:
+        reasons.append(f"{lock_path} was generated by an older version of senv")
+    elif metadata["source_hash"] != source_hash:
+        reasons.append(
+            f"The dependencies or channels changed since {lock_path} was generated"
+        )
+
+    if is_compact_lock(lock_dict):
+        locked_platforms = set(lock_dict["platforms"].keys())
+    else:
+        locked_platforms = set(lock_dict.get("platform_tar_links", {}).keys())
+    missing_platforms = set(platforms).difference(locked_platforms)
+    if len(missing_platforms) > 0:
+        reasons.append(f"Platforms not locked: {', '.join(sorted(missing_platforms))}")
+    return reasons
+
+
+def dump_compact_lock(compact_lock: Dict[str, Any]) -> str:
+    """
+    One package per line, so changing a package only changes a few lines of the file
+    """
+
+    def dumps(value) -> str:
+        return json.dumps(value, separators=(",", ":"))
+
+    lines = [
+        "{",
+        f'"format":{dumps(compact_lock["format"])},',
+        f'"metadata":{dumps(compact_lock["metadata"])},',
+        f'"channels":{dumps(compact_lock["channels"])},',
+        '"packages":[',
+        ",\n".join(dumps(p) for p in compact_lock["packages"]),
+        "],",
+        '"platforms":{',
+        ",\n".join(
+            f"{dumps(platform)}:{dumps(indexes)}"
+            for platform, indexes in compact_lock["platforms"].items()
+        ),
+        "}",
+        "}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write_combined_lock(
+    combined_lock: SenvCombinedCondaLock,
+    lock_path: Path,
+    lock_format: Optional[LockFormat] = None,
+):
+    """
+    :param lock_format: format of the lock file, if None it is inferred from lock_path
+    """
+    lock_format = infer_lock_format(lock_path, lock_format)
+    if lock_format == LockFormat.COMPACT:
+        lock_dict = json.loads(combined_lock.json())
+        content = dump_compact_lock(encode_compact_lock(lock_dict))
+    else:
+        content = combined_lock.json(indent=2)
+    atomic_write(lock_path, content)
+
+
+def convert_lock_file(
+    input_path: Path, output_path: Path, lock_format: Optional[LockFormat] = None
+):
+    """
+    Converts losslessly a lock file between the json and the compact formats
+    """
+    lock_dict = load_lock_dict(input_path)
+    lock_format = infer_lock_format(output_path, lock_format)
+    if lock_format == LockFormat.COMPACT:
+        content = dump_compact_lock(encode_compact_lock(lock_dict))
+    else:
+        content = json.dumps(lock_dict, indent=2)
+    atomic_write(output_path, content)
@@ -0,0 +1,84 @@
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from senv.lock_file import load_lock_dict, split_tar_link
+from senv.package_metadata import dist_name
+
+
+class LockedPackage(NamedTuple):
+    name: str
+    version: str
+    build: str
+    channel: str
+    subdir: str
+    md5: str
+    tar_link: str
+
+    @property
+    def file_name(self) -> str:
+        return self.tar_link.split("#", 1)[0].rsplit("/", 1)[1]
+
+    def to_dict(self) -> Dict[str, str]:
+        return dict(
+            version=self.version,
+            build=self.build,
+            channel=self.channel,
+            subdir=self.subdir,
+            md5=self.md5,
+            url=self.tar_link.split("#", 1)[0],
+        )
+
+
+def parse_tar_link(tar_link: str) -> LockedPackage:
+    """
+    >>> parse_tar_link("https://conda.anaconda.org/conda-forge/noarch/click-8.0.1-pyhd8ed1ab_0.tar.bz2#a1")[:6]
+    ('click', '8.0.1', 'pyhd8ed1ab_0', 'https://conda.anaconda.org/conda-forge', 'noarch', 'a1')
+    """
+    channel, subdir, file_name, md5 = split_tar_link(tar_link)
+    name, version, build = dist_name(file_name).rsplit("-", 2)
+    return LockedPackage(name, version, build, channel, subdir, md5, tar_link)
+
+
+def index_tar_links(tar_links: List[str]) -> Dict[str, LockedPackage]:
+    """
+    :return: the locked packages of one platform by their lower case name
+    """
+    packages = (parse_tar_link(t) for t in tar_links)
+    return {p.name.lower(): p for p in packages}
+
+
+class LockIndex:
+    """
+    Locked packages by platform and name, parsed once from a combined lock
+    """
+
+    def __init__(self, platform_tar_links: Dict[str, List[str]]):
+        self.platform_packages: Dict[str, Dict[str, LockedPackage]] = {
+            platform: index_tar_links(tar_links)
+            for platform, tar_links in platform_tar_links.items()
+        }
+
+    @classmethod
+    def from_lock_dict(cls, lock_dict: Dict[str, Any]) -> "LockIndex":
+        return cls(lock_dict["platform_tar_links"])
+
+    @classmethod
+    def from_path(cls, lock_path: Path) -> "LockIndex":
+        return cls.from_lock_dict(load_lock_dict(lock_path))
+
+    @property
+    def platforms(self) -> List[str]:
+        return list(self.platform_packages.keys())
+
+    def get(self, name: str, platform: str) -> Optional[LockedPackage]:
+        return self.platform_packages.get(platform, {}).get(name.lower())
+
+    def query(self, name: str) -> Dict[str, LockedPackage]:
+        """
+        :return: the locked package in every platform that has it
+        """
+        return {
+            platform: packages[name.lower()]
+            for platform, packages in self.platform_packages.items()
+            if name.lower() in packages
+        }
@@ -4,11 +4,10 @@ from textwrap import dedent
 
 import click
 import typer
-from ensureconda import ensureconda
 
-from senv.commands import env, package, settings_writer
+from senv.commands import cache, env, lock, package, settings_writer
 from senv.pyproject import BuildSystem, PyProject
-from senv.utils import auto_confirm_yes, build_yes_option, confirm
+from senv.utils import auto_confirm_yes, build_yes_option, confirm, set_offline
 
 
 class AliasedGroup(click.Group):
@@ -34,7 +33,35 @@ def pyproject_callback(
     chdir(PyProject.get().config_path.parent)
 
 
+def optional_pyproject_callback(
+    pyproject_file: Path = typer.Option(
+        Path(".") / "pyproject.toml", "-f", "--pyproject-file"
+    )
+):
+    """
+    For the commands that can also run outside of a senv project
+    """
+    if pyproject_file.exists():
+        pyproject_callback(pyproject_file)
+
+
 app = typer.Typer(cls=AliasedGroup)
+
+
+@app.callback()
+def main_callback(
+    offline: bool = typer.Option(
+        False,
+        "--offline",
+        envvar="SENV_OFFLINE",
+        help="Only use the cached repodata and packages,"
+        " fail instead of accessing the network",
+    )
+):
+    if offline:
+        set_offline()
+
+
 app.add_typer(
     env.app,
     name="env",
@@ -56,6 +83,20 @@ app.add_typer(
     help="{alias 'p'} build or publish your project",
     callback=pyproject_callback,
 )
+app.add_typer(
+    cache.app,
+    name="cache",
+    no_args_is_help=True,
+    help="Manage the caches shared by all your projects",
+    callback=pyproject_callback,
+)
+app.add_typer(
+    lock.app,
+    name="lock",
+    no_args_is_help=True,
+    help="Inspect and convert lock files",
+    callback=optional_pyproject_callback,
+)
 
 
 def assert_file_does_not_exists(p: Path):
@@ -79,6 +120,8 @@ def init(
     default_build_system: BuildSystem = typer.Option(BuildSystem.CONDA, prompt=True),
     yes: bool = build_yes_option(),
 ):
+    from ensureconda import ensureconda
+
     with auto_confirm_yes(yes):
         # no_pyproject_check()
         conda_exe = ensureconda(no_install=True, micromamba=False, mamba=False)
@@ -134,5 +177,13 @@ _package_command = typer.main.get_command(package.app)
 _package_command.name = "senv package"
 package_command = _package_command
 
+_cache_command = typer.main.get_command(cache.app)
+_cache_command.name = "senv cache"
+cache_command = _cache_command
+
+_lock_command = typer.main.get_command(lock.app)
+_lock_command.name = "senv lock"
+lock_command = _lock_command
+
 if __name__ == "__main__":
     app()
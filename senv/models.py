@@ -0,0 +1,26 @@
+from typing import Dict, Optional
+
+from pydantic import Field
+from senvx.models import CombinedCondaLock, LockFileMetaData
+
+
+class SenvLockFileMetaData(LockFileMetaData):
+    input_hashes: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Content hash of the solve inputs (specs, channels and platform)"
+        " used to lock each platform",
+    )
+    source_hash: Optional[str] = Field(
+        None,
+        description="Hash of the pyproject.toml inputs (dependencies and channels)"
+        " the lock file was generated from, used to check if it is up to date",
+    )
+
+
+class SenvCombinedCondaLock(CombinedCondaLock):
+    """
+    CombinedCondaLock with senv specific metadata.
+    senvx ignores the extra fields, so the lock files stay installable with it
+    """
+
+    metadata: SenvLockFileMetaData = Field(default_factory=SenvLockFileMetaData)
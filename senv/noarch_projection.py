@@ -0,0 +1,181 @@
+from collections.abc import Mapping
+from typing import Callable, Dict, List, NamedTuple, Optional, Set
+
+from senv.lock_index import LockedPackage, index_tar_links
+from senv.log import log
+from senv.package_metadata import resolve_dependency_closure, spec_matches, spec_name
+
+MatchSpecsGetter = Callable[[LockedPackage], Optional[List[str]]]
+
+
+def platform_virtual_packages(platform: str) -> Set[str]:
+    """
+    >>> sorted(platform_virtual_packages("win-64"))
+    ['__archspec', '__win']
+    """
+    if platform.startswith("linux-"):
+        return {"__archspec", "__unix", "__linux", "__glibc"}
+    if platform.startswith("osx-"):
+        return {"__archspec", "__unix", "__osx"}
+    if platform.startswith("win-"):
+        return {"__archspec", "__win"}
+    return {"__archspec"}
+
+
+class NoarchSplit(NamedTuple):
+    python_version: str
+    # names of the packages that have a different build in each platform
+    platform_specific: Set[str]
+    noarch_packages: Dict[str, LockedPackage]
+    # match specs of the packages (and virtual packages) each noarch package depends on
+    noarch_depends: Dict[str, List[str]]
+    # match specs each noarch package constrains
+    noarch_constrains: Dict[str, List[str]]
+
+
+def split_noarch_lock(
+    tar_links: List[str],
+    get_depends: MatchSpecsGetter,
+    get_constrains: Optional[MatchSpecsGetter] = None,
+) -> Optional[NoarchSplit]:
+    """
+    Checks if the lock of one platform can be projected onto the other platforms,
+    that is, if every platform specific package is only there because python needs it
+    :param tar_links: the solved lock of one platform
+    :param get_constrains: the match specs a package constrains (None if unknown),
+        by default the packages do not constrain anything
+    :return: None if the lock has platform specific packages that are not part
+        of the python dependency closure (or their dependencies are unknown)
+    """
+    packages = index_tar_links(tar_links)
+    python = packages.get("python")
+    if python is None:
+        return None
+
+    def get_depends_by_name(name: str) -> Optional[List[str]]:
+        return get_depends(packages[name])
+
+    python_closure = resolve_dependency_closure(
+        ["python"], set(packages.keys()), get_depends_by_name
+    )
+    if python_closure is None:
+        return None
+    platform_specific = {n for n, p in packages.items() if p.subdir != "noarch"}
+    not_projectable = platform_specific.difference(python_closure)
+    if len(not_projectable) > 0:
+        log.info(
+            f"{', '.join(sorted(not_projectable))} are platform specific,"
+            f" solving every platform"
+        )
+        return None
+
+    noarch_packages = {n: p for n, p in packages.items() if p.subdir == "noarch"}
+    noarch_depends = {}
+    noarch_constrains = {}
+    for name, package in noarch_packages.items():
+        depends = get_depends(package)
+        constrains = get_constrains(package) if get_constrains else []
+        if depends is None or constrains is None:
+            return None
+        noarch_depends[name] = depends
+        noarch_constrains[name] = constrains
+    return NoarchSplit(
+        python_version=python.version,
+        platform_specific=platform_specific,
+        noarch_packages=noarch_packages,
+        noarch_depends=noarch_depends,
+        noarch_constrains=noarch_constrains,
+    )
+
+
+def platform_specific_env_dict(env_dict: Dict, split: NoarchSplit) -> Dict:
+    """
+    :return: the env dict with only the python version of the split
+        and the specs of the platform specific packages
+    """
+    dependencies = env_dict.get("dependencies") or []
+    if isinstance(dependencies, Mapping):
+        dependencies = [f"{name} {spec}" for name, spec in dependencies.items()]
+    specs = [f"python =={split.python_version}"] + [
+        d
+        for d in dependencies
+        if spec_name(d) in split.platform_specific and spec_name(d) != "python"
+    ]
+    return dict(env_dict, dependencies=specs)
+
+
+def unsatisfied_spec(
+    locked: Dict[str, LockedPackage],
+    virtual_packages: Set[str],
+    depends: List[str],
+    constrains: List[str],
+) -> Optional[str]:
+    """
+    :return: the first match spec the locked packages do not satisfy
+        (or that can not be checked), None if all of them are satisfied
+    """
+    # the constrains only apply when the package is in the lock
+    specs = [(d, True) for d in depends] + [(c, False) for c in constrains]
+    for spec, required in specs:
+        name = spec_name(spec)
+        if name in virtual_packages:
+            # the versions of the virtual packages depend on the installing machine
+            continue
+        package = locked.get(name)
+        if package is None:
+            if required:
+                return spec
+            continue
+        if not spec_matches(spec, package.version, package.build):
+            return spec
+    return None
+
+
+def project_noarch_lock(
+    split: NoarchSplit,
+    platform: str,
+    platform_specific_tar_links: List[str],
+    get_depends: Optional[MatchSpecsGetter] = None,
+    get_constrains: Optional[MatchSpecsGetter] = None,
+) -> Optional[List[str]]:
+    """
+    :param platform_specific_tar_links: the lock of platform_specific_env_dict in platform
+    :param get_depends: the match specs a package depends on (None if unknown), used to
+        check the platform specific packages against the noarch packages of the split
+    :param get_constrains: the match specs a package constrains (None if unknown)
+    :return: the lock of the platform, the platform specific packages plus
+        the noarch packages of the split. None if the noarch packages
+        are not installable in the platform (a full solve is needed)
+    """
+    packages = index_tar_links(platform_specific_tar_links)
+    python = packages.get("python")
+    if python is None or python.version != split.python_version:
+        return None
+
+    # noarch packages of the platform specific solve (like pip) are replaced by
+    # the ones of the split, as those were solved with the rest of the dependencies
+    locked = {n: p for n, p in packages.items() if n not in split.noarch_packages}
+    locked.update(split.noarch_packages)
+    virtual_packages = platform_virtual_packages(platform)
+
+    package_specs = {
+        name: (split.noarch_depends[name], split.noarch_constrains[name])
+        for name in split.noarch_packages
+    }
+    for name, package in locked.items():
+        if name in split.noarch_packages or get_depends is None:
+            continue
+        depends = get_depends(package)
+        constrains = get_constrains(package) if get_constrains else []
+        if depends is None or constrains is None:
+            log.info(f"Unknown dependencies of {name} in {platform}")
+            return None
+        package_specs[name] = (depends, constrains)
+
+    for name, (depends, constrains) in package_specs.items():
+        spec = unsatisfied_spec(locked, virtual_packages, depends, constrains)
+        if spec is not None:
+            log.info(f"{name} needs {spec}, not satisfied in {platform}")
+            return None
+
+    return [p.tar_link for p in locked.values()]
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+from typing import List, NamedTuple
+
+import requests
+
+from senv.errors import SenvChecksumMismatch, SenvOfflineMissingPackages
+from senv.http_session import build_session
+from senv.log import log
+from senv.package_metadata import dist_name, file_md5
+from senv.utils import is_offline
+
+_CHUNK_SIZE = 1024 * 1024
+_urls_txt_lock = Lock()
+
+
+class FetchSummary(NamedTuple):
+    downloaded: int
+    cached: int
+    downloaded_bytes: int
+    seconds: float
+
+
+def _split_tar_link(tar_link: str):
+    url, _, md5 = tar_link.partition("#")
+    return url, url.rsplit("/", 1)[1], md5
+
+
+def is_package_cached(tar_link: str, pkgs_dirs: List[Path]) -> bool:
+    """
+    :return: True if the package is already in one of the conda package caches,
+        either extracted or as a tarball with the right md5
+    """
+    url, file_name, md5 = _split_tar_link(tar_link)
+    for pkgs_dir in pkgs_dirs:
+        record_path = pkgs_dir / dist_name(file_name) / "info" / "repodata_record.json"
+        if record_path.exists():
+            record_md5 = json.loads(record_path.read_text()).get("md5")
+            if not md5 or record_md5 == md5:
+                return True
+        tar_path = pkgs_dir / file_name
+        if tar_path.exists() and (not md5 or file_md5(tar_path) == md5):
+            return True
+    return False
+
+
+def find_missing_packages(tar_links: List[str], pkgs_dirs: List[Path]) -> List[str]:
+    return [
+        t
+        for t in tar_links
+        if not t.startswith("file:") and not is_package_cached(t, pkgs_dirs)
+    ]
+
+
+def _download(session: requests.Session, tar_link: str, pkgs_dir: Path) -> int:
+    url, file_name, expected_md5 = _split_tar_link(tar_link)
+    tar_path = pkgs_dir / file_name
+    partial_path = pkgs_dir / f"{file_name}.partial"
+
+    md5 = hashlib.md5()
+    headers = {}
+    if partial_path.exists():
+        with partial_path.open("rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                md5.update(chunk)
+        headers["Range"] = f"bytes={partial_path.stat().st_size}-"
+
+    downloaded_bytes = 0
+    with session.get(url, headers=headers, stream=True, timeout=60) as response:
+        # 416 means that the partial download was already complete
+        if response.status_code != 416:
+            response.raise_for_status()
+            if response.status_code == 206:
+                mode = "ab"
+            else:
+                # the server ignored the range, download everything again
+                md5 = hashlib.md5()
+                mode = "wb"
+            with partial_path.open(mode) as f:
+                for chunk in response.iter_content(_CHUNK_SIZE):
+                    md5.update(chunk)
+                    f.write(chunk)
+                    downloaded_bytes += len(chunk)
+
+    if expected_md5 and md5.hexdigest() != expected_md5:
+        partial_path.unlink()
+        raise SenvChecksumMismatch(url, expected_md5, md5.hexdigest())
+    os.replace(partial_path, tar_path)
+    # conda uses urls.txt to know the channel of the tarballs in the package cache
+    with _urls_txt_lock, (pkgs_dir / "urls.txt").open("a") as f:
+        f.write(f"{url}\n")
+    return downloaded_bytes
+
+
+def fetch_packages(
+    tar_links: List[str], pkgs_dirs: List[Path], max_downloads: int = 8
+) -> FetchSummary:
+    """
+    Downloads concurrently the packages that are not in the conda package cache yet
+    :param tar_links: explicit lock tar links (url#md5)
+    :param pkgs_dirs: conda package caches, the packages are downloaded to the first one
+    :param max_downloads: maximum number of concurrent downloads
+    """
+    start = time.monotonic()
+    remote_tar_links = [t for t in tar_links if not t.startswith("file:")]
+    missing_tar_links = find_missing_packages(remote_tar_links, pkgs_dirs)
+    if len(missing_tar_links) > 0 and is_offline():
+        raise SenvOfflineMissingPackages(missing_tar_links)
+    downloaded_bytes = 0
+    if len(missing_tar_links) > 0:
+        log.info(f"Downloading {len(missing_tar_links)} packages")
+        pkgs_dirs[0].mkdir(parents=True, exist_ok=True)
+        with build_session(pool_size=max_downloads) as session, ThreadPoolExecutor(
+            max_workers=max_downloads
+        ) as executor:
+            downloaded_bytes = sum(
+                executor.map(
+                    lambda t: _download(session, t, pkgs_dirs[0]), missing_tar_links
+                )
+            )
+    return FetchSummary(
+        downloaded=len(missing_tar_links),
+        cached=len(remote_tar_links) - len(missing_tar_links),
+        downloaded_bytes=downloaded_bytes,
+        seconds=time.monotonic() - start,
+    )
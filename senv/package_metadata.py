@@ -0,0 +1,282 @@
+import hashlib
+import json
+import re
+import tarfile
+from fnmatch import fnmatchcase
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+CONDA_TARBALL_EXTENSIONS = (".tar.bz2", ".conda")
+
+
+def dist_name(file_name: str) -> str:
+    """
+    >>> dist_name("click-8.0.1-pyhd8ed1ab_0.tar.bz2")
+    'click-8.0.1-pyhd8ed1ab_0'
+    """
+    for extension in CONDA_TARBALL_EXTENSIONS:
+        if file_name.endswith(extension):
+            return file_name[: -len(extension)]
+    return file_name
+
+
+def spec_name(spec: str) -> str:
+    """
+    >>> spec_name("python >=3.6,<4.0")
+    'python'
+    """
+    return spec.split()[0].lower()
+
+
+_VERSION_COMPONENT_RE = re.compile(r"(\d+|[^\d]+)")
+_VERSION_CONSTRAINT_RE = re.compile(r"^(==|!=|<=|>=|~=|<|>|=)?(.*)$")
+
+
+@lru_cache(maxsize=None)
+def _version_components(version: str) -> Tuple[Tuple[Union[int, str], ...], ...]:
+    version = version.lower().replace("-", "_").split("+", 1)[0]
+    epoch, _, version = version.rpartition("!")
+    components = [(int(epoch) if epoch else 0,)]
+    for part in re.split(r"[._]", version):
+        if part.isdigit():
+            components.append((int(part),))
+            continue
+        component = [
+            int(v) if v.isdigit() else v for v in _VERSION_COMPONENT_RE.findall(part)
+        ]
+        # as in conda, "1.1a" is a pre-release of "1.1"
+        if len(component) == 0 or isinstance(component[0], str):
+            component.insert(0, 0)
+        components.append(tuple(component))
+    return tuple(components)
+
+
+def _compare_version_value(a: Union[int, str], b: Union[int, str]) -> int:
+    def rank(v):
+        # dev < any other string < number < post
+        if isinstance(v, int):
+            return 2
+        return {"dev": 0, "post": 3}.get(v, 1)
+
+    if rank(a) != rank(b):
+        return -1 if rank(a) < rank(b) else 1
+    return (a > b) - (a < b)
+
+
+@lru_cache(maxsize=None)
+def compare_versions(a: str, b: str) -> int:
+    """
+    Orders conda versions like conda's VersionOrder (without local versions)
+    >>> compare_versions("1.1.1l", "1.1.1k"), compare_versions("1.10", "1.9")
+    (1, 1)
+    >>> compare_versions("1.0", "1.0.0"), compare_versions("1.0a1", "1.0")
+    (0, -1)
+    """
+    if a == b:
+        return 0
+    a_components, b_components = _version_components(a), _version_components(b)
+    for i in range(max(len(a_components), len(b_components))):
+        a_component = a_components[i] if i < len(a_components) else (0,)
+        b_component = b_components[i] if i < len(b_components) else (0,)
+        for j in range(max(len(a_component), len(b_component))):
+            a_value = a_component[j] if j < len(a_component) else 0
+            b_value = b_component[j] if j < len(b_component) else 0
+            result = _compare_version_value(a_value, b_value)
+            if result != 0:
+                return result
+    return 0
+
+
+def _is_version_prefix(prefix: str, version: str) -> bool:
+    """
+    >>> _is_version_prefix("1.11", "1.11.2"), _is_version_prefix("1.1", "1.11")
+    (True, False)
+    """
+    prefix_parts = prefix.split(".")
+    version_parts = version.split(".")[: len(prefix_parts)]
+    if len(version_parts) < len(prefix_parts):
+        return compare_versions(prefix, version) == 0
+    return compare_versions(prefix, ".".join(version_parts)) == 0
+
+
+def _version_constraint_matches(constraint: str, version: str) -> Optional[bool]:
+    operator, spec_version = _VERSION_CONSTRAINT_RE.match(constraint.strip()).groups()
+    fuzzy = spec_version.endswith("*")
+    spec_version = spec_version.rstrip("*").rstrip(".")
+    if "*" in spec_version or "(" in spec_version or ")" in spec_version:
+        return None
+    if spec_version == "":
+        return operator in (None, "=", "==", ">=", "<=")
+    if operator in (None, "=") or (operator == "==" and fuzzy):
+        return _is_version_prefix(spec_version, version)
+    if operator == "!=" and fuzzy:
+        return not _is_version_prefix(spec_version, version)
+    if operator == "~=":
+        compatible_prefix = spec_version.rsplit(".", 1)[0]
+        return compare_versions(version, spec_version) >= 0 and _is_version_prefix(
+            compatible_prefix, version
+        )
+    comparison = compare_versions(version, spec_version)
+    return {
+        "==": comparison == 0,
+        "!=": comparison != 0,
+        "<": comparison < 0,
+        "<=": comparison <= 0,
+        ">": comparison > 0,
+        ">=": comparison >= 0,
+    }[operator]
+
+
+def spec_matches(spec: str, version: str, build: str) -> Optional[bool]:
+    """
+    Checks a package against a conda match spec as found in the package metadata
+    (`name [version [build]]`, for example `python >=3.6,<4.0a0` or `python_abi 3.9.* *_cp39`)
+    :return: if the package matches, None if the spec uses syntax not supported here
+        (channels, brackets, parenthesis...)
+
+    >>> spec_matches("python >=3.6,<4.0a0", "3.9.7", "hb7a2778_3_cpython")
+    True
+    >>> spec_matches("numpy 1.21.*|1.22.*", "1.20.3", "py39_0")
+    False
+    >>> spec_matches("python_abi 3.9.* *_cp39", "3.9", "2_cp39")
+    True
+    """
+    if "[" in spec or "::" in spec:
+        return None
+    parts = spec.split()
+    if len(parts) > 3:
+        return None
+    if len(parts) == 3 and not fnmatchcase(build, parts[2]):
+        return False
+    if len(parts) == 1:
+        return True
+    for alternative in parts[1].split("|"):
+        matches = [
+            _version_constraint_matches(c, version) for c in alternative.split(",")
+        ]
+        if None in matches:
+            return None
+        if all(matches):
+            return True
+    return False
+
+
+def read_tarball_index(tar_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    :return: the content of info/index.json of a .tar.bz2 conda package
+    """
+    if not tar_path.name.endswith(".tar.bz2"):
+        return None
+    with tarfile.open(tar_path, "r:bz2") as tar:
+        try:
+            index_file = tar.extractfile("info/index.json")
+        except KeyError:
+            return None
+        return json.load(index_file)
+
+
+def find_package_index(
+    file_name: str, pkgs_dirs: Iterable[Path], prefixes: Iterable[Path] = ()
+) -> Optional[Dict[str, Any]]:
+    """
+    Looks for the metadata of a package in the installed environments
+    and in the conda package caches, without downloading anything
+    :param file_name: file name of the package, for example click-8.0.1-pyhd8ed1ab_0.tar.bz2
+    :param pkgs_dirs: conda package cache directories
+    :param prefixes: conda environments that may have the package installed
+    """
+    dist = dist_name(file_name)
+    for prefix in prefixes:
+        record_path = prefix / "conda-meta" / f"{dist}.json"
+        if record_path.exists():
+            return json.loads(record_path.read_text())
+    for pkgs_dir in pkgs_dirs:
+        index_path = pkgs_dir / dist / "info" / "index.json"
+        if index_path.exists():
+            return json.loads(index_path.read_text())
+        tar_path = pkgs_dir / file_name
+        if tar_path.exists():
+            index = read_tarball_index(tar_path)
+            if index is not None:
+                return index
+    return None
+
+
+def resolve_dependency_closure(
+    root_depends: List[str],
+    available: Set[str],
+    get_depends: Callable[[str], Optional[List[str]]],
+) -> Optional[Set[str]]:
+    """
+    Walks the dependencies of root_depends restricted to the available package names
+    :param root_depends: conda match specs the closure starts from
+    :param available: names of the packages that can be part of the closure
+    :param get_depends: the match specs a package depends on (None if unknown)
+    :return: the names in the closure or None if it can not be satisfied
+    """
+    closure = set()
+    to_visit = [spec_name(d) for d in root_depends]
+    while to_visit:
+        name = to_visit.pop()
+        # virtual packages (__glibc, __osx...) are provided by the system
+        if name in closure or name.startswith("__"):
+            continue
+        if name not in available:
+            return None
+        depends = get_depends(name)
+        if depends is None:
+            return None
+        closure.add(name)
+        to_visit.extend(spec_name(d) for d in depends)
+    return closure
+
+
+def file_md5(path: Path) -> str:
+    md5 = hashlib.md5()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def read_installed_records(prefix: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    :return: the conda-meta records of the packages installed in prefix by dist name
+    """
+    return {
+        record_path.stem: json.loads(record_path.read_text())
+        for record_path in (prefix / "conda-meta").glob("*.json")
+    }
+
+
+def diff_installed_records(
+    installed_records: Dict[str, Dict[str, Any]], tar_links: List[str]
+) -> Tuple[List[str], List[str]]:
+    """
+    :param installed_records: conda-meta records by dist name
+    :param tar_links: explicit lock tar links (url#md5) the env should have
+    :return: the names of the packages to remove and the tar links to install.
+        The packages installed with another version (or build) are removed too,
+        as older conda versions do not unlink them when installing explicit tar links
+    """
+    to_install = []
+    changed_names = set()
+    locked_names = set()
+    for tar_link in tar_links:
+        url, _, md5 = tar_link.partition("#")
+        dist = dist_name(url.rsplit("/", 1)[1])
+        name = dist.rsplit("-", 2)[0].lower()
+        locked_names.add(name)
+        record = installed_records.get(dist)
+        if record is None or (md5 and record.get("md5", md5) != md5):
+            to_install.append(tar_link)
+            changed_names.add(name)
+
+    to_remove = sorted(
+        record["name"]
+        for record in installed_records.values()
+        if record["name"].lower() not in locked_names
+        or record["name"].lower() in changed_names
+    )
+    return to_remove, to_install
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+import requests
+
+from senv.http_session import build_session
+from senv.log import log
+
+
+class UploadSummary(NamedTuple):
+    uploaded: int
+    skipped: int
+    uploaded_bytes: int
+    seconds: float
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.uploaded_bytes / 1024**2 / max(self.seconds, 1e-6)
+
+
+def _upload(session: requests.Session, tar_path: Path, dest: str) -> Optional[int]:
+    """
+    :return: the uploaded bytes, None if the package was already in the channel
+    """
+    response = session.head(dest, timeout=60)
+    if response.status_code != 404:
+        log.warning(f"{dest} already exists, not uploading it again")
+        return None
+    with tar_path.open("rb") as f:
+        # the file is streamed, and rewound by the retries
+        response = session.put(dest, data=f, timeout=600)
+    response.raise_for_status()
+    return tar_path.stat().st_size
+
+
+def upload_packages(
+    tar_paths: List[Path],
+    repository_url: str,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    max_uploads: int = 4,
+) -> UploadSummary:
+    """
+    Uploads concurrently the packages missing in the channel, through a pooled session
+    :param tar_paths: conda packages, their parent directory is the platform (subdir)
+    :param repository_url: channel url, packages are uploaded to `<repository_url>/<subdir>/<file name>`
+    :param max_uploads: maximum number of concurrent uploads
+    """
+    start = time.monotonic()
+    with build_session(pool_size=max_uploads) as session, ThreadPoolExecutor(
+        max_workers=max_uploads
+    ) as executor:
+        if username and password:
+            session.auth = (username, password)
+        uploaded_bytes = list(
+            executor.map(
+                lambda p: _upload(
+                    session, p, f"{repository_url.rstrip('/')}/{p.parent.name}/{p.name}"
+                ),
+                tar_paths,
+            )
+        )
+    uploaded = [b for b in uploaded_bytes if b is not None]
+    return UploadSummary(
+        uploaded=len(uploaded),
+        skipped=len(tar_paths) - len(uploaded),
+        uploaded_bytes=sum(uploaded),
+        seconds=time.monotonic() - start,
+    )
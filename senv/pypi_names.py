@@ -0,0 +1,76 @@
+import json
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict
+
+import requests
+import yaml
+from conda_lock.src_parser import pyproject_toml
+from pydantic import BaseSettings, Field
+
+from senv.http_session import build_session
+from senv.log import log
+from senv.utils import atomic_write, is_offline
+
+
+class PypiNamesCacheSettings(BaseSettings):
+    PATH: Path = Field(Path.home() / ".senv" / "cache" / "pypi_to_conda_names.json")
+    TTL: int = Field(7 * 24 * 60 * 60, description="seconds the mapping is reused")
+
+    class Config:
+        env_prefix = "SENV_PYPI_NAMES_CACHE_"
+
+
+def _download_pypi_to_conda_names() -> Dict[str, str]:
+    with build_session(pool_size=1) as session:
+        resp = session.get(pyproject_toml.PYPI_TO_CONDA_NAME_LOOKUP, timeout=(10, 60))
+        resp.raise_for_status()
+    # only the names are kept, the mapping of conda-lock has more information
+    return {
+        pypi_name: lookup.get("conda_name") or lookup.get("conda_forge")
+        for pypi_name, lookup in yaml.safe_load(resp.content).items()
+        if lookup.get("conda_name") or lookup.get("conda_forge")
+    }
+
+
+@lru_cache(maxsize=None)
+def pypi_to_conda_names() -> Dict[str, str]:
+    """
+    conda-lock's pypi to conda name mapping, cached in disk so locking
+    does not download it every time and works offline.
+    Without network and cache, the pypi names are used as they are
+    """
+    settings = PypiNamesCacheSettings()
+    cached_names = None
+    try:
+        cached_names = json.loads(settings.PATH.read_text())
+        if is_offline() or time.time() - settings.PATH.stat().st_mtime < settings.TTL:
+            return cached_names
+    except (OSError, ValueError):
+        pass
+
+    if is_offline():
+        log.warning(
+            "Offline mode and the pypi to conda name mapping is not cached,"
+            " the pypi names are used as conda names"
+        )
+        return {}
+    try:
+        names = _download_pypi_to_conda_names()
+    except (requests.RequestException, yaml.YAMLError) as e:
+        if cached_names is None:
+            raise
+        log.warning(f"Unable to update the pypi to conda name mapping: {e}")
+        return cached_names
+    # the cache is only an optimization
+    atomic_write(settings.PATH, json.dumps(names), best_effort=True)
+    return names
+
+
+def normalize_pypi_name(name: str) -> str:
+    """
+    Same as conda_lock.src_parser.pyproject_toml.normalize_pypi_name
+    with the cached mapping
+    """
+    return pypi_to_conda_names().get(name, name)
@@ -1,23 +1,36 @@
+import hashlib
+import json
 import os
 import shutil
 from contextlib import contextmanager
-from copy import deepcopy
 from enum import Enum
+from functools import lru_cache
 from pathlib import Path
-from shutil import which
 from tempfile import TemporaryDirectory
 from typing import Any, Dict, List, Optional, Set
 
-import toml
-from conda_lock.conda_lock import DEFAULT_PLATFORMS
-from ensureconda import ensureconda
+import pydantic
 from pydantic import BaseModel, Field, PrivateAttr, root_validator, validator
 from senvx.constants import LOCKED_PACKAGE_SUFFIX
 
 from senv.errors import SenvBadConfiguration
+from senv.executable_cache import resolve_executable, validate_executable_path
+from senv.lock_file import LockFormat, read_platform_tar_links
 from senv.log import log
-from senvx.models import CombinedCondaLock
-from senv.utils import get_current_platform
+from senv.utils import atomic_write, get_current_platform
+
+try:
+    # python >= 3.11
+    import tomllib as _toml_parser
+except ImportError:
+    try:
+        import tomli as _toml_parser
+    except ImportError:
+        import toml as _toml_parser
+
+# same default platforms as conda-lock, without importing it (it slows down senv startup)
+DEFAULT_PLATFORMS = ["osx-64", "linux-64", "win-64"]
+PYPROJECT_CACHE_DIR = Path.home() / ".senv" / "cache" / "pyproject"
 
 
 class BuildSystem(str, Enum):
@@ -42,12 +55,29 @@ class _SenvEnv(BaseModel):
         alias="conda-lock-path",
         description="(Conda only) The path of where the lock file will be generated",
     )
+    conda_lock_format: Optional[LockFormat] = Field(
+        None,
+        alias="conda-lock-format",
+        description="(Conda only) Format of the lock file, 'json' or 'compact'."
+        " (If not defined, 'compact' if conda-lock-path ends with .compact.json)",
+    )
     name: Optional[str] = Field(
         None,
         description="(Conda only) Alternative name for the conda environment"
         " (by default: tool.senv.name)",
     )
 
+    @property
+    def platform_tar_links(self) -> List[str]:
+        """
+        :return: the tar links (url#md5) locked for the current platform
+        """
+        if not self.conda_lock_path.exists():
+            raise SenvBadConfiguration(
+                f"No conda env lock file found in {self.conda_lock_path.resolve()}"
+            )
+        return read_platform_tar_links(self.conda_lock_path, get_current_platform())
+
     @property
     @contextmanager
     def platform_conda_lock(self) -> Path:
@@ -56,18 +86,11 @@ class _SenvEnv(BaseModel):
         :return: the path of the conda lock file
         """
         plat = get_current_platform()
-
-        if not self.conda_lock_path.exists():
-            raise SenvBadConfiguration(
-                f"No conda env lock file found in {self.conda_lock_path.resolve()}"
-            )
+        tar_links = self.platform_tar_links
 
         with TemporaryDirectory() as tmp_dir:
-            combine_lock_file = CombinedCondaLock.parse_file(self.conda_lock_path)
             plat_file = Path(tmp_dir) / f"plat-{plat}.lock"
-            plat_file.write_text(
-                "@EXPLICIT\n" + "\n".join(combine_lock_file.platform_tar_links[plat])
-            )
+            plat_file.write_text("@EXPLICIT\n" + "\n".join(tar_links))
             yield plat_file
 
 
@@ -92,6 +115,13 @@ class _SenvPackage(BaseModel):
     poetry_publish_repository: Optional[str] = Field(
         None, alias="poetry-publish-repository", env="SENV_POETRY_PUBLISH_REPOSITORY"
     )
+    build_cache_url: Optional[str] = Field(
+        None,
+        alias="build-cache-url",
+        env="SENV_BUILD_CACHE_URL",
+        description="Remote cache of the built packages shared by several machines,"
+        " any http server supporting GET and PUT",
+    )
 
 
 class _Senv(BaseModel):
@@ -192,6 +222,33 @@ class _Senv(BaseModel):
         description="(Poetry Only) path of the poetry executable."
         " (If not defined, it will try to find it in PATH)",
     )
+    conda_solve_max_workers: Optional[int] = Field(
+        None,
+        alias="conda-solve-max-workers",
+        env="SENV_CONDA_SOLVE_MAX_WORKERS",
+        description="(Conda Only) Maximum number of platforms solved concurrently."
+        " (If not defined, the number of CPUs)",
+    )
+    conda_solve_timeout: Optional[int] = Field(
+        None,
+        alias="conda-solve-timeout",
+        env="SENV_CONDA_SOLVE_TIMEOUT",
+        description="(Conda Only) Seconds after which a platform solve is aborted",
+    )
+    conda_solve_memory_mb: Optional[int] = Field(
+        None,
+        alias="conda-solve-memory-mb",
+        env="SENV_CONDA_SOLVE_MEMORY_MB",
+        description="(Conda Only) Estimated memory used by one solve, concurrent solves"
+        " are limited so they fit in the available memory",
+    )
+    conda_noarch_projection: bool = Field(
+        True,
+        alias="conda-noarch-projection",
+        env="SENV_CONDA_NOARCH_PROJECTION",
+        description="(Conda Only) When only python and its dependencies are platform"
+        " specific, solve one platform and reuse its noarch packages in the others",
+    )
 
     def __init__(self, **data: Any) -> None:
         super().__init__(**data)
@@ -203,15 +260,7 @@ class _Senv(BaseModel):
 
     @validator("conda_path", "poetry_path")
     def _validate_executable(cls, p: Path):
-        if not p.exists():
-            resolved_p = which(p)
-            if resolved_p is None:
-                raise ValueError(f"Provided path {p} was not found")
-            else:
-                p = Path(resolved_p).resolve()
-        if not os.access(str(p), os.X_OK):
-            raise ValueError(f"Provided path {p} is not executable")
-        return p
+        return validate_executable_path(p, os.environ.get("PATH"))
 
 
 class _Tool(BaseModel):
@@ -234,9 +283,11 @@ class PyProject(BaseModel):
 
     @root_validator(pre=True)
     def combine_senv_and_poetry(cls, values: Dict[str, Any]):
-        values_copy = deepcopy(values)
-        tool = values_copy.get("tool", {})
-        poetry = tool.get("poetry", {})
+        # only the dicts modified here are copied, the rest is not changed by the validation
+        values_copy = dict(values)
+        tool = dict(values_copy.get("tool", {}))
+        values_copy["tool"] = tool
+        poetry = dict(tool.get("poetry", {}))
         senv = tool.get("senv", {})
         poetry.update(senv)
         tool["senv"] = poetry
@@ -261,9 +312,15 @@ class PyProject(BaseModel):
     def _build_from_toml(cls, toml_path: Path) -> "PyProject":
         if not toml_path.exists():
             raise ValueError(f"{toml_path.absolute()} Not found")
-        config_dict = toml.loads(toml_path.read_text())
-        instance = PyProject(**config_dict)
-        instance._config_path = toml_path.resolve().absolute()
+        config_path = toml_path.resolve().absolute()
+        toml_content = toml_path.read_bytes()
+        cache_path, cache_key = _pyproject_cache_entry(config_path, toml_content)
+        instance = _read_cached_pyproject(cache_path, cache_key)
+        if instance is None:
+            config_dict = _toml_parser.loads(toml_content.decode())
+            instance = PyProject(**config_dict)
+            _write_cached_pyproject(cache_path, cache_key, instance)
+        instance._config_path = config_path
 
         instance.validate_fields()
         return instance
@@ -272,6 +329,13 @@ class PyProject(BaseModel):
     def get(cls) -> "PyProject":
         return cls.__instance
 
+    @classmethod
+    def is_loaded(cls) -> bool:
+        try:
+            return cls.__instance is not None
+        except AttributeError:
+            return False
+
     @property
     def config_path(self):
         return self._config_path
@@ -302,13 +366,18 @@ class PyProject(BaseModel):
 
     @property
     def conda_path(self) -> Path:
-        return self.senv.conda_path or ensureconda(
-            no_install=True, micromamba=False, mamba=False
-        )
+        def find_conda():
+            from ensureconda import ensureconda
+
+            return ensureconda(no_install=True, micromamba=False, mamba=False)
+
+        return self.senv.conda_path or resolve_executable("conda", find_conda)
 
     @property
     def poetry_path(self) -> Path:
-        return self.senv.poetry_path or shutil.which("poetry")
+        return self.senv.poetry_path or resolve_executable(
+            "poetry", lambda: shutil.which("poetry")
+        )
 
     def validate_fields(self):
         if self.poetry_path is None:
@@ -338,3 +407,67 @@ class PyProject(BaseModel):
             pass
 
         # todo add more validations
+
+
+@lru_cache(maxsize=None)
+def _packages_versions_key() -> str:
+    """
+    The cached models depend on the versions of senv, pydantic and senvx
+    """
+    try:
+        from importlib.metadata import PackageNotFoundError, version
+    except ImportError:  # python 3.7
+        from importlib_metadata import PackageNotFoundError, version
+
+    versions = [f"pydantic={pydantic.VERSION}"]
+    for name in ("senv", "senvx"):
+        try:
+            versions.append(f"{name}={version(name)}")
+        except PackageNotFoundError:
+            versions.append(f"{name}=None")
+    return ",".join(versions)
+
+
+def _pyproject_cache_entry(config_path: Path, toml_content: bytes):
+    """
+    :return: the cache file of the project and the key the cached PyProject is valid for
+    """
+    senv_module = os.stat(__file__)
+    key_hash = hashlib.sha256(toml_content)
+    for key_part in (
+        # the models change between senv versions (and while developing senv)
+        _packages_versions_key(),
+        f"{senv_module.st_mtime_ns}-{senv_module.st_size}",
+        # relative executables and default paths depend on the environment
+        os.environ.get("PATH", ""),
+        os.getcwd(),
+        *sorted(f"{k}={v}" for k, v in os.environ.items() if k.startswith("SENV_")),
+        str(Path.home()),
+    ):
+        key_hash.update(b"\0" + key_part.encode())
+    file_name = hashlib.sha256(str(config_path).encode()).hexdigest()[:16]
+    return PYPROJECT_CACHE_DIR / f"{file_name}.json", key_hash.hexdigest()
+
+
+def _read_cached_pyproject(cache_path: Path, cache_key: str) -> Optional[PyProject]:
+    try:
+        cached = json.loads(cache_path.read_text())
+        if not isinstance(cached, dict) or cached.get("key") != cache_key:
+            return None
+        # the models are only built once the key matches, so stale cache files
+        # of other senv versions are never parsed
+        return PyProject.parse_obj(cached["pyproject"])
+    except Exception:
+        # missing, corrupted or created by an incompatible senv version
+        return None
+
+
+def _write_cached_pyproject(cache_path: Path, cache_key: str, instance: PyProject):
+    try:
+        # the unset values are left out so their defaults are computed again
+        pyproject = json.loads(instance.json(by_alias=True, exclude_none=True))
+        content = json.dumps(dict(key=cache_key, pyproject=pyproject))
+    except (TypeError, ValueError):
+        # the cache is only an optimization
+        return
+    atomic_write(cache_path, content, best_effort=True)
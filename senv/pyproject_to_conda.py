@@ -1,28 +1,38 @@
 #!/usr/bin/env python
 from collections import Mapping
+import hashlib
 import json
 import re
-from concurrent.futures import ProcessPoolExecutor
 from io import StringIO
 from pathlib import Path
-from tempfile import NamedTemporaryFile
 from typing import Any, Dict, List, Optional
 
 import yaml
 from conda_lock.conda_lock import run_lock
 from conda_lock.src_parser import LockSpecification
 from conda_lock.src_parser.pyproject_toml import (
-    normalize_pypi_name,
     poetry_version_to_conda_version,
     to_match_spec,
 )
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
+from senv.conda_info import get_pkgs_dirs
 from senv.errors import SenvInvalidPythonVersion
+from senv.lock_file import read_combined_lock
 from senv.log import log
+from senv.models import SenvCombinedCondaLock, SenvLockFileMetaData
+from senv.noarch_projection import (
+    platform_specific_env_dict,
+    project_noarch_lock,
+    split_noarch_lock,
+)
+from senv.pypi_names import normalize_pypi_name
 from senv.pyproject import PyProject
-from senvx.models import CombinedCondaLock, LockFileMetaData
-from senv.utils import MySpinner, cd_tmp_dir
+from senv.repodata_cache import WARM_CACHE_SOLVE_ENV, warm_repodata_for_solves
+from senv.solve_cache import SolveCache, solve_cache_key
+from senv.solve_scheduler import SolveScheduler
+from senv.targeted_update import LockedDependsFinder
+from senv.utils import MySpinner, cd_tmp_dir, get_current_platform
 
 version_pattern = re.compile("version='(.*)'")
 
@@ -111,7 +121,7 @@ def _parse_pyproject_toml(
     platform: str, include_dev_dependencies: bool
 ) -> LockSpecification:
     specs: List[str] = []
-    deps = PyProject.get().senv.dependencies
+    deps = dict(PyProject.get().senv.dependencies)
     if include_dev_dependencies:
         deps.update(PyProject.get().senv.dev_dependencies)
 
@@ -260,9 +270,40 @@ def create_env_yaml(
     return output
 
 
+def solve_input_hash(platform: str, env_dict: Dict) -> str:
+    """
+    Canonical content hash of everything the solver sees when locking one platform
+    :param platform: conda platform, for example linux-64
+    :param env_dict: conda env dict with the channels and the dependencies to lock
+    :return: sha256 hex digest
+    """
+    dependencies = env_dict.get("dependencies") or []
+    if isinstance(dependencies, Mapping):
+        dependencies = [f"{name} {spec}" for name, spec in dependencies.items()]
+    solve_inputs = dict(
+        platform=platform,
+        # channel order defines the priority, so it is part of the input
+        channels=list(env_dict.get("channels") or []),
+        specs=sorted(" ".join(str(d).split()) for d in dependencies),
+    )
+    return hashlib.sha256(json.dumps(solve_inputs, sort_keys=True).encode()).hexdigest()
+
+
+def _build_lock_metadata(
+    input_hashes: Optional[Dict[str, str]] = None
+) -> SenvLockFileMetaData:
+    c = PyProject.get()
+    return SenvLockFileMetaData(
+        package_name=c.package_name,
+        entry_points=list(c.senv.scripts.keys()),
+        version=c.version,
+        input_hashes=input_hashes or {},
+    )
+
+
 def combine_conda_lock_files(
     directory: Path, platforms: List[str]
-) -> "CombinedCondaLock":
+) -> SenvCombinedCondaLock:
     platform_tar_links = {}
     for platform in platforms:
         lock_file = directory / f"conda-{platform}.lock"
@@ -270,39 +311,190 @@ def combine_conda_lock_files(
         clean_lock_test = lock_text.split("@EXPLICIT", 1)[1].strip()
         tar_links = [line.strip() for line in clean_lock_test.splitlines()]
         platform_tar_links[platform] = tar_links
-    c = PyProject.get()
-    metadata = LockFileMetaData(
-        package_name=c.package_name,
-        entry_points=list(c.senv.scripts.keys()),
-        version=c.version,
+
+    return SenvCombinedCondaLock(
+        metadata=_build_lock_metadata(), platform_tar_links=platform_tar_links
     )
 
-    return CombinedCondaLock(metadata=metadata, platform_tar_links=platform_tar_links)
+
+def get_unchanged_platform_tar_links(
+    lock_path: Optional[Path], input_hashes: Dict[str, str]
+) -> Dict[str, List[str]]:
+    """
+    Finds the platforms of an existing lock file that were solved with the same inputs
+    :param lock_path: existing combined lock file, ignored if it does not exist
+    :param input_hashes: the current solve input hash of each platform
+    :return: the tar links of the platforms that do not need to be solved again
+    """
+    if lock_path is None or not lock_path.exists():
+        return {}
+    try:
+        previous_lock = read_combined_lock(lock_path)
+    except (ValidationError, ValueError):
+        log.warning(f"Unable to read {lock_path}, solving all platforms")
+        return {}
+
+    previous_hashes = previous_lock.metadata.input_hashes
+    return {
+        platform: previous_lock.platform_tar_links[platform]
+        for platform, input_hash in input_hashes.items()
+        if previous_hashes.get(platform) == input_hash
+        and platform in previous_lock.platform_tar_links
+    }
+
+
+def _pinned_env_dict(env_dict: Dict, pins: List[str]) -> Dict:
+    dependencies = env_dict.get("dependencies") or []
+    if isinstance(dependencies, Mapping):
+        dependencies = [f"{name} {spec}" for name, spec in dependencies.items()]
+    return dict(env_dict, dependencies=list(dependencies) + pins)
 
 
 def generate_combined_conda_lock_file(
-    platforms: List[str], env_dict: Dict
-) -> "CombinedCondaLock":
+    platforms: List[str],
+    env_dict: Dict,
+    base_lock_path: Optional[Path] = None,
+    use_solve_cache: bool = True,
+    platform_pins: Optional[Dict[str, List[str]]] = None,
+) -> SenvCombinedCondaLock:
+    """
+    :param platforms: conda platforms to lock
+    :param env_dict: conda env dict with the channels and the dependencies to lock
+    :param base_lock_path: previous lock file, the platforms whose solve inputs
+        did not change are copied from it instead of being solved again
+    :param use_solve_cache: reuse the solves cached by other projects with the same inputs
+    :param platform_pins: extra match specs of each platform, only used to narrow the solve.
+        The lock still satisfies env_dict, so the stored input hashes do not include them
+    """
+    platform_pins = platform_pins or {}
+    platform_env_dicts = {
+        platform: _pinned_env_dict(env_dict, platform_pins.get(platform, []))
+        for platform in platforms
+    }
+    input_hashes = {
+        platform: solve_input_hash(platform, env_dict) for platform in platforms
+    }
+    platform_tar_links = get_unchanged_platform_tar_links(base_lock_path, input_hashes)
+    for platform in platform_tar_links:
+        log.info(f"Dependencies for {platform} did not change, skipping solve")
+
+    solve_cache = SolveCache()
+    conda_exe = PyProject.get().conda_path
+    cache_keys = {
+        platform: solve_cache_key(
+            solve_input_hash(platform, platform_env_dicts[platform]), conda_exe
+        )
+        for platform in platforms
+        if platform not in platform_tar_links
+    }
+    if use_solve_cache:
+        platform_tar_links.update(solve_cache.get_many(cache_keys))
+
+    platforms_to_solve = [p for p in platforms if p not in platform_tar_links]
+    if len(platforms_to_solve) > 0:
+        env_dicts_to_solve = {p: platform_env_dicts[p] for p in platforms_to_solve}
+        if (
+            len(platforms_to_solve) > 1
+            and len(platform_pins) == 0
+            and PyProject.get().senv.conda_noarch_projection
+        ):
+            solved_tar_links = _solve_with_noarch_projection(env_dicts_to_solve)
+        else:
+            solved_tar_links = _solve_conda_lock_files(
+                env_dicts_to_solve
+            ).platform_tar_links
+        for platform, tar_links in solved_tar_links.items():
+            solve_cache.put(cache_keys[platform], tar_links)
+        platform_tar_links.update(solved_tar_links)
+
+    return SenvCombinedCondaLock(
+        metadata=_build_lock_metadata(input_hashes),
+        platform_tar_links={p: platform_tar_links[p] for p in platforms},
+    )
+
+
+def _solve_conda_lock_files(
+    platform_env_dicts: Dict[str, Dict], fail_fast: bool = True
+) -> SenvCombinedCondaLock:
+    """
+    :param fail_fast: raise the first solve failure, otherwise the lock only has
+        the platforms that were solved
+    """
     c = PyProject.get()
-    with NamedTemporaryFile(mode="w+") as f, cd_tmp_dir() as tmp_dir, MySpinner(
-        "Building lock files..."
-    ) as status:
+    platforms = list(platform_env_dicts.keys())
+    channels = next(iter(platform_env_dicts.values()))["channels"]
+    with cd_tmp_dir() as tmp_dir, MySpinner("Building lock files...") as status:
         status.start()
-        yaml.safe_dump(env_dict, f)
-        processes = []
-        with ProcessPoolExecutor() as executor:
-            for platform in platforms:
-                p = executor.submit(
-                    run_lock,
-                    [Path(f.name)],
-                    conda_exe=str(c.conda_path.resolve()),
-                    platforms=[platform],
-                    channel_overrides=env_dict["channels"],
-                    kinds=["explicit"],
-                )
-                processes.append(p)
+        warm_repodata_for_solves(channels, platforms, get_pkgs_dirs()[0])
+        scheduler = SolveScheduler.from_pyproject(env=WARM_CACHE_SOLVE_ENV)
+        for platform, env_dict in platform_env_dicts.items():
+            # each platform gets its own spec file as the solves run concurrently
+            env_path = Path(tmp_dir) / f"env-{platform}.yaml"
+            env_path.write_text(yaml.safe_dump(env_dict))
+            scheduler.submit(
+                platform,
+                run_lock,
+                [env_path],
+                conda_exe=str(c.conda_path.resolve()),
+                platforms=[platform],
+                channel_overrides=env_dict["channels"],
+                kinds=["explicit"],
+            )
+        scheduler.run(fail_fast=fail_fast)
         status.writeln("combining lock files...")
-        return combine_conda_lock_files(tmp_dir, platforms)
+        return combine_conda_lock_files(
+            tmp_dir, [p for p in platforms if p not in scheduler.failures]
+        )
+
+
+def _solve_with_noarch_projection(
+    platform_env_dicts: Dict[str, Dict]
+) -> Dict[str, List[str]]:
+    """
+    Solves one platform and, if only python and its dependencies are platform specific,
+    the other platforms only solve those and reuse the noarch packages of the first one.
+    The platforms where that is not possible are fully solved
+    """
+    platforms = list(platform_env_dicts.keys())
+    current_platform = get_current_platform()
+    first = current_platform if current_platform in platforms else platforms[0]
+    others = [p for p in platforms if p != first]
+    platform_tar_links = dict(
+        _solve_conda_lock_files({first: platform_env_dicts[first]}).platform_tar_links
+    )
+
+    get_depends = LockedDependsFinder(get_pkgs_dirs(), prefixes=[])
+    split = split_noarch_lock(
+        platform_tar_links[first], get_depends, get_depends.constrains
+    )
+    if split is not None:
+        log.info(
+            f"Only {', '.join(sorted(split.platform_specific))} are platform specific,"
+            f" reusing the noarch packages of {first}"
+        )
+        # the exact python of the first platform may not be published for the others,
+        # those platforms (like the ones that can not be projected) are fully solved
+        platform_specific_lock = _solve_conda_lock_files(
+            {
+                p: platform_specific_env_dict(platform_env_dicts[p], split)
+                for p in others
+            },
+            fail_fast=False,
+        )
+        for platform, tar_links in platform_specific_lock.platform_tar_links.items():
+            tar_links = project_noarch_lock(
+                split, platform, tar_links, get_depends, get_depends.constrains
+            )
+            if tar_links is not None:
+                platform_tar_links[platform] = tar_links
+
+    platforms_to_solve = [p for p in others if p not in platform_tar_links]
+    if len(platforms_to_solve) > 0:
+        solved_lock = _solve_conda_lock_files(
+            {p: platform_env_dicts[p] for p in platforms_to_solve}
+        )
+        platform_tar_links.update(solved_lock.platform_tar_links)
+    return platform_tar_links
 
 
 def locked_package_to_recipe_yaml(lock_file: Path, output: Path):
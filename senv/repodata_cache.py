@@ -0,0 +1,274 @@
+import gzip
+import hashlib
+import json
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import requests
+from pydantic import BaseSettings, Field
+
+from senv.conda_info import get_channel_urls
+from senv.errors import SenvOfflineMissingRepodata
+from senv.http_session import build_session, redact_url
+from senv.log import log
+from senv.utils import atomic_write, is_offline
+
+DEFAULTS_CHANNEL_URLS = [
+    "https://repo.anaconda.com/pkgs/main",
+    "https://repo.anaconda.com/pkgs/r",
+]
+# environment of the solves spawned by senv after warming the cache: conda's repodata cache
+# is considered fresh for a day. The upstream Cache-Control is kept in the cache and
+# only the solver processes get this environment, so other conda commands are not affected
+WARM_CACHE_SOLVE_ENV = {"CONDA_LOCAL_REPODATA_TTL": str(24 * 60 * 60)}
+
+
+class RepodataCacheSettings(BaseSettings):
+    PATH: Path = Field(Path.home() / ".senv" / "cache" / "repodata")
+    MAX_CONCURRENCY: int = Field(8)
+
+    class Config:
+        env_prefix = "SENV_REPODATA_CACHE_"
+
+
+class WarmResult(NamedTuple):
+    url: str
+    status: str
+
+
+def channel_urls(channel: str) -> List[str]:
+    """
+    >>> channel_urls("conda-forge")
+    ['https://conda.anaconda.org/conda-forge']
+    """
+    if channel == "defaults":
+        return list(DEFAULTS_CHANNEL_URLS)
+    if "://" in channel:
+        return [channel.rstrip("/")]
+    return [f"https://conda.anaconda.org/{channel}"]
+
+
+def subdir_urls(
+    channels: Iterable[str],
+    platforms: Iterable[str],
+    resolved_channels: Optional[Dict[str, List[str]]] = None,
+) -> List[str]:
+    """
+    :param resolved_channels: the urls of the channels as conda resolves them
+        (see senv.conda_info.get_channel_urls), by default they are the anaconda.org urls
+    :return: the unique repodata locations (channel/subdir) needed to solve for platforms
+    """
+    resolved_channels = resolved_channels or {}
+    subdirs = sorted(set(platforms)) + ["noarch"]
+    urls = []
+    for channel in channels:
+        for channel_url in resolved_channels.get(channel) or channel_urls(channel):
+            for subdir in subdirs:
+                url = f"{channel_url}/{subdir}"
+                if url not in urls:
+                    urls.append(url)
+    return urls
+
+
+def conda_cache_name(url: str) -> str:
+    """
+    :return: the name conda gives to the repodata cache of a channel/subdir url
+        (conda.core.subdir_data.cache_fn_url)
+    """
+    return hashlib.md5(f"{url}/".encode()).hexdigest()[:8]
+
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+
+def _conda_repodata_chunks(
+    repodata_path: Path, conda_state: Dict[str, str]
+) -> Iterator[bytes]:
+    """
+    The repodata with the state keys of conda's cache. Repodata can be hundreds of MB,
+    so the keys are prepended to the json object instead of parsing it
+    """
+    with gzip.open(repodata_path, "rb") as f:
+        head = f.read(_CHUNK_SIZE).lstrip()[1:]
+        yield json.dumps(conda_state)[:-1].encode()
+        yield b"" if head.lstrip().startswith(b"}") else b", "
+        yield head
+        yield from iter(lambda: f.read(_CHUNK_SIZE), b"")
+
+
+class RepodataCache:
+    """
+    Compressed repodata shared by all the solves and projects.
+    Every (channel, subdir) is refreshed with conditional requests (ETag/Last-Modified)
+    """
+
+    def __init__(self, settings: Optional[RepodataCacheSettings] = None):
+        self.settings = settings or RepodataCacheSettings()
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha256(url.encode()).hexdigest()[:16]
+        return (
+            self.settings.PATH / f"{key}.json.gz",
+            self.settings.PATH / f"{key}.state.json",
+        )
+
+    def _read_state(self, url: str) -> Dict[str, Any]:
+        repodata_path, state_path = self._paths(url)
+        if not repodata_path.exists():
+            return {}
+        try:
+            return json.loads(state_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def fetch(self, session: requests.Session, url: str) -> WarmResult:
+        repodata_path, state_path = self._paths(url)
+        state = self._read_state(url)
+        headers = {}
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        if state.get("mod"):
+            headers["If-Modified-Since"] = state["mod"]
+
+        try:
+            with session.get(
+                f"{url}/repodata.json", headers=headers, timeout=120, stream=True
+            ) as response:
+                if response.status_code == 404:
+                    # channels do not need to have all the subdirs
+                    return WarmResult(url, "not found")
+                response.raise_for_status()
+                if response.status_code == 304:
+                    status = "not modified"
+                else:
+                    # compressed while it is downloaded, without keeping it in memory
+                    repodata_chunks = _gzip_chunks(response.iter_content(_CHUNK_SIZE))
+                    if not atomic_write(
+                        repodata_path, repodata_chunks, best_effort=True
+                    ):
+                        log.warning(
+                            f"Unable to write the repodata cache {repodata_path}"
+                        )
+                        return WarmResult(url, "failed")
+                    state = dict(
+                        url=url,
+                        etag=response.headers.get("ETag"),
+                        mod=response.headers.get("Last-Modified"),
+                        cache_control=response.headers.get("Cache-Control"),
+                    )
+                    status = "updated"
+        except requests.RequestException as e:
+            # warming is an optimization, the solve downloads what it still needs
+            log.warning(
+                f"Failed fetching {redact_url(url)}/repodata.json:"
+                f" {redact_url(str(e))}"
+            )
+            return WarmResult(url, "failed")
+        state["fetched_at"] = time.time()
+        atomic_write(state_path, json.dumps(state), best_effort=True)
+        return WarmResult(url, status)
+
+    def warm(self, urls: List[str]) -> List[WarmResult]:
+        """
+        Fetches the repodata of every channel/subdir url once, concurrently
+        """
+        if is_offline():
+            return [
+                WarmResult(url, "cached" if self._read_state(url) else "missing")
+                for url in urls
+            ]
+        workers = max(min(self.settings.MAX_CONCURRENCY, len(urls)), 1)
+        with build_session(pool_size=workers) as session, ThreadPoolExecutor(
+            max_workers=workers
+        ) as executor:
+            return list(executor.map(lambda url: self.fetch(session, url), urls))
+
+    def load(self, url: str) -> Optional[Dict[str, Any]]:
+        """
+        :return: the cached repodata of a channel/subdir url
+        """
+        repodata_path, _ = self._paths(url)
+        if not repodata_path.exists():
+            return None
+        return json.loads(gzip.decompress(repodata_path.read_bytes()))
+
+    def export_to_conda(self, results: List[WarmResult], pkgs_dir: Path):
+        """
+        Writes the cached repodata in conda's repodata cache (<pkgs_dir>/cache),
+        so the conda processes spawned by the solves do not download it again.
+        Only the repodata that was updated (or that conda does not have) is written
+        """
+        conda_cache_dir = pkgs_dir / "cache"
+        for url, status in results:
+            repodata_path, _ = self._paths(url)
+            cache_key = conda_cache_name(url)
+            conda_repodata_path = conda_cache_dir / f"{cache_key}.json"
+            if not repodata_path.exists() or (
+                status != "updated" and conda_repodata_path.exists()
+            ):
+                continue
+            state = self._read_state(url)
+            conda_state = dict(
+                _url=url,
+                _etag=state.get("etag") or "",
+                _mod=state.get("mod") or "",
+                _cache_control=state.get("cache_control") or "",
+            )
+            atomic_write(
+                conda_repodata_path, _conda_repodata_chunks(repodata_path, conda_state)
+            )
+            # newer conda versions keep the cache state in a separate file
+            stat = conda_repodata_path.stat()
+            atomic_write(
+                conda_cache_dir / f"{cache_key}.info.json",
+                json.dumps(
+                    dict(
+                        url=f"{url}/repodata.json",
+                        etag=conda_state["_etag"],
+                        mod=conda_state["_mod"],
+                        cache_control=conda_state["_cache_control"],
+                        mtime_ns=stat.st_mtime_ns,
+                        size=stat.st_size,
+                        refresh_ns=time.time_ns(),
+                    )
+                ),
+            )
+
+
+def warm_repodata_for_solves(
+    channels: List[str], platforms: List[str], pkgs_dir: Path
+) -> List[WarmResult]:
+    """
+    Warms the shared repodata cache and makes it available to the conda solves
+    running with WARM_CACHE_SOLVE_ENV
+    :raise SenvOfflineMissingRepodata: in offline mode, if some repodata is neither
+        in the cache nor in conda's cache, as the solves would fail (or hang) later
+    """
+    cache = RepodataCache()
+    urls = subdir_urls(channels, platforms, get_channel_urls(channels))
+    results = cache.warm(urls)
+    missing = [
+        r.url
+        for r in results
+        if r.status == "missing"
+        and not (pkgs_dir / "cache" / f"{conda_cache_name(r.url)}.json").exists()
+    ]
+    if len(missing) > 0:
+        raise SenvOfflineMissingRepodata([redact_url(url) for url in missing])
+    try:
+        cache.export_to_conda(results, pkgs_dir)
+    except OSError as e:
+        log.warning(f"Unable to export the repodata cache to {pkgs_dir}: {e}")
+    for result in results:
+        log.info(f"repodata {redact_url(result.url)}: {result.status}")
+    return results
@@ -1,19 +1,28 @@
+import hashlib
 import os
+import re
+import shlex
 import sys
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
-import pexpect
-from pexpect import spawn
 from shellingham import ShellDetectionFailure
-from shellingham import detect_shell
+from shellingham import detect_shell as _detect_shell
 
+from senv.activation import Activation, ActivationCacheSettings
+from senv.utils import atomic_write
 
-@contextmanager
-def spawn_shell(command, cwd: Optional[Union[Path, str]] = None) -> spawn:
+SUPPORTED_ACTIVATION_SHELLS = ("bash", "zsh", "fish")
+_SHELL_VARIABLE_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def detect_shell() -> Tuple[str, str]:
+    """
+    :return: the name and the path of the shell running senv
+    """
     try:
-        name, path = detect_shell(os.getpid())
+        return _detect_shell(os.getpid())
     except (RuntimeError, ShellDetectionFailure):
         shell = None
 
@@ -25,8 +34,14 @@ def spawn_shell(command, cwd: Optional[Union[Path, str]] = None) -> spawn:
         if not shell:
             raise RuntimeError("Unable to detect the current shell.")
 
-        name, path = Path(shell).stem, shell
+        return Path(shell).stem, shell
+
+
+@contextmanager
+def spawn_shell(command, cwd: Optional[Union[Path, str]] = None):
+    import pexpect
 
+    name, path = detect_shell()
     c = pexpect.spawn(path, args=["-i"])
     c.sendline(command)
     if cwd:
@@ -35,3 +50,96 @@ def spawn_shell(command, cwd: Optional[Union[Path, str]] = None) -> spawn:
     yield c
 
     sys.exit(c.exitstatus)
+
+
+def _fish_quote(value: str) -> str:
+    """
+    >>> print(_fish_quote("it's"))
+    'it\\'s'
+    """
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _is_shell_variable(name: str) -> bool:
+    """
+    >>> _is_shell_variable("CONDA_PREFIX"), _is_shell_variable("BASH_FUNC_f%%")
+    (True, False)
+    """
+    return _SHELL_VARIABLE_RE.match(name) is not None
+
+
+def activation_script(activation: Activation, shell_name: str) -> str:
+    """
+    :return: the commands of shell_name that apply the activation
+    """
+    unset_vars = [k for k in activation.unset_vars if _is_shell_variable(k)]
+    set_vars = {k: v for k, v in activation.set_vars.items() if _is_shell_variable(k)}
+    if shell_name == "fish":
+        lines = [f"set -e {k}" for k in unset_vars]
+        lines += [f"set -gx {k} {_fish_quote(v)}" for k, v in set_vars.items()]
+        path_entries = " ".join(_fish_quote(p) for p in activation.path_entries)
+        lines.append(f"set -gx PATH {path_entries} $PATH")
+        return "\n".join(lines) + "\n"
+
+    lines = [f"unset {k}" for k in unset_vars]
+    lines += [f"export {k}={shlex.quote(v)}" for k, v in set_vars.items()]
+    path_entries = shlex.quote(os.pathsep.join(activation.path_entries))
+    lines.append(f'export PATH={path_entries}"{os.pathsep}$PATH"')
+    if "CONDA_PROMPT_MODIFIER" in set_vars:
+        lines.append('PS1="$CONDA_PROMPT_MODIFIER$PS1"')
+    return "\n".join(lines) + "\n"
+
+
+def _write_cached_file(path: Path, content: str):
+    if path.exists():
+        return
+    atomic_write(path, content)
+
+
+def _content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+
+def activated_shell_command(
+    shell_name: str,
+    shell_path: str,
+    activation: Activation,
+    environ: Dict[str, str],
+    settings: Optional[ActivationCacheSettings] = None,
+) -> Optional[Tuple[List[str], Dict[str, str]]]:
+    """
+    The scripts are cached and named after their content, so they are written only once
+    :return: the arguments and the environment of an interactive shell that loads
+        the user configuration and then the activation, None if the shell is not supported
+    """
+    if shell_name not in SUPPORTED_ACTIVATION_SHELLS:
+        return None
+    scripts_dir = (settings or ActivationCacheSettings()).PATH / "scripts"
+    script = activation_script(activation, shell_name)
+
+    if shell_name == "bash":
+        rc_content = "[ -f ~/.bashrc ] && . ~/.bashrc\n" + script
+        rc_path = scripts_dir / f"{_content_hash(rc_content)}.bash"
+        _write_cached_file(rc_path, rc_content)
+        return [shell_path, "--rcfile", str(rc_path), "-i"], environ
+
+    if shell_name == "zsh":
+        # zsh reads its configuration from ZDOTDIR, the cached one loads
+        # the user configuration before the activation
+        user_zdotdir = shlex.quote(environ.get("ZDOTDIR", str(Path.home())))
+        zshrc = (
+            f"ZDOTDIR={user_zdotdir}\n"
+            '[ -f "$ZDOTDIR/.zshrc" ] && . "$ZDOTDIR/.zshrc"\n' + script
+        )
+        zdotdir = scripts_dir / f"{_content_hash(zshrc)}.zsh"
+        _write_cached_file(
+            zdotdir / ".zshenv",
+            f"[ -f {user_zdotdir}/.zshenv ] && . {user_zdotdir}/.zshenv\n",
+        )
+        _write_cached_file(zdotdir / ".zshrc", zshrc)
+        return [shell_path, "-i"], dict(environ, ZDOTDIR=str(zdotdir))
+
+    script_path = scripts_dir / f"{_content_hash(script)}.fish"
+    _write_cached_file(script_path, script)
+    init_command = f"source {shlex.quote(str(script_path))}"
+    return [shell_path, "--init-command", init_command, "-i"], environ
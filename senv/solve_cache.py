@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import conda_lock
+from pydantic import BaseSettings, Field
+
+from senv.executable_cache import executable_version
+from senv.log import log
+from senv.utils import atomic_write
+
+
+class SolveCacheSettings(BaseSettings):
+    PATH: Path = Field(Path.home() / ".senv" / "cache" / "solves")
+    MAX_BYTES: int = Field(
+        200 * 1024 * 1024,
+        description="Size budget of the cache, least recently used solves are"
+        " evicted when it is exceeded (0 disables the cache)",
+    )
+    TTL: int = Field(
+        7 * 24 * 60 * 60,
+        description="Seconds a solve is reused, so new packages"
+        " published in the channels are eventually picked up",
+    )
+
+    class Config:
+        env_prefix = "SENV_SOLVE_CACHE_"
+
+
+def solve_cache_key(input_hash: str, conda_exe: Path) -> str:
+    """
+    :param input_hash: hash of the specs, channels and platform of the solve
+    :param conda_exe: solver executable, solves from different
+        solvers (conda, mamba) or solver versions are not shared
+    """
+    key = dict(
+        input_hash=input_hash,
+        solver=executable_version(Path(conda_exe)),
+        conda_lock=conda_lock.__version__,
+    )
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+class SolveCache:
+    """
+    User level cache of solved tar links shared by all the projects.
+    Every entry is a json file, its mtime is used as the last access time for the LRU eviction
+    """
+
+    def __init__(self, settings: Optional[SolveCacheSettings] = None):
+        self.settings = settings or SolveCacheSettings()
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.MAX_BYTES > 0
+
+    def _entry_path(self, key: str) -> Path:
+        return self.settings.PATH / f"{key}.json"
+
+    def get(self, key: str) -> Optional[List[str]]:
+        """
+        The cache is shared with the senv processes of other projects, which can evict
+        any entry at any moment, so a missing entry is just a cache miss
+        """
+        if not self.enabled:
+            return None
+        entry_path = self._entry_path(key)
+        try:
+            entry = json.loads(entry_path.read_text())
+        except OSError:
+            return None
+        except ValueError:
+            self._remove(entry_path)
+            return None
+        if time.time() - entry["created_at"] > self.settings.TTL:
+            self._remove(entry_path)
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry["tar_links"]
+
+    def put(self, key: str, tar_links: List[str]):
+        if not self.enabled:
+            return
+        content = json.dumps(dict(created_at=time.time(), tar_links=tar_links))
+        # the cache is only an optimization
+        if atomic_write(self._entry_path(key), content, best_effort=True):
+            self.evict()
+
+    @staticmethod
+    def _remove(entry_path: Path):
+        try:
+            entry_path.unlink()
+        except OSError:
+            # already evicted by another process
+            pass
+
+    def evict(self):
+        entries = []
+        for entry_path in self.settings.PATH.glob("*.json"):
+            try:
+                entries.append((entry_path, entry_path.stat()))
+            except OSError:
+                pass
+        total_bytes = sum(stat.st_size for _, stat in entries)
+        for entry_path, stat in sorted(entries, key=lambda e: e[1].st_mtime):
+            if total_bytes <= self.settings.MAX_BYTES:
+                break
+            self._remove(entry_path)
+            total_bytes -= stat.st_size
+
+    def get_many(self, keys: Dict[str, str]) -> Dict[str, List[str]]:
+        """
+        :param keys: cache key by platform
+        :return: the cached tar links of the platforms found in the cache
+        """
+        cached = {}
+        for platform, key in keys.items():
+            tar_links = self.get(key)
+            if tar_links is not None:
+                log.info(f"Using cached solve for {platform}")
+                cached[platform] = tar_links
+        return cached
@@ -0,0 +1,183 @@
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+from queue import Empty
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from senv.errors import SenvSolveFailed, SenvSolveTimeout
+from senv.log import log
+from senv.pyproject import PyProject
+
+
+# seconds the cancelled solves have to exit before they are killed
+_TERMINATE_TIMEOUT = 5
+
+
+class _SolveJob(NamedTuple):
+    platform: str
+    fn: Callable
+    args: Tuple
+    kwargs: Dict[str, Any]
+
+
+def _run_solve_job(result_queue, job: _SolveJob, env: Dict[str, str]):
+    if hasattr(os, "setsid"):
+        # own process group, so cancelling the solve also kills
+        # the conda/mamba processes spawned by it
+        os.setsid()
+    # only the solve (and the conda processes it spawns) get the environment
+    os.environ.update(env)
+    try:
+        job.fn(*job.args, **job.kwargs)
+        result_queue.put((job.platform, None))
+    except BaseException:
+        result_queue.put((job.platform, traceback.format_exc()))
+
+
+def _terminate_solve_process(process: multiprocessing.Process):
+    # exitcode reaps the worker when it already exited, then its pid (the id of
+    # its process group) may belong to another process and the group is not killed
+    if not hasattr(os, "killpg") or process.exitcode is not None:
+        process.terminate()
+        process.join()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        # the worker did not create its process group yet
+        process.terminate()
+    # the worker is only reaped after killing its group, so its pid is not reused meanwhile
+    multiprocessing.connection.wait([process.sentinel], timeout=_TERMINATE_TIMEOUT)
+    try:
+        # the solver processes that ignored SIGTERM
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.join()
+
+
+def _available_memory_mb() -> Optional[int]:
+    meminfo = Path("/proc/meminfo")
+    if meminfo.exists():
+        for line in meminfo.read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) // 1024
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // 1024**2
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+class SolveScheduler:
+    """
+    Runs one solve per platform in its own process with bounded concurrency.
+    By default, the first failure (or timeout) terminates the remaining solves and is raised
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+        memory_per_solve_mb: Optional[int] = None,
+        env: Optional[Dict[str, str]] = None,
+    ):
+        """
+        :param env: environment variables set in the solve processes
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_per_solve_mb = memory_per_solve_mb
+        self.env = env or {}
+        # failures of the last run without fail_fast
+        self.failures: Dict[str, SenvSolveFailed] = {}
+        self._jobs = []
+
+    @classmethod
+    def from_pyproject(cls, env: Optional[Dict[str, str]] = None) -> "SolveScheduler":
+        senv = PyProject.get().senv
+        return cls(
+            max_workers=senv.conda_solve_max_workers,
+            timeout=senv.conda_solve_timeout,
+            memory_per_solve_mb=senv.conda_solve_memory_mb,
+            env=env,
+        )
+
+    def submit(self, platform: str, fn: Callable, *args, **kwargs):
+        self._jobs.append(_SolveJob(platform, fn, args, kwargs))
+
+    def _workers(self) -> int:
+        workers = min(self.max_workers, len(self._jobs))
+        if self.memory_per_solve_mb:
+            available_memory = _available_memory_mb()
+            if available_memory is not None:
+                workers = min(workers, available_memory // self.memory_per_solve_mb)
+        return max(workers, 1)
+
+    def _fail(self, failure: SenvSolveFailed, fail_fast: bool):
+        if fail_fast:
+            raise failure
+        log.warning(str(failure))
+        self.failures[failure.platform] = failure
+
+    def run(self, fail_fast: bool = True) -> Dict[str, float]:
+        """
+        :param fail_fast: raise the first failure, otherwise the failures are
+            kept in self.failures and the other solves continue
+        :return: the wall time in seconds of each successful platform solve
+        """
+        context = multiprocessing.get_context()
+        result_queue = context.Queue()
+        pending = deque(self._jobs)
+        running: Dict[str, Tuple[multiprocessing.Process, float]] = {}
+        durations = {}
+        workers = self._workers()
+        self._jobs = []
+        self.failures = {}
+        try:
+            while pending or running:
+                while pending and len(running) < workers:
+                    job = pending.popleft()
+                    process = context.Process(
+                        target=_run_solve_job,
+                        args=(result_queue, job, self.env),
+                        daemon=True,
+                    )
+                    process.start()
+                    running[job.platform] = (process, time.monotonic())
+
+                try:
+                    platform, error = result_queue.get(timeout=0.2)
+                except Empty:
+                    platform, error = None, None
+                if platform is not None:
+                    process, start = running.pop(platform)
+                    process.join()
+                    if error is not None:
+                        self._fail(SenvSolveFailed(platform, error), fail_fast)
+                        continue
+                    durations[platform] = time.monotonic() - start
+                    log.info(f"{platform} solved in {durations[platform]:.1f}s")
+
+                for platform, (process, start) in list(running.items()):
+                    failure = None
+                    if self.timeout and time.monotonic() - start > self.timeout:
+                        failure = SenvSolveTimeout(platform, self.timeout)
+                    elif not process.is_alive() and process.exitcode != 0:
+                        # killed before reporting (e.g. by the OOM killer)
+                        failure = SenvSolveFailed(
+                            platform,
+                            f"Solver process exited with code {process.exitcode}",
+                        )
+                    if failure is not None:
+                        self._fail(failure, fail_fast)
+                        del running[platform]
+                        _terminate_solve_process(process)
+        finally:
+            for process, _ in running.values():
+                _terminate_solve_process(process)
+        return durations
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from senv.lock_index import LockedPackage, LockIndex
+from senv.log import log
+from senv.package_metadata import find_package_index, spec_name
+from senv.repodata_cache import RepodataCache
+from senv.utils import is_offline
+
+
+class LockedDependsFinder:
+    """
+    Finds the dependencies of locked packages, first in the installed env and the conda
+    package caches and then in the shared repodata cache (needed for the other platforms)
+    """
+
+    def __init__(
+        self,
+        pkgs_dirs: List[Path],
+        prefixes: List[Path],
+        repodata_cache: Optional[RepodataCache] = None,
+    ):
+        self.pkgs_dirs = pkgs_dirs
+        self.prefixes = prefixes
+        self.repodata_cache = repodata_cache or RepodataCache()
+        self._repodata_records: Dict[str, Optional[Dict[str, Dict]]] = {}
+
+    def _load_repodata_records(self, url: str) -> Optional[Dict[str, Dict]]:
+        if url not in self._repodata_records:
+            repodata = self.repodata_cache.load(url)
+            if repodata is None and not is_offline():
+                self.repodata_cache.warm([url])
+                repodata = self.repodata_cache.load(url)
+            if repodata is None:
+                self._repodata_records[url] = None
+            else:
+                # only the match specs are kept, the repodata can be hundreds of MB
+                self._repodata_records[url] = {
+                    file_name: dict(
+                        depends=record.get("depends", []),
+                        constrains=record.get("constrains", []),
+                    )
+                    for key in ("packages", "packages.conda")
+                    for file_name, record in repodata.get(key, {}).items()
+                }
+        return self._repodata_records[url]
+
+    def _find(self, package: LockedPackage, key: str) -> Optional[List[str]]:
+        index = find_package_index(package.file_name, self.pkgs_dirs, self.prefixes)
+        if index is not None:
+            return index.get(key, [])
+        records = self._load_repodata_records(f"{package.channel}/{package.subdir}")
+        if records is None or package.file_name not in records:
+            return None
+        return records[package.file_name][key]
+
+    def __call__(self, package: LockedPackage) -> Optional[List[str]]:
+        return self._find(package, "depends")
+
+    def constrains(self, package: LockedPackage) -> Optional[List[str]]:
+        """
+        :return: the match specs the package constrains (the optional dependencies)
+        """
+        return self._find(package, "constrains")
+
+
+def find_floating_packages(
+    packages: Dict[str, LockedPackage],
+    names: Iterable[str],
+    get_depends: Callable[[LockedPackage], Optional[List[str]]],
+) -> Set[str]:
+    """
+    :param packages: locked packages of one platform by lower case name
+    :param names: packages to update
+    :return: the names of the packages to update plus the locked packages that depend
+        on them (directly or transitively), as they may need a new version too.
+        Packages whose dependencies are unknown are also returned, so the solve can succeed
+    """
+    dependents = defaultdict(set)
+    unknown = set()
+    for name, package in packages.items():
+        depends = get_depends(package)
+        if depends is None:
+            unknown.add(name)
+            continue
+        for depend in depends:
+            dependents[spec_name(depend)].add(name)
+
+    floating = set()
+    to_visit = [n.lower() for n in names]
+    while to_visit:
+        name = to_visit.pop()
+        if name in floating:
+            continue
+        floating.add(name)
+        to_visit.extend(dependents[name])
+
+    if len(unknown) > 0:
+        log.warning(
+            f"Dependencies of {len(unknown)} packages not found, they will be updated too"
+        )
+    return floating | unknown
+
+
+def build_platform_pins(
+    lock_index: LockIndex,
+    names: Iterable[str],
+    platforms: Iterable[str],
+    get_depends: Callable[[LockedPackage], Optional[List[str]]],
+) -> Dict[str, List[str]]:
+    """
+    :return: for each platform, the match specs pinning the locked packages
+        that do not need to be updated
+    """
+    names = list(names)
+    platform_pins = {}
+    for platform in platforms:
+        packages = lock_index.platform_packages.get(platform)
+        if packages is None:
+            # platforms that were never locked are solved from scratch
+            continue
+        floating = find_floating_packages(packages, names, get_depends)
+        platform_pins[platform] = [
+            f"{package.name}=={package.version}"
+            for name, package in sorted(packages.items())
+            if name not in floating
+        ]
+        log.info(
+            f"{platform}: updating {len(packages) - len(platform_pins[platform])}"
+            f" packages, {len(platform_pins[platform])} pinned"
+        )
+    return platform_pins
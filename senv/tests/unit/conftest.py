@@ -1,7 +1,132 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Dict, List, Tuple
+
 from pytest import fixture
 
 
 @fixture(autouse=True)
 def mock_normalize_pypi_name(mocker):
-    normalize = mocker.patch("conda_lock.src_parser.pyproject_toml.normalize_pypi_name")
-    normalize.side_effect = lambda name: name
+    mocker.patch("senv.pypi_names.pypi_to_conda_names", return_value={})
+
+
+@fixture(autouse=True)
+def tmp_pyproject_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr("senv.pyproject.PYPROJECT_CACHE_DIR", tmp_path / "cache")
+
+
+@fixture(autouse=True)
+def tmp_senv_caches(tmp_path, monkeypatch):
+    # the tests never read or write the caches of the user
+    caches_path = tmp_path / "senv_caches"
+    for cache_env, cache_path in (
+        ("SENV_ACTIVATION_CACHE_PATH", caches_path / "activation"),
+        ("SENV_BUILD_CACHE_PATH", caches_path / "builds"),
+        ("SENV_EXECUTABLE_CACHE_PATH", caches_path / "executables.json"),
+        ("SENV_PYPI_NAMES_CACHE_PATH", caches_path / "pypi_to_conda_names.json"),
+        ("SENV_REPODATA_CACHE_PATH", caches_path / "repodata"),
+        ("SENV_SOLVE_CACHE_PATH", caches_path / "solves"),
+    ):
+        monkeypatch.setenv(cache_env, str(cache_path))
+
+
+class FakeHttpServer:
+    """
+    In memory http file server (GET, HEAD and PUT) standing in for the conda channels
+    and the remote caches. Every request is recorded as (method, path, headers)
+    """
+
+    def __init__(self):
+        self.files: Dict[str, bytes] = {}
+        # ETag of the files that support conditional requests
+        self.etags: Dict[str, str] = {}
+        # number of transient errors (503) returned before a (method, path) works
+        self.failures: Dict[Tuple[str, str], int] = {}
+        # status returned by a path instead of its content (e.g. 401)
+        self.statuses: Dict[str, int] = {}
+        self.requests: List[Tuple[str, str, Dict[str, str]]] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def requests_headers(self, method: str = "GET") -> List[Dict[str, str]]:
+        return [headers for m, _, headers in self.requests if m == method]
+
+    def _handler_class(self):
+        server = self
+
+        class FakeHttpHandler(BaseHTTPRequestHandler):
+            def _start(self) -> bool:
+                server.requests.append((self.command, self.path, dict(self.headers)))
+                if server.failures.get((self.command, self.path), 0) > 0:
+                    server.failures[(self.command, self.path)] -= 1
+                    self.send_response(503)
+                    self.end_headers()
+                    return False
+                return True
+
+            def _send_file(self, with_body: bool):
+                if not self._start():
+                    return
+                if self.path in server.statuses:
+                    self.send_response(server.statuses[self.path])
+                    self.end_headers()
+                    return
+                content = server.files.get(self.path)
+                if content is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                etag = server.etags.get(self.path)
+                if etag is not None and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                range_header = self.headers.get("Range")
+                if range_header:
+                    start = int(range_header.split("=")[1].rstrip("-"))
+                    content = content[start:]
+                    self.send_response(206)
+                else:
+                    self.send_response(200)
+                if etag is not None:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(content)
+
+            def do_GET(self):
+                self._send_file(with_body=True)
+
+            def do_HEAD(self):
+                self._send_file(with_body=False)
+
+            def do_PUT(self):
+                content = self.rfile.read(int(self.headers["Content-Length"]))
+                if not self._start():
+                    return
+                server.files[self.path] = content
+                self.send_response(201)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        return FakeHttpHandler
+
+    def __enter__(self) -> "FakeHttpServer":
+        Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@fixture()
+def http_server():
+    with FakeHttpServer() as server:
+        yield server
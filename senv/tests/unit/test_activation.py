@@ -0,0 +1,161 @@
+import json
+import os
+
+import pytest
+from pytest import fixture
+
+from senv.activation import Activation, ActivationCacheSettings, get_activation
+from senv.main import app
+from senv.tests.conftest import STATIC_PATH
+
+
+@fixture()
+def prefix(tmp_path):
+    prefix = tmp_path / "envs" / "my_env"
+    (prefix / "conda-meta").mkdir(parents=True)
+    (prefix / "conda-meta" / "history").write_text("==> 2021-10-01 <==\n")
+    return prefix
+
+
+@fixture()
+def settings(tmp_path):
+    return ActivationCacheSettings(PATH=tmp_path / "activation")
+
+
+@fixture()
+def conda_run(mocker, prefix):
+    def check_output(args, env):
+        activated_environ = dict(env, CONDA_PREFIX=str(prefix))
+        activated_environ["PATH"] = f"{prefix / 'bin'}{os.pathsep}{env['PATH']}"
+        return f"some conda message\n{json.dumps(activated_environ)}\n".encode()
+
+    return mocker.patch(
+        "senv.activation.subprocess.check_output", side_effect=check_output
+    )
+
+
+def test_activation_keeps_the_current_path_after_the_env_directories():
+    activation = Activation(
+        path_entries=["/env/bin"], set_vars={"CONDA_PREFIX": "/env"}, unset_vars=["A"]
+    )
+
+    environ = activation.apply({"PATH": f"/usr/bin{os.pathsep}/bin", "A": "1"})
+
+    assert environ == {
+        "PATH": os.pathsep.join(["/env/bin", "/usr/bin", "/bin"]),
+        "CONDA_PREFIX": "/env",
+    }
+
+
+def test_get_activation_is_cached_until_the_env_changes(
+    prefix, settings, conda_run, tmp_path
+):
+    activation = get_activation(tmp_path / "conda", prefix, settings)
+
+    assert activation.path_entries == [str(prefix / "bin")]
+    assert activation.set_vars == {"CONDA_PREFIX": str(prefix)}
+    assert get_activation(tmp_path / "conda", prefix, settings) == activation
+    assert conda_run.call_count == 1
+
+    history_path = prefix / "conda-meta" / "history"
+    history_stat = history_path.stat()
+    os.utime(history_path, ns=(history_stat.st_atime_ns, history_stat.st_mtime_ns + 1))
+    get_activation(tmp_path / "conda", prefix, settings)
+    assert conda_run.call_count == 2
+
+
+def test_activation_is_captured_from_a_deactivated_environ(
+    prefix, settings, conda_run, tmp_path, monkeypatch
+):
+    other_prefix = tmp_path / "envs" / "other_env"
+    path = [str(prefix / "bin"), str(other_prefix / "bin"), "/usr/bin"]
+    monkeypatch.setenv("PATH", os.pathsep.join(path))
+    monkeypatch.setenv("CONDA_PREFIX", str(other_prefix))
+    monkeypatch.setenv("CONDA_DEFAULT_ENV", "other_env")
+    monkeypatch.setenv("SHLVL", "2")
+
+    def check_output(args, env):
+        assert env["PATH"] == "/usr/bin"
+        assert "CONDA_DEFAULT_ENV" not in env and "SHLVL" not in env
+        activated_environ = dict(env, CONDA_PREFIX=str(prefix), SHLVL="1", _="python")
+        activated_environ["PATH"] = f"{prefix / 'bin'}{os.pathsep}{env['PATH']}"
+        return json.dumps(activated_environ).encode()
+
+    conda_run.side_effect = check_output
+    activation = get_activation(tmp_path / "conda", prefix, settings)
+
+    assert activation == Activation(
+        path_entries=[str(prefix / "bin")],
+        set_vars={"CONDA_PREFIX": str(prefix)},
+        unset_vars=[],
+    )
+
+
+def test_activation_records_the_variables_set_to_their_current_value(
+    prefix, settings, conda_run, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("JAVA_HOME", "/opt/java")
+
+    def check_output(args, env):
+        assert "JAVA_HOME" not in env
+        # the activation scripts of the env export the same JAVA_HOME
+        activated_environ = dict(env, CONDA_PREFIX=str(prefix), JAVA_HOME="/opt/java")
+        return json.dumps(activated_environ).encode()
+
+    conda_run.side_effect = check_output
+    activation = get_activation(tmp_path / "conda", prefix, settings)
+
+    assert activation.set_vars == {
+        "CONDA_PREFIX": str(prefix),
+        "JAVA_HOME": "/opt/java",
+    }
+    assert activation.apply({"JAVA_HOME": "/other"})["JAVA_HOME"] == "/opt/java"
+
+
+def test_env_run_executes_the_command_in_the_activated_env(
+    build_temp_pyproject, cli_runner, mocker, prefix
+):
+    pyproject_path = build_temp_pyproject(
+        STATIC_PATH / "with_conda_channels_pyproject.toml"
+    )
+    mocker.patch("senv.commands.env.get_env_prefix", return_value=prefix)
+    mocker.patch(
+        "senv.activation.get_activation",
+        return_value=Activation([str(prefix / "bin")], {"CONDA_PREFIX": "env"}, []),
+    )
+    execvpe = mocker.patch("senv.commands.env.os.execvpe")
+
+    result = cli_runner.invoke(
+        app,
+        ["env", "-f", str(pyproject_path), "run", "--", "pytest", "-x"],
+        catch_exceptions=False,
+    )
+
+    assert result.exit_code == 0, result.output
+    file, args, env = execvpe.call_args.args
+    assert (file, args) == ("pytest", ["pytest", "-x"])
+    assert env["CONDA_PREFIX"] == "env"
+    assert env["PATH"].startswith(str(prefix / "bin"))
+
+
+@pytest.mark.parametrize(
+    "error, exit_code", [(FileNotFoundError, 127), (PermissionError, 126)]
+)
+def test_env_run_fails_clearly_when_the_command_can_not_be_executed(
+    build_temp_pyproject, cli_runner, mocker, prefix, error, exit_code
+):
+    pyproject_path = build_temp_pyproject(
+        STATIC_PATH / "with_conda_channels_pyproject.toml"
+    )
+    mocker.patch("senv.commands.env.get_env_prefix", return_value=prefix)
+    mocker.patch(
+        "senv.activation.get_activation",
+        return_value=Activation([str(prefix / "bin")], {"CONDA_PREFIX": "env"}, []),
+    )
+    mocker.patch("senv.commands.env.os.execvpe", side_effect=error)
+
+    result = cli_runner.invoke(
+        app, ["env", "-f", str(pyproject_path), "run", "--", "pytest", "-x"]
+    )
+
+    assert result.exit_code == exit_code, result.output
@@ -0,0 +1,195 @@
+import hashlib
+import json
+from shutil import copytree
+
+from pytest import fixture
+
+from senv.build_cache import (
+    BuildCache,
+    BuildCacheSettings,
+    RemoteBuildCache,
+    build_cache_key,
+    cached_build,
+    package_source_files,
+)
+from senv.pyproject import PyProject
+from senv.tests.conftest import STATIC_PATH
+
+
+@fixture()
+def project(build_temp_pyproject):
+    pyproject_path = build_temp_pyproject(STATIC_PATH / "simple_pyproject.toml")
+    project_dir = pyproject_path.parent
+    (project_dir / "test_name" / "__pycache__").mkdir()
+    (project_dir / "test_name" / "__pycache__" / "main.cpython-39.pyc").write_text("")
+    (project_dir / "tests").mkdir()
+    (project_dir / "tests" / "test_main.py").write_text("")
+    return project_dir
+
+
+@fixture()
+def file_server(http_server):
+    return f"{http_server.url}/builds", http_server.files
+
+
+@fixture()
+def cache(tmp_path):
+    return BuildCache(BuildCacheSettings(PATH=tmp_path / "builds"))
+
+
+def _key(project_dir):
+    c = PyProject.read_toml(project_dir / "pyproject.toml")
+    return build_cache_key(
+        recipe=f"source: {project_dir.resolve()}",
+        source_root=project_dir,
+        source_files=package_source_files(c),
+        toolchain={},
+        python_version="3.9",
+    )
+
+
+def test_package_source_files_are_the_packaged_files(project):
+    c = PyProject.get()
+
+    assert package_source_files(c) == [
+        project / "pyproject.toml",
+        project / "test_name" / "main.py",
+    ]
+
+
+def test_build_cache_key_depends_on_the_sources_not_on_the_location(project, tmp_path):
+    key = _key(project)
+    other_checkout = copytree(project, tmp_path / "other_checkout")
+
+    assert _key(other_checkout) == key
+    (other_checkout / "tests" / "test_main.py").write_text("assert True")
+    assert _key(other_checkout) == key
+    (other_checkout / "test_name" / "main.py").write_text("print('bye')")
+    assert _key(other_checkout) != key
+
+
+def test_cached_build_reuses_the_artifacts_of_the_same_key(tmp_path, cache):
+    output_dir = tmp_path / "dist"
+    builds = []
+
+    def build():
+        builds.append(1)
+        (output_dir / "linux-64").mkdir(parents=True, exist_ok=True)
+        (output_dir / "linux-64" / "pkg-0.1.0-0.tar.bz2").write_text("artifact")
+
+    def run_build(key="key", force=False):
+        return cached_build(key, output_dir, ["*/pkg-0.1.0-*"], build, force, cache)
+
+    artifacts = run_build()
+    assert artifacts == [output_dir / "linux-64" / "pkg-0.1.0-0.tar.bz2"]
+    assert run_build() == artifacts
+    assert len(builds) == 1
+
+    run_build(key="other_key")
+    run_build(force=True)
+    assert len(builds) == 3
+
+    artifacts[0].write_text("modified artifact")
+    run_build()
+    assert len(builds) == 4
+
+
+def test_cached_build_shares_the_artifacts_through_the_remote_cache(
+    tmp_path, file_server
+):
+    url, files = file_server
+    builds = []
+
+    def run_build(machine):
+        output_dir = tmp_path / machine / "dist"
+
+        def build():
+            builds.append(machine)
+            (output_dir / "noarch").mkdir(parents=True, exist_ok=True)
+            (output_dir / "noarch" / "pkg-0.1.0-0.tar.bz2").write_text("artifact")
+
+        return cached_build(
+            "key",
+            output_dir,
+            ["*/pkg-0.1.0-*"],
+            build,
+            cache=BuildCache(BuildCacheSettings(PATH=tmp_path / machine / "cache")),
+            remote_cache=RemoteBuildCache(url),
+        )
+
+    run_build("machine_1")
+    assert set(files.keys()) == {
+        "/builds/key/noarch/pkg-0.1.0-0.tar.bz2",
+        "/builds/key/manifest.json",
+    }
+
+    artifacts = run_build("machine_2")
+    assert builds == ["machine_1"]
+    assert artifacts == [
+        tmp_path / "machine_2" / "dist" / "noarch" / "pkg-0.1.0-0.tar.bz2"
+    ]
+    assert artifacts[0].read_text() == "artifact"
+
+
+def test_remote_build_cache_ignores_corrupted_artifacts(tmp_path, file_server):
+    url, files = file_server
+    remote_cache = RemoteBuildCache(url)
+    artifact = tmp_path / "dist" / "noarch" / "pkg-0.1.0-0.tar.bz2"
+    artifact.parent.mkdir(parents=True)
+    artifact.write_text("artifact")
+    remote_cache.store("key", tmp_path / "dist", [artifact])
+    files["/builds/key/noarch/pkg-0.1.0-0.tar.bz2"] = b"corrupted"
+
+    assert remote_cache.fetch("key", tmp_path / "other_dist") is None
+    assert remote_cache.fetch("missing_key", tmp_path / "other_dist") is None
+    assert not (tmp_path / "other_dist" / "noarch" / "pkg-0.1.0-0.tar.bz2").exists()
+
+
+def test_remote_build_cache_rejects_artifacts_outside_of_the_output_dir(
+    tmp_path, file_server
+):
+    url, files = file_server
+    manifest = {
+        "artifacts": [{"path": "../evil.sh", "md5": hashlib.md5(b"evil").hexdigest()}]
+    }
+    files["/builds/key/manifest.json"] = json.dumps(manifest).encode()
+
+    assert RemoteBuildCache(url).fetch("key", tmp_path / "dist") is None
+    assert not (tmp_path / "evil.sh").exists()
+
+
+def test_remote_build_cache_does_not_log_the_credentials(tmp_path, file_server, caplog):
+    url, files = file_server
+    remote_cache = RemoteBuildCache(url.replace("://", "://user:secret@"))
+    artifact = tmp_path / "dist" / "noarch" / "pkg-0.1.0-0.tar.bz2"
+    artifact.parent.mkdir(parents=True)
+    artifact.write_text("artifact")
+    remote_cache.store("key", tmp_path / "dist", [artifact])
+    files["/builds/key/noarch/pkg-0.1.0-0.tar.bz2"] = b"corrupted"
+
+    assert remote_cache.fetch("key", tmp_path / "other_dist") is None
+    assert "does not match its manifest" in caplog.text
+    assert "secret" not in caplog.text
+
+
+def test_remote_build_cache_requests_have_timeouts(tmp_path, mocker):
+    session = mocker.Mock()
+    session.get.return_value.status_code = 404
+    remote_cache = RemoteBuildCache("https://cache.example.com", session)
+    artifact = tmp_path / "dist" / "pkg-0.1.0-0.tar.bz2"
+    artifact.parent.mkdir(parents=True)
+    artifact.write_text("artifact")
+
+    remote_cache.fetch("key", tmp_path / "other_dist")
+    remote_cache.store("key", tmp_path / "dist", [artifact])
+
+    calls = session.get.call_args_list + session.put.call_args_list
+    assert len(calls) == 3
+    assert all(c.kwargs.get("timeout") for c in calls)
+
+
+def test_remote_build_cache_is_not_used_offline(monkeypatch):
+    monkeypatch.setenv("SENV_OFFLINE", "1")
+    monkeypatch.setenv("SENV_BUILD_CACHE_URL", "https://cache.example.com")
+
+    assert RemoteBuildCache.from_config() is None
@@ -0,0 +1,53 @@
+from senv.conda_publish import tested_lock_closure
+
+CONDA_FORGE = "https://conda.anaconda.org/conda-forge"
+TAR_LINKS = [
+    f"{CONDA_FORGE}/linux-64/python-3.9.7-hb7a2778_1_cpython.tar.bz2#md5",
+    f"{CONDA_FORGE}/noarch/click-8.0.1-pyhd8ed1ab_0.tar.bz2#md5",
+    f"{CONDA_FORGE}/noarch/pytest-6.2.5-pyhd8ed1ab_0.tar.bz2#md5",
+]
+DEPENDS = {"python": [], "click": ["python >=3.6", "__unix"], "pytest": ["python"]}
+ARTIFACT_INDEX = {"name": "my_app", "depends": ["python >=3.9", "click >=8"]}
+
+
+class FakeDependsFinder:
+    def __init__(self, constrains=None):
+        self._constrains = constrains or {}
+
+    def __call__(self, package):
+        return DEPENDS[package.name]
+
+    def constrains(self, package):
+        return self._constrains.get(package.name, [])
+
+
+def test_tested_lock_closure_drops_the_packages_not_needed():
+    get_depends = FakeDependsFinder()
+
+    tar_links = tested_lock_closure(TAR_LINKS, ARTIFACT_INDEX, "linux-64", get_depends)
+
+    assert tar_links == TAR_LINKS[:2]
+
+
+def test_tested_lock_closure_is_none_when_a_version_is_not_satisfied():
+    artifact_index = dict(ARTIFACT_INDEX, depends=["python >=3.9", "click >=8.1"])
+    get_depends = FakeDependsFinder()
+
+    tar_links = tested_lock_closure(TAR_LINKS, artifact_index, "linux-64", get_depends)
+
+    assert tar_links is None
+
+
+def test_tested_lock_closure_is_none_when_a_constrains_is_not_satisfied():
+    get_depends = FakeDependsFinder(constrains={"click": ["python <3.9"]})
+
+    tar_links = tested_lock_closure(TAR_LINKS, ARTIFACT_INDEX, "linux-64", get_depends)
+
+    assert tar_links is None
+
+
+def test_tested_lock_closure_is_none_without_the_virtual_packages():
+    get_depends = FakeDependsFinder()
+
+    # click needs __unix
+    assert tested_lock_closure(TAR_LINKS, ARTIFACT_INDEX, "win-64", get_depends) is None
@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 from typing import Any, Dict
@@ -5,8 +6,9 @@ from typing import Any, Dict
 import pytest
 import toml
 
+import senv.pyproject
 from senv.errors import SenvBadConfiguration
-from senv.pyproject import BuildSystem, PyProject
+from senv.pyproject import BuildSystem, PyProject, _read_cached_pyproject
 from senv.utils import cd
 
 
@@ -179,3 +181,47 @@ def test_env_name_default_to_package_name():
     config_dict["tool"]["senv"]["env"] = {"name": "env_name"}
     config2 = PyProject(**config_dict)
     assert config2.env.name == "env_name"
+
+
+def test_combine_senv_and_poetry_does_not_modify_the_toml_dict():
+    config_dict = {
+        "tool": {
+            "poetry": {"name": "senv3", "version": "poetry1"},
+            "senv": {"version": "senv1"},
+        }
+    }
+    PyProject(**config_dict)
+    assert config_dict == {
+        "tool": {
+            "poetry": {"name": "senv3", "version": "poetry1"},
+            "senv": {"version": "senv1"},
+        }
+    }
+
+
+def test_read_toml_reuses_the_cached_pyproject_until_the_toml_changes(tmp_path, mocker):
+    toml_path = tmp_path / "pyproject.toml"
+    toml_path.write_text(toml.dumps({"tool": {"senv": {"name": "test_name"}}}))
+    toml_loads = mocker.spy(senv.pyproject._toml_parser, "loads")
+
+    assert PyProject.read_toml(toml_path).package_name == "test_name"
+    assert PyProject.read_toml(toml_path).package_name == "test_name"
+    assert toml_loads.call_count == 1
+    assert PyProject.get().config_path == toml_path.resolve()
+
+    toml_path.write_text(toml.dumps({"tool": {"senv": {"name": "new_name"}}}))
+    assert PyProject.read_toml(toml_path).package_name == "new_name"
+    assert toml_loads.call_count == 2
+
+
+def test_cached_pyproject_is_not_parsed_with_another_key(tmp_path, mocker):
+    toml_path = tmp_path / "pyproject.toml"
+    toml_path.write_text(toml.dumps({"tool": {"senv": {"name": "test_name"}}}))
+    PyProject.read_toml(toml_path)
+    (cache_path,) = senv.pyproject.PYPROJECT_CACHE_DIR.glob("*.json")
+    parse_obj = mocker.spy(PyProject, "parse_obj")
+
+    assert _read_cached_pyproject(cache_path, "another key") is None
+    assert parse_obj.call_count == 0
+    assert _read_cached_pyproject(cache_path, json.loads(cache_path.read_text())["key"])
+    assert parse_obj.call_count == 1
@@ -0,0 +1,59 @@
+import sys
+
+from pytest import fixture
+
+from senv.main import app
+from senv.tests.conftest import STATIC_PATH
+from senv.utils import spawn_detached
+
+
+@fixture()
+def pyproject_path(build_temp_pyproject):
+    return build_temp_pyproject(STATIC_PATH / "with_conda_channels_pyproject.toml")
+
+
+@fixture()
+def sync_mocks(mocker, tmp_path):
+    mocker.patch("senv.commands.env.get_current_platform", return_value="linux-64")
+    mocker.patch("senv.commands.env.get_env_prefix", return_value=tmp_path / "env")
+    mocker.patch("senv.commands.env._sync_existing_conda_env")
+    return dict(
+        lock=mocker.patch("senv.commands.env.lock"),
+        spawn_detached=mocker.patch("senv.commands.env.spawn_detached"),
+    )
+
+
+def test_spawn_detached_writes_the_output_in_the_log(tmp_path):
+    log_path = tmp_path / "logs" / "process.log"
+
+    process = spawn_detached([sys.executable, "-c", "print('hello')"], log_path)
+
+    assert process.wait(timeout=30) == 0
+    assert log_path.read_text().strip() == "hello"
+
+
+def test_sync_current_platform_first_locks_the_rest_in_background(
+    pyproject_path, cli_runner, sync_mocks
+):
+    result = cli_runner.invoke(
+        app,
+        ["env", "-f", str(pyproject_path), "sync", "--current-platform-first"],
+        catch_exceptions=False,
+    )
+
+    assert result.exit_code == 0, result.output
+    assert sync_mocks["lock"].call_args.kwargs["platforms"] == ["linux-64"]
+    background_args = sync_mocks["spawn_detached"].call_args.args[0]
+    assert background_args[1:4] == ["-m", "senv.main", "env"]
+    assert str(pyproject_path.resolve()) in background_args
+    assert "lock" in background_args
+
+
+def test_sync_locks_every_platform_by_default(pyproject_path, cli_runner, sync_mocks):
+    result = cli_runner.invoke(
+        app, ["env", "-f", str(pyproject_path), "sync"], catch_exceptions=False
+    )
+
+    assert result.exit_code == 0, result.output
+    assert len(sync_mocks["lock"].call_args.kwargs["platforms"]) == 3
+    sync_mocks["spawn_detached"].assert_not_called()
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+from pytest import fixture
+
+from senv.executable_cache import (
+    ExecutableCacheSettings,
+    clear_executable_cache,
+    resolve_executable,
+)
+
+
+@fixture()
+def settings(tmp_path):
+    clear_executable_cache()
+    yield ExecutableCacheSettings(PATH=tmp_path / "cache" / "executables.json")
+    clear_executable_cache()
+
+
+@fixture()
+def executable(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    exe = bin_dir / "conda"
+    exe.write_text("echo conda")
+    os.chmod(exe, 0o777)
+    monkeypatch.setenv("PATH", str(bin_dir))
+    return exe
+
+
+def test_resolve_executable_calls_finder_once_per_process(settings, executable):
+    calls = []
+
+    def finder():
+        calls.append(1)
+        return str(executable)
+
+    assert resolve_executable("conda", finder, settings) == executable
+    assert resolve_executable("conda", finder, settings) == executable
+    assert len(calls) == 1
+
+
+def test_resolve_executable_reuses_disk_cache_across_processes(settings, executable):
+    resolve_executable("conda", lambda: executable, settings)
+    clear_executable_cache()
+
+    def finder():
+        pytest.fail("the executable should be read from the disk cache")
+
+    assert resolve_executable("conda", finder, settings) == executable
+
+
+@pytest.mark.parametrize("change", ["executable", "path"])
+def test_resolve_executable_disk_cache_invalidation(
+    settings, executable, tmp_path, monkeypatch, change
+):
+    resolve_executable("conda", lambda: executable, settings)
+    clear_executable_cache()
+    if change == "executable":
+        stat = executable.stat()
+        os.utime(executable, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    else:
+        monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{executable.parent}")
+
+    calls = []
+
+    def finder():
+        calls.append(1)
+        return executable
+
+    assert resolve_executable("conda", finder, settings) == executable
+    assert len(calls) == 1
+
+
+def test_resolve_executable_does_not_store_missing_executables(settings):
+    assert resolve_executable("conda", lambda: None, settings) is None
+    assert not settings.PATH.exists()
@@ -0,0 +1,66 @@
+import json
+
+from pytest import fixture
+
+from senv.commands.env import _env_lock_source_hash
+from senv.lock_file import find_stale_lock_reasons
+from senv.main import app
+from senv.pyproject import PyProject
+from senv.tests.conftest import STATIC_PATH
+
+PLATFORMS = ["linux-64", "osx-64"]
+
+
+@fixture()
+def pyproject_path(build_temp_pyproject):
+    return build_temp_pyproject(STATIC_PATH / "with_conda_channels_pyproject.toml")
+
+
+def _write_lock(lock_path, source_hash, platforms=PLATFORMS):
+    lock_path.write_text(
+        json.dumps(
+            {
+                "metadata": {
+                    "package_name": "test_name",
+                    "entry_points": [],
+                    "source_hash": source_hash,
+                },
+                "platform_tar_links": {p: [] for p in platforms},
+            }
+        )
+    )
+
+
+def test_find_stale_lock_reasons(tmp_path):
+    lock_path = tmp_path / "conda_env.lock.json"
+    assert len(find_stale_lock_reasons(lock_path, "hash", PLATFORMS)) == 1
+
+    _write_lock(lock_path, "hash")
+    assert find_stale_lock_reasons(lock_path, "hash", PLATFORMS) == []
+    assert len(find_stale_lock_reasons(lock_path, "other_hash", PLATFORMS)) == 1
+    assert find_stale_lock_reasons(lock_path, "hash", PLATFORMS + ["win-64"]) == [
+        "Platforms not locked: win-64"
+    ]
+
+    _write_lock(lock_path, None)
+    assert len(find_stale_lock_reasons(lock_path, "hash", PLATFORMS)) == 1
+
+
+def test_env_lock_check_fails_when_the_dependencies_change(pyproject_path, cli_runner):
+    lock_path = PyProject.get().env.conda_lock_path
+    if not lock_path.is_absolute():
+        lock_path = pyproject_path.parent / lock_path
+    _write_lock(lock_path, _env_lock_source_hash())
+    check_args = ["env", "-f", str(pyproject_path), "lock", "--check"]
+    check_args += [arg for p in PLATFORMS for arg in ("--platforms", p)]
+
+    result = cli_runner.invoke(app, check_args)
+    assert result.exit_code == 0, result.output
+
+    pyproject_path.write_text(
+        pyproject_path.read_text().replace(
+            "[tool.poetry.dependencies]", '[tool.poetry.dependencies]\nnumpy = "*"'
+        )
+    )
+    result = cli_runner.invoke(app, check_args)
+    assert result.exit_code == 1, result.output
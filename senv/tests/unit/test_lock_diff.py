@@ -0,0 +1,84 @@
+import json
+
+from senv.lock_diff import ChangeKind, PackageChange, diff_lock_indexes
+from senv.lock_index import LockIndex
+
+CONDA_FORGE = "https://conda.anaconda.org/conda-forge"
+
+
+def _lock_index(platform_packages):
+    return LockIndex(
+        {
+            platform: [f"{CONDA_FORGE}/{platform}/{p}.tar.bz2#md5" for p in packages]
+            for platform, packages in platform_packages.items()
+        }
+    )
+
+
+def test_diff_lock_indexes_classifies_the_changes_of_every_platform():
+    old = _lock_index(
+        {
+            "linux-64": ["python-3.9.9-h1_0", "click-7.1.2-py_0", "numpy-1.21-h1_0"],
+            "osx-64": ["python-3.9.9-h2_0", "click-7.1.2-py_0", "numpy-1.20-h2_0"],
+        }
+    )
+    new = _lock_index(
+        {
+            "linux-64": ["python-3.9.10-h1_0", "click-7.1.2-py_1", "numpy-1.20-h1_0"],
+            "osx-64": ["python-3.9.10-h2_0", "click-7.1.2-py_1", "six-1.16-py_0"],
+            "win-64": ["python-3.9.10-h3_0"],
+        }
+    )
+
+    lock_diff = diff_lock_indexes(old, new)
+
+    assert lock_diff.all_platforms == [
+        PackageChange(ChangeKind.REBUILT, "click", "7.1.2", "7.1.2", "py_0", "py_1"),
+        PackageChange(ChangeKind.UPGRADED, "python", "3.9.9", "3.9.10"),
+    ]
+    assert lock_diff.platforms == {
+        "linux-64": [
+            PackageChange(
+                ChangeKind.DOWNGRADED, "numpy", "1.21", "1.20", "h1_0", "h1_0"
+            )
+        ],
+        "osx-64": [
+            PackageChange(
+                ChangeKind.REMOVED, "numpy", old_version="1.20", old_build="h2_0"
+            ),
+            PackageChange(
+                ChangeKind.ADDED, "six", new_version="1.16", new_build="py_0"
+            ),
+        ],
+    }
+    assert lock_diff.added_platforms == ["win-64"]
+    assert lock_diff.removed_platforms == []
+
+
+def test_lock_diff_command_json(tmp_path, cli_runner):
+    old_lock, new_lock = tmp_path / "old.lock.json", tmp_path / "new.lock.json"
+    for lock_path, version in [(old_lock, "7.1.2"), (new_lock, "8.0.1")]:
+        lock_path.write_text(
+            json.dumps(
+                {
+                    "metadata": {"package_name": "senv", "entry_points": []},
+                    "platform_tar_links": {
+                        "linux-64": [
+                            f"{CONDA_FORGE}/noarch/click-{version}-py_0.tar.bz2#md5"
+                        ]
+                    },
+                }
+            )
+        )
+    from senv.main import app
+
+    result = cli_runner.invoke(
+        app,
+        ["lock", "-f", str(tmp_path / "pyproject.toml")]
+        + ["diff", str(old_lock), str(new_lock), "--json"],
+    )
+
+    assert result.exit_code == 0, result.output
+    changes = json.loads(result.stdout)["platforms"]["linux-64"]
+    assert changes[0]["kind"] == "upgraded"
+    assert changes[0]["new_version"] == "8.0.1"
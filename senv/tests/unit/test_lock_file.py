@@ -0,0 +1,113 @@
+import json
+
+import pytest
+
+from senv.errors import SenvPlatformNotInLockFile
+from senv.lock_file import (
+    LockFormat,
+    convert_lock_file,
+    decode_compact_lock,
+    encode_compact_lock,
+    is_compact_lock,
+    load_lock_dict,
+    read_combined_lock,
+    read_platform_tar_links,
+    write_combined_lock,
+)
+from senv.models import SenvCombinedCondaLock
+
+CLICK = "https://conda.anaconda.org/conda-forge/noarch/click-8.0.1-pyhd8ed1ab_0.tar.bz2#8c5f9f0ebd0e4e0d9b1e1fbbc8b6e24a"
+LOCK_DICT = {
+    "metadata": {
+        "package_name": "senv",
+        "entry_points": ["senv"],
+        "version": "0.1.0",
+        "created_at": "2022-01-09T04:47:49.099026",
+        "input_hashes": {"linux-64": "hash1", "osx-64": "hash2"},
+        "source_hash": "source_hash",
+    },
+    "platform_tar_links": {
+        "linux-64": [
+            "https://conda.anaconda.org/conda-forge/linux-64/python-3.9.7-hb7a2778_3_cpython.tar.bz2#a4d5a2e1ea8e31a2fc6c9f1a4c2f67f0",
+            CLICK,
+        ],
+        "osx-64": [
+            "https://repo.anaconda.com/pkgs/main/osx-64/python-3.9.7-h88f2d9e_1.tar.bz2",
+            CLICK,
+        ],
+    },
+}
+
+
+def test_compact_lock_stores_shared_packages_and_channels_once():
+    compact_lock = encode_compact_lock(LOCK_DICT)
+
+    assert compact_lock["channels"] == [
+        "https://conda.anaconda.org/conda-forge",
+        "https://repo.anaconda.com/pkgs/main",
+    ]
+    assert len(compact_lock["packages"]) == 3
+    assert compact_lock["platforms"] == {"linux-64": [0, 1], "osx-64": [2, 1]}
+
+
+@pytest.mark.parametrize("lock_format", [LockFormat.JSON, LockFormat.COMPACT])
+def test_write_and_read_combined_lock_is_lossless(tmp_path, lock_format):
+    lock_path = tmp_path / "conda_env.lock.json"
+    write_combined_lock(
+        SenvCombinedCondaLock.parse_obj(LOCK_DICT), lock_path, lock_format
+    )
+
+    assert is_compact_lock(json.loads(lock_path.read_text())) == (
+        lock_format == LockFormat.COMPACT
+    )
+    assert load_lock_dict(lock_path) == LOCK_DICT
+    assert read_combined_lock(lock_path).metadata.input_hashes == {
+        "linux-64": "hash1",
+        "osx-64": "hash2",
+    }
+
+
+def test_compact_lock_keeps_values_that_are_not_lowercase_md5s():
+    tar_links = [
+        "https://conda.anaconda.org/conda-forge/noarch/a-1-0.tar.bz2#8C5F9F0EBD0E4E0D9B1E1FBBC8B6E24A",
+        "https://conda.anaconda.org/conda-forge/noarch/b-1-0.tar.bz2#jF-fDr0OTg2bHh-7yLbiSg",
+    ]
+    lock_dict = {"metadata": {}, "platform_tar_links": {"linux-64": tar_links}}
+
+    assert decode_compact_lock(encode_compact_lock(lock_dict)) == lock_dict
+
+
+def test_lock_format_is_inferred_from_the_extension(tmp_path):
+    json_path = tmp_path / "conda_env.lock.json"
+    json_path.write_text(json.dumps(LOCK_DICT))
+    compact_path = tmp_path / "conda_env.lock.compact.json"
+
+    convert_lock_file(json_path, compact_path)
+    assert is_compact_lock(json.loads(compact_path.read_text()))
+
+    convert_lock_file(compact_path, tmp_path / "back.lock.json")
+    assert json.loads((tmp_path / "back.lock.json").read_text()) == LOCK_DICT
+
+
+@pytest.mark.parametrize("lock_format", [LockFormat.JSON, LockFormat.COMPACT])
+def test_read_platform_tar_links(tmp_path, lock_format):
+    lock_path = tmp_path / "conda_env.lock.json"
+    write_combined_lock(
+        SenvCombinedCondaLock.parse_obj(LOCK_DICT), lock_path, lock_format
+    )
+
+    for platform, tar_links in LOCK_DICT["platform_tar_links"].items():
+        assert read_platform_tar_links(lock_path, platform) == tar_links
+    with pytest.raises(SenvPlatformNotInLockFile):
+        read_platform_tar_links(lock_path, "win-64")
+
+
+def test_read_platform_tar_links_reads_the_lock_again_when_it_changes(tmp_path):
+    lock_path = tmp_path / "conda_env.lock.json"
+    lock_path.write_text(json.dumps(LOCK_DICT))
+    assert read_platform_tar_links(lock_path, "linux-64")[-1] == CLICK
+
+    lock_path.write_text(
+        json.dumps(dict(LOCK_DICT, platform_tar_links={"linux-64": [CLICK, CLICK]}))
+    )
+    assert read_platform_tar_links(lock_path, "linux-64") == [CLICK, CLICK]
@@ -0,0 +1,57 @@
+import json
+
+from senv.lock_index import LockIndex
+from senv.main import app
+
+LOCK_DICT = {
+    "metadata": {"package_name": "senv", "entry_points": []},
+    "platform_tar_links": {
+        "linux-64": [
+            "https://conda.anaconda.org/conda-forge/linux-64/python-3.9.7-hb7a2778_3_cpython.tar.bz2#a4d5",
+            "https://conda.anaconda.org/conda-forge/noarch/Click-8.0.1-pyhd8ed1ab_0.tar.bz2#8c5f",
+        ],
+        "osx-64": [
+            "https://repo.anaconda.com/pkgs/main/osx-64/python-3.9.6-h88f2d9e_1.tar.bz2#b1c2",
+        ],
+    },
+}
+
+
+def test_lock_index_query_returns_the_package_in_every_platform():
+    lock_index = LockIndex.from_lock_dict(LOCK_DICT)
+
+    python = lock_index.query("python")
+    assert python["linux-64"].version == "3.9.7"
+    assert python["linux-64"].build == "hb7a2778_3_cpython"
+    assert python["osx-64"].version == "3.9.6"
+    assert python["osx-64"].channel == "https://repo.anaconda.com/pkgs/main"
+    assert python["osx-64"].md5 == "b1c2"
+    assert list(lock_index.query("click").keys()) == ["linux-64"]
+    assert lock_index.get("click", "osx-64") is None
+
+
+def test_lock_query_command_json(tmp_path, cli_runner):
+    lock_path = tmp_path / "conda_env.lock.json"
+    lock_path.write_text(json.dumps(LOCK_DICT))
+
+    result = cli_runner.invoke(
+        app,
+        ["lock", "-f", str(tmp_path / "pyproject.toml")]
+        + ["query", "click", "-l", str(lock_path), "--json"],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert json.loads(result.stdout)["click"]["linux-64"]["version"] == "8.0.1"
+
+
+def test_lock_query_command_fails_if_the_package_is_not_locked(tmp_path, cli_runner):
+    lock_path = tmp_path / "conda_env.lock.json"
+    lock_path.write_text(json.dumps(LOCK_DICT))
+
+    result = cli_runner.invoke(
+        app,
+        ["lock", "-f", str(tmp_path / "pyproject.toml")]
+        + ["query", "numpy", "-l", str(lock_path)],
+    )
+
+    assert result.exit_code == 1
@@ -0,0 +1,144 @@
+from senv.noarch_projection import (
+    platform_specific_env_dict,
+    project_noarch_lock,
+    split_noarch_lock,
+)
+
+CONDA_FORGE = "https://conda.anaconda.org/conda-forge"
+DEPENDS = {
+    "python": ["openssl >=1.1.1", "pip"],
+    "openssl": ["ca-certificates"],
+    "ca-certificates": [],
+    "pip": ["python >=3.6", "setuptools"],
+    "setuptools": ["python >=3.6"],
+    "click": ["__unix", "python >=3.6"],
+    "pytz": ["python"],
+    "numpy": ["python >=3.9,<3.10.0a0"],
+}
+LINUX_TAR_LINKS = [
+    f"{CONDA_FORGE}/linux-64/ca-certificates-2021.5.30-ha878542_0.tar.bz2#md5",
+    f"{CONDA_FORGE}/linux-64/openssl-1.1.1k-h7f98852_0.tar.bz2#md5",
+    f"{CONDA_FORGE}/linux-64/python-3.9.7-hb7a2778_1_cpython.tar.bz2#md5",
+    f"{CONDA_FORGE}/noarch/setuptools-58.0.4-py39hf3d152e_0.tar.bz2#md5",
+    f"{CONDA_FORGE}/noarch/pip-21.2.4-pyhd8ed1ab_0.tar.bz2#md5",
+    f"{CONDA_FORGE}/noarch/click-8.0.1-pyhd8ed1ab_0.tar.bz2#md5",
+    f"{CONDA_FORGE}/noarch/pytz-2021.1-pyhd8ed1ab_0.tar.bz2#md5",
+]
+OSX_PYTHON_TAR_LINKS = [
+    f"{CONDA_FORGE}/osx-64/ca-certificates-2021.5.30-h033912b_0.tar.bz2#md5",
+    f"{CONDA_FORGE}/osx-64/openssl-1.1.1k-h0d85af4_0.tar.bz2#md5",
+    f"{CONDA_FORGE}/osx-64/python-3.9.7-h1248fe1_1_cpython.tar.bz2#md5",
+    f"{CONDA_FORGE}/noarch/setuptools-58.2.0-py39h6e9494a_0.tar.bz2#md5",
+    f"{CONDA_FORGE}/noarch/pip-21.3-pyhd8ed1ab_0.tar.bz2#md5",
+]
+
+
+def _get_depends(package):
+    return DEPENDS[package.name]
+
+
+def test_split_noarch_lock_when_only_the_python_closure_is_platform_specific():
+    split = split_noarch_lock(LINUX_TAR_LINKS, _get_depends)
+
+    assert split.python_version == "3.9.7"
+    assert split.platform_specific == {"python", "openssl", "ca-certificates"}
+    assert set(split.noarch_packages) == {"pip", "setuptools", "click", "pytz"}
+    assert split.noarch_depends["click"] == ["__unix", "python >=3.6"]
+    assert split.noarch_constrains["click"] == []
+
+
+def test_split_noarch_lock_is_none_with_other_platform_specific_packages():
+    tar_links = LINUX_TAR_LINKS + [
+        f"{CONDA_FORGE}/linux-64/numpy-1.21.2-py39hdbf815f_0.tar.bz2#md5"
+    ]
+
+    assert split_noarch_lock(tar_links, _get_depends) is None
+
+
+def test_split_noarch_lock_is_none_with_unknown_depends():
+    def get_depends(package):
+        return None if package.name == "pytz" else DEPENDS[package.name]
+
+    assert split_noarch_lock(LINUX_TAR_LINKS, get_depends) is None
+
+
+def test_platform_specific_env_dict_keeps_the_specs_of_the_platform_specific_packages():
+    split = split_noarch_lock(LINUX_TAR_LINKS, _get_depends)
+    env_dict = dict(
+        channels=["conda-forge"],
+        dependencies=["python 3.9.*", "openssl 1.1.*", "click", "pytz"],
+    )
+
+    assert platform_specific_env_dict(env_dict, split) == dict(
+        channels=["conda-forge"], dependencies=["python ==3.9.7", "openssl 1.1.*"]
+    )
+
+
+def test_project_noarch_lock_reuses_the_noarch_packages():
+    split = split_noarch_lock(LINUX_TAR_LINKS, _get_depends)
+
+    tar_links = project_noarch_lock(split, "osx-64", OSX_PYTHON_TAR_LINKS)
+
+    assert tar_links == OSX_PYTHON_TAR_LINKS[:3] + LINUX_TAR_LINKS[3:]
+
+
+def test_project_noarch_lock_is_none_when_a_virtual_package_is_missing():
+    split = split_noarch_lock(LINUX_TAR_LINKS, _get_depends)
+    win_python_tar_links = [
+        t.replace("/osx-64/", "/win-64/") for t in OSX_PYTHON_TAR_LINKS
+    ]
+
+    # click depends on __unix
+    assert project_noarch_lock(split, "win-64", win_python_tar_links) is None
+
+
+def test_project_noarch_lock_is_none_with_a_different_python_version():
+    split = split_noarch_lock(LINUX_TAR_LINKS, _get_depends)
+    tar_links = [t.replace("3.9.7", "3.9.6") for t in OSX_PYTHON_TAR_LINKS]
+
+    assert project_noarch_lock(split, "osx-64", tar_links) is None
+
+
+def test_project_noarch_lock_is_none_when_a_noarch_version_spec_is_not_satisfied():
+    depends = dict(DEPENDS, pytz=["python", "openssl >=3"])
+    split = split_noarch_lock(LINUX_TAR_LINKS, lambda p: depends[p.name])
+
+    assert split is not None
+    assert project_noarch_lock(split, "osx-64", OSX_PYTHON_TAR_LINKS) is None
+
+
+def test_project_noarch_lock_is_none_when_a_noarch_constrains_is_not_satisfied():
+    constrains = {"click": ["openssl <1.1.1k"]}
+    split = split_noarch_lock(
+        LINUX_TAR_LINKS, _get_depends, lambda p: constrains.get(p.name, [])
+    )
+
+    assert project_noarch_lock(split, "osx-64", OSX_PYTHON_TAR_LINKS) is None
+
+
+def test_project_noarch_lock_ignores_the_constrains_of_packages_not_in_the_lock():
+    constrains = {"click": ["colorama >=0.4"]}
+    split = split_noarch_lock(
+        LINUX_TAR_LINKS, _get_depends, lambda p: constrains.get(p.name, [])
+    )
+
+    tar_links = project_noarch_lock(split, "osx-64", OSX_PYTHON_TAR_LINKS)
+
+    assert tar_links == OSX_PYTHON_TAR_LINKS[:3] + LINUX_TAR_LINKS[3:]
+
+
+def test_project_noarch_lock_checks_the_platform_packages_against_the_noarch_ones():
+    split = split_noarch_lock(LINUX_TAR_LINKS, _get_depends)
+    osx_depends = dict(DEPENDS, python=["openssl >=1.1.1a,<1.1.2a", "pip"])
+
+    tar_links = project_noarch_lock(
+        split, "osx-64", OSX_PYTHON_TAR_LINKS, lambda p: osx_depends[p.name]
+    )
+    assert tar_links == OSX_PYTHON_TAR_LINKS[:3] + LINUX_TAR_LINKS[3:]
+
+    # the osx python was solved with pip 21.3, the projection uses pip 21.2.4
+    osx_depends["python"] = ["openssl >=1.1.1a,<1.1.2a", "pip >=21.3"]
+    tar_links = project_noarch_lock(
+        split, "osx-64", OSX_PYTHON_TAR_LINKS, lambda p: osx_depends[p.name]
+    )
+    assert tar_links is None
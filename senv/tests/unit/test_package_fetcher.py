@@ -0,0 +1,77 @@
+import hashlib
+import pytest
+from pytest import fixture
+
+from senv.errors import SenvChecksumMismatch, SenvOfflineMissingPackages
+from senv.package_fetcher import fetch_packages, is_package_cached
+
+PACKAGES = {
+    "noarch/click-8.0.1-pyhd8ed1ab_0.tar.bz2": b"click" * 1000,
+    "linux-64/python-3.8.0-h0_0.tar.bz2": b"python" * 1000,
+}
+
+
+@fixture()
+def fake_channel(http_server):
+    http_server.files.update(
+        {f"/{path}": content for path, content in PACKAGES.items()}
+    )
+    return http_server
+
+
+def _tar_links(channel_url):
+    return [
+        f"{channel_url}/{path}#{hashlib.md5(content).hexdigest()}"
+        for path, content in PACKAGES.items()
+    ]
+
+
+def test_fetch_downloads_missing_packages_and_skips_cached_ones(fake_channel, tmp_path):
+    channel_url = fake_channel.url
+    tar_links = _tar_links(channel_url)
+
+    summary = fetch_packages(tar_links, [tmp_path])
+
+    assert summary.downloaded == 2
+    assert (tmp_path / "click-8.0.1-pyhd8ed1ab_0.tar.bz2").read_bytes() == (
+        b"click" * 1000
+    )
+    assert all(is_package_cached(t, [tmp_path]) for t in tar_links)
+    assert channel_url in (tmp_path / "urls.txt").read_text()
+
+    summary = fetch_packages(tar_links, [tmp_path])
+    assert summary.downloaded == 0
+    assert summary.cached == 2
+
+
+def test_fetch_resumes_partial_downloads(fake_channel, tmp_path):
+    tar_link = _tar_links(fake_channel.url)[0]
+    (tmp_path / "click-8.0.1-pyhd8ed1ab_0.tar.bz2.partial").write_bytes(b"click" * 10)
+
+    summary = fetch_packages([tar_link], [tmp_path])
+
+    assert fake_channel.requests_headers()[0]["Range"] == "bytes=50-"
+    assert summary.downloaded_bytes == len(b"click" * 990)
+    assert (tmp_path / "click-8.0.1-pyhd8ed1ab_0.tar.bz2").read_bytes() == (
+        b"click" * 1000
+    )
+
+
+def test_fetch_raises_if_md5_does_not_match(fake_channel, tmp_path):
+    tar_link = f"{fake_channel.url}/noarch/click-8.0.1-pyhd8ed1ab_0.tar.bz2#wrong_md5"
+
+    with pytest.raises(SenvChecksumMismatch):
+        fetch_packages([tar_link], [tmp_path])
+
+    assert not (tmp_path / "click-8.0.1-pyhd8ed1ab_0.tar.bz2").exists()
+    assert not (tmp_path / "click-8.0.1-pyhd8ed1ab_0.tar.bz2.partial").exists()
+
+
+def test_fetch_in_offline_mode_lists_missing_packages(tmp_path, monkeypatch):
+    monkeypatch.setenv("SENV_OFFLINE", "1")
+    tar_links = _tar_links("http://127.0.0.1:1")
+
+    with pytest.raises(SenvOfflineMissingPackages) as e:
+        fetch_packages(tar_links, [tmp_path])
+
+    assert e.value.tar_links == tar_links
@@ -0,0 +1,145 @@
+import io
+import json
+import tarfile
+
+import pytest
+
+from senv.package_metadata import (
+    compare_versions,
+    diff_installed_records,
+    find_package_index,
+    read_tarball_index,
+    resolve_dependency_closure,
+    spec_matches,
+)
+
+DEPENDS = {
+    "python": ["openssl >=1.1"],
+    "openssl": [],
+    "click": ["python >=3.6", "__unix"],
+    "pytest": ["python >=3.6"],
+}
+
+
+def _build_conda_tarball(tar_path, index):
+    index_bytes = json.dumps(index).encode()
+    with tarfile.open(tar_path, "w:bz2") as tar:
+        info = tarfile.TarInfo("info/index.json")
+        info.size = len(index_bytes)
+        tar.addfile(info, io.BytesIO(index_bytes))
+
+
+def test_dependency_closure_drops_packages_not_required():
+    closure = resolve_dependency_closure(
+        ["click >=7"], set(DEPENDS.keys()), DEPENDS.get
+    )
+    assert closure == {"click", "python", "openssl"}
+
+
+def test_dependency_closure_is_none_if_a_dependency_is_missing():
+    closure = resolve_dependency_closure(
+        ["click >=7", "requests"], set(DEPENDS.keys()), DEPENDS.get
+    )
+    assert closure is None
+
+
+def test_dependency_closure_is_none_if_metadata_is_unknown():
+    closure = resolve_dependency_closure(
+        ["click >=7"], set(DEPENDS.keys()), lambda name: None
+    )
+    assert closure is None
+
+
+def test_package_index_is_found_in_package_cache_tarballs(tmp_path):
+    tar_path = tmp_path / "click-8.0.1-pyhd8ed1ab_0.tar.bz2"
+    _build_conda_tarball(tar_path, {"name": "click", "depends": ["python >=3.6"]})
+
+    assert read_tarball_index(tar_path)["name"] == "click"
+    index = find_package_index(tar_path.name, pkgs_dirs=[tmp_path])
+    assert index["depends"] == ["python >=3.6"]
+    assert find_package_index("pytest-6.2.5-py_0.tar.bz2", [tmp_path]) is None
+
+
+def test_package_index_prefers_installed_records(tmp_path):
+    (tmp_path / "env" / "conda-meta").mkdir(parents=True)
+    (tmp_path / "env" / "conda-meta" / "click-8.0.1-pyhd8ed1ab_0.json").write_text(
+        json.dumps({"name": "click", "depends": []})
+    )
+    index = find_package_index(
+        "click-8.0.1-pyhd8ed1ab_0.tar.bz2",
+        pkgs_dirs=[tmp_path / "pkgs"],
+        prefixes=[tmp_path / "env"],
+    )
+    assert index["depends"] == []
+
+
+def test_diff_installed_records_only_returns_the_changes():
+    installed_records = {
+        "click-7.1.2-pyh9f0ad1d_0": {"name": "click", "md5": "a"},
+        "python-3.8.0-h0_0": {"name": "python", "md5": "b"},
+        "pytest-6.2.5-py_0": {"name": "pytest", "md5": "c"},
+    }
+    tar_links = [
+        "https://conda.anaconda.org/conda-forge/noarch/click-8.0.1-pyhd8ed1ab_0.tar.bz2#d",
+        "https://conda.anaconda.org/conda-forge/linux-64/python-3.8.0-h0_0.tar.bz2#b",
+        "https://conda.anaconda.org/conda-forge/noarch/appdirs-1.4.4-py_0.tar.bz2#e",
+    ]
+
+    to_remove, to_install = diff_installed_records(installed_records, tar_links)
+
+    assert to_remove == ["click", "pytest"]
+    assert to_install == [tar_links[0], tar_links[2]]
+
+
+def test_diff_installed_records_is_empty_when_env_is_in_sync():
+    installed_records = {"python-3.8.0-h0_0": {"name": "python", "md5": "b"}}
+    tar_links = [
+        "https://conda.anaconda.org/conda-forge/linux-64/python-3.8.0-h0_0.tar.bz2#b"
+    ]
+    assert diff_installed_records(installed_records, tar_links) == ([], [])
+
+
+@pytest.mark.parametrize(
+    "spec, version, build, expected",
+    [
+        ("python", "3.9.7", "h_0", True),
+        ("python 3.9.*", "3.9.7", "h_0", True),
+        ("python 3.9", "3.10.1", "h_0", False),
+        ("python >=3.9,<3.10.0a0", "3.10.0rc1", "h_0", False),
+        ("python >=3.9,<3.10.0a0", "3.9.12", "h_0", True),
+        ("openssl >=1.1.1a,<1.1.2a", "1.1.1k", "h_0", True),
+        ("openssl >=3", "1.1.1k", "h_0", False),
+        ("openssl !=1.1.1k", "1.1.1k", "h_0", False),
+        ("click ~=8.0.1", "8.0.3", "py_0", True),
+        ("click ~=8.0.1", "8.1.0", "py_0", False),
+        ("numpy 1.20.*|>=1.22", "1.22.3", "py39_0", True),
+        ("numpy ==1.21.2", "1.21.2.0", "py39_0", True),
+        ("python_abi 3.9.* *_cp39", "3.9", "2_cp39", True),
+        ("python_abi 3.9.* *_cp39", "3.9", "2_pypy39_pp73", False),
+        ("numpy 2!1.0", "1.0", "py39_0", False),
+        ("numpy [version='>=1']", "1.0", "py39_0", None),
+        ("numpy >=1.0,(<2|>3)", "1.0", "py39_0", None),
+    ],
+)
+def test_spec_matches(spec, version, build, expected):
+    assert spec_matches(spec, version, build) is expected
+
+
+@pytest.mark.parametrize(
+    "a, b, expected",
+    [
+        ("1.10.0", "1.9.2", 1),
+        ("1.1.1l", "1.1.1k", 1),
+        ("2.0.0", "2.0", 0),
+        ("1.0.0rc1", "1.0.0", -1),
+        # examples of the conda version ordering documentation
+        ("1.1dev1", "1.1a1", -1),
+        ("1.1a1", "1.1.0dev1", -1),
+        ("1.1.0dev1", "1.1.0a1", -1),
+        ("1.1.0", "1.1.0post1", -1),
+        ("1!1.0", "2.0", 1),
+    ],
+)
+def test_compare_versions(a, b, expected):
+    assert compare_versions(a, b) == expected
+    assert compare_versions(b, a) == -expected
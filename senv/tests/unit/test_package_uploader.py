@@ -0,0 +1,36 @@
+from pytest import fixture
+
+from senv.package_uploader import upload_packages
+
+
+@fixture()
+def fake_channel(http_server):
+    http_server.files["/linux-64/pkg-0.1.0-py39_0.tar.bz2"] = b"published"
+    # transient error, the upload is retried
+    http_server.failures[("PUT", "/noarch/pkg-0.1.0-py_0.tar.bz2")] = 1
+    return http_server
+
+
+def test_upload_packages_uploads_the_missing_packages(fake_channel, tmp_path):
+    files = fake_channel.files
+    tar_paths = []
+    for subdir, build in [
+        ("linux-64", "py39_0"),
+        ("osx-64", "py39_0"),
+        ("noarch", "py_0"),
+    ]:
+        tar_path = tmp_path / subdir / f"pkg-0.1.0-{build}.tar.bz2"
+        tar_path.parent.mkdir()
+        tar_path.write_bytes(subdir.encode() * 100)
+        tar_paths.append(tar_path)
+
+    summary = upload_packages(tar_paths, fake_channel.url, "user", "password")
+
+    assert (summary.uploaded, summary.skipped) == (2, 1)
+    assert summary.uploaded_bytes == len(b"osx-64" * 100) + len(b"noarch" * 100)
+    assert files["/linux-64/pkg-0.1.0-py39_0.tar.bz2"] == b"published"
+    assert files["/osx-64/pkg-0.1.0-py39_0.tar.bz2"] == b"osx-64" * 100
+    assert files["/noarch/pkg-0.1.0-py_0.tar.bz2"] == b"noarch" * 100
+    auth_headers = [h["Authorization"] for h in fake_channel.requests_headers("PUT")]
+    assert len(auth_headers) == 3
+    assert all(h.startswith("Basic ") for h in auth_headers)
@@ -0,0 +1,60 @@
+import json
+
+import yaml
+from requests import HTTPError
+from pytest import fixture, raises
+
+from senv.pypi_names import PypiNamesCacheSettings, pypi_to_conda_names
+
+MAPPING = {
+    "torch": {"conda_name": "pytorch", "pypi_name": "torch"},
+    "click": {"conda_name": "click", "pypi_name": "click"},
+}
+
+
+@fixture()
+def names_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("SENV_PYPI_NAMES_CACHE_PATH", str(tmp_path / "names.json"))
+    pypi_to_conda_names.cache_clear()
+    yield PypiNamesCacheSettings().PATH
+    pypi_to_conda_names.cache_clear()
+
+
+@fixture()
+def mapping_server(http_server, monkeypatch):
+    http_server.files["/mapping.yaml"] = yaml.safe_dump(MAPPING).encode()
+    monkeypatch.setattr(
+        "conda_lock.src_parser.pyproject_toml.PYPI_TO_CONDA_NAME_LOOKUP",
+        f"{http_server.url}/mapping.yaml",
+    )
+    return http_server
+
+
+def test_pypi_to_conda_names_are_cached(names_cache, mapping_server):
+    assert pypi_to_conda_names() == {"torch": "pytorch", "click": "click"}
+    assert json.loads(names_cache.read_text()) == pypi_to_conda_names()
+
+    pypi_to_conda_names.cache_clear()
+    pypi_to_conda_names()
+    assert len(mapping_server.requests) == 1
+
+
+def test_pypi_to_conda_names_offline_does_not_use_the_network(
+    names_cache, mapping_server, monkeypatch
+):
+    monkeypatch.setenv("SENV_OFFLINE", "1")
+    assert pypi_to_conda_names() == {}
+
+    pypi_to_conda_names.cache_clear()
+    names_cache.write_text(json.dumps({"torch": "pytorch"}))
+    assert pypi_to_conda_names() == {"torch": "pytorch"}
+    assert len(mapping_server.requests) == 0
+
+
+def test_pypi_to_conda_names_fail_without_network_nor_cache(
+    names_cache, mapping_server
+):
+    mapping_server.statuses["/mapping.yaml"] = 404
+
+    with raises(HTTPError):
+        pypi_to_conda_names()
@@ -1,5 +1,17 @@
+from pathlib import Path
+
+import yaml
+from pytest import fixture
+
+from senv.models import SenvCombinedCondaLock, SenvLockFileMetaData
 from senv.pyproject import PyProject
-from senv.pyproject_to_conda import pyproject_to_conda_env_dict, pyproject_to_meta
+from senv.pyproject_to_conda import (
+    generate_combined_conda_lock_file,
+    get_unchanged_platform_tar_links,
+    pyproject_to_conda_env_dict,
+    pyproject_to_meta,
+    solve_input_hash,
+)
 from senv.tests.conftest import STATIC_PATH
 
 SIMPLE_PYPROJECT_TOML = STATIC_PATH / "simple_pyproject.toml"
@@ -57,3 +69,188 @@ def test_pyproject_to_conda_dev_env_dict_senv_overrides_values():
     env_dict = pyproject_to_conda_env_dict()
     assert len(env_dict["channels"]) == 2
     assert env_dict["name"] == "overridden_name"
+
+
+def test_solve_input_hash_ignores_specs_order_but_not_channels_order():
+    env_dict = dict(channels=["conda-forge", "defaults"], dependencies=["a >=1", "b"])
+    reordered_specs = dict(
+        channels=["conda-forge", "defaults"], dependencies=["b", "a  >=1"]
+    )
+    reordered_channels = dict(
+        channels=["defaults", "conda-forge"], dependencies=["a >=1", "b"]
+    )
+
+    assert solve_input_hash("linux-64", env_dict) == solve_input_hash(
+        "linux-64", reordered_specs
+    )
+    assert solve_input_hash("linux-64", env_dict) != solve_input_hash(
+        "linux-64", reordered_channels
+    )
+    assert solve_input_hash("linux-64", env_dict) != solve_input_hash(
+        "osx-64", env_dict
+    )
+
+
+def test_generate_combined_lock_does_not_solve_unchanged_platforms(tmp_path, mocker):
+    PyProject.read_toml(SIMPLE_PYPROJECT_TOML)
+    run_lock = mocker.patch("senv.pyproject_to_conda.run_lock")
+    env_dict = dict(channels=["conda-forge"], dependencies=["python 3.8"])
+    platform_tar_links = {"linux-64": ["linux_url"], "osx-64": ["osx_url"]}
+    previous_lock = SenvCombinedCondaLock(
+        metadata=SenvLockFileMetaData(
+            input_hashes={p: solve_input_hash(p, env_dict) for p in platform_tar_links}
+        ),
+        platform_tar_links=platform_tar_links,
+    )
+    lock_path = tmp_path / "conda_env.lock.json"
+    lock_path.write_text(previous_lock.json(indent=2))
+
+    combined_lock = generate_combined_conda_lock_file(
+        ["linux-64", "osx-64"], env_dict, base_lock_path=lock_path
+    )
+
+    run_lock.assert_not_called()
+    assert combined_lock.platform_tar_links == platform_tar_links
+    assert combined_lock.metadata.input_hashes == previous_lock.metadata.input_hashes
+
+
+def test_unchanged_platforms_are_detected_by_input_hash(tmp_path):
+    env_dict = dict(channels=["conda-forge"], dependencies=["python 3.8"])
+    previous_lock = SenvCombinedCondaLock(
+        metadata=SenvLockFileMetaData(
+            input_hashes={
+                "linux-64": solve_input_hash("linux-64", env_dict),
+                "osx-64": "outdated_hash",
+            }
+        ),
+        platform_tar_links={"linux-64": ["linux_url"], "osx-64": ["osx_url"]},
+    )
+    lock_path = tmp_path / "conda_env.lock.json"
+    lock_path.write_text(previous_lock.json(indent=2))
+
+    unchanged = get_unchanged_platform_tar_links(
+        lock_path,
+        {p: solve_input_hash(p, env_dict) for p in ["linux-64", "osx-64", "win-64"]},
+    )
+
+    assert unchanged == {"linux-64": ["linux_url"]}
+
+
+def test_generate_combined_lock_solves_with_the_platform_pins(
+    tmp_path, mocker, monkeypatch
+):
+    PyProject.read_toml(SIMPLE_PYPROJECT_TOML)
+    monkeypatch.setenv("SENV_SOLVE_CACHE_MAX_BYTES", "0")
+    mocker.patch("senv.pyproject_to_conda.warm_repodata_for_solves")
+    mocker.patch("senv.pyproject_to_conda.get_pkgs_dirs", return_value=[tmp_path])
+
+    def fake_run_lock(env_paths, platforms, **kwargs):
+        env_dict = yaml.safe_load(env_paths[0].read_text())
+        Path(f"conda-{platforms[0]}.lock").write_text(
+            "@EXPLICIT\n" + "\n".join(env_dict["dependencies"])
+        )
+
+    mocker.patch("senv.pyproject_to_conda.run_lock", side_effect=fake_run_lock)
+    env_dict = dict(channels=["conda-forge"], dependencies=["python 3.8"])
+
+    combined_lock = generate_combined_conda_lock_file(
+        ["linux-64", "osx-64"],
+        env_dict,
+        platform_pins={"linux-64": ["click==8.0.1"]},
+    )
+
+    assert combined_lock.platform_tar_links == {
+        "linux-64": ["python 3.8", "click==8.0.1"],
+        "osx-64": ["python 3.8"],
+    }
+    # the lock still satisfies the unpinned inputs
+    assert combined_lock.metadata.input_hashes == {
+        p: solve_input_hash(p, env_dict) for p in ["linux-64", "osx-64"]
+    }
+
+
+CONDA_FORGE = "https://conda.anaconda.org/conda-forge"
+CLICK = f"{CONDA_FORGE}/noarch/click-8.0.1-pyhd8ed1ab_0.tar.bz2#md5"
+
+
+@fixture()
+def projected_solves(tmp_path, mocker, monkeypatch):
+    """
+    Fake solves where click is noarch and python is published with the versions
+    of `python_versions` in each platform
+    :return: the versions of python by platform and the file with the solved specs
+    """
+    PyProject.read_toml(SIMPLE_PYPROJECT_TOML)
+    monkeypatch.setenv("SENV_SOLVE_CACHE_MAX_BYTES", "0")
+    mocker.patch("senv.pyproject_to_conda.warm_repodata_for_solves")
+    mocker.patch("senv.pyproject_to_conda.get_pkgs_dirs", return_value=[tmp_path])
+    mocker.patch(
+        "senv.pyproject_to_conda.get_current_platform", return_value="linux-64"
+    )
+    depends = {"python": [], "click": ["python"]}
+    mocker.patch(
+        "senv.pyproject_to_conda.LockedDependsFinder",
+        return_value=mocker.Mock(
+            side_effect=lambda package: depends[package.name],
+            constrains=lambda package: [],
+        ),
+    )
+    python_versions = {"linux-64": "3.9.7", "osx-64": "3.9.7"}
+    solves_path = tmp_path / "solves.txt"
+
+    def fake_run_lock(env_paths, platforms, **kwargs):
+        env_dict = yaml.safe_load(env_paths[0].read_text())
+        # the solves run in subprocesses
+        with solves_path.open("a") as f:
+            f.write(f"{platforms[0]}: {', '.join(env_dict['dependencies'])}\n")
+        python_version = python_versions[platforms[0]]
+        if "python ==" in env_dict["dependencies"][0]:
+            if env_dict["dependencies"][0] != f"python =={python_version}":
+                raise RuntimeError("unsatisfiable")
+        tar_links = [
+            f"{CONDA_FORGE}/{platforms[0]}/python-{python_version}-h_0.tar.bz2#md5"
+        ]
+        if "click" in env_dict["dependencies"]:
+            tar_links.append(CLICK)
+        Path(f"conda-{platforms[0]}.lock").write_text(
+            "@EXPLICIT\n" + "\n".join(tar_links)
+        )
+
+    mocker.patch("senv.pyproject_to_conda.run_lock", side_effect=fake_run_lock)
+    return python_versions, solves_path
+
+
+def test_generate_combined_lock_projects_the_noarch_packages(projected_solves):
+    _, solves_path = projected_solves
+    env_dict = dict(channels=["conda-forge"], dependencies=["python 3.9.*", "click"])
+
+    combined_lock = generate_combined_conda_lock_file(["osx-64", "linux-64"], env_dict)
+
+    assert solves_path.read_text().splitlines() == [
+        "linux-64: python 3.9.*, click",
+        "osx-64: python ==3.9.7",
+    ]
+    assert combined_lock.platform_tar_links == {
+        "osx-64": [f"{CONDA_FORGE}/osx-64/python-3.9.7-h_0.tar.bz2#md5", CLICK],
+        "linux-64": [f"{CONDA_FORGE}/linux-64/python-3.9.7-h_0.tar.bz2#md5", CLICK],
+    }
+
+
+def test_generate_combined_lock_fully_solves_the_platforms_without_the_same_python(
+    projected_solves,
+):
+    python_versions, solves_path = projected_solves
+    python_versions["osx-64"] = "3.9.6"
+    env_dict = dict(channels=["conda-forge"], dependencies=["python 3.9.*", "click"])
+
+    combined_lock = generate_combined_conda_lock_file(["osx-64", "linux-64"], env_dict)
+
+    assert solves_path.read_text().splitlines() == [
+        "linux-64: python 3.9.*, click",
+        "osx-64: python ==3.9.7",
+        "osx-64: python 3.9.*, click",
+    ]
+    assert combined_lock.platform_tar_links["osx-64"] == [
+        f"{CONDA_FORGE}/osx-64/python-3.9.6-h_0.tar.bz2#md5",
+        CLICK,
+    ]
@@ -0,0 +1,73 @@
+import shutil
+import subprocess
+
+import pytest
+
+from senv.activation import Activation, ActivationCacheSettings
+from senv.shell import activated_shell_command, activation_script
+
+ACTIVATION = Activation(
+    path_entries=["/envs/my env/bin"],
+    set_vars={"CONDA_PREFIX": "/envs/my env", "CONDA_PROMPT_MODIFIER": "(my_env) "},
+    unset_vars=["PYTHONHOME"],
+)
+
+
+def test_activation_script_for_bash():
+    assert activation_script(ACTIVATION, "bash").splitlines() == [
+        "unset PYTHONHOME",
+        "export CONDA_PREFIX='/envs/my env'",
+        "export CONDA_PROMPT_MODIFIER='(my_env) '",
+        "export PATH='/envs/my env/bin'\":$PATH\"",
+        'PS1="$CONDA_PROMPT_MODIFIER$PS1"',
+    ]
+
+
+def test_activation_script_for_fish():
+    assert activation_script(ACTIVATION, "fish").splitlines() == [
+        "set -e PYTHONHOME",
+        "set -gx CONDA_PREFIX '/envs/my env'",
+        "set -gx CONDA_PROMPT_MODIFIER '(my_env) '",
+        "set -gx PATH '/envs/my env/bin' $PATH",
+    ]
+
+
+def test_activated_shell_command_is_none_for_unsupported_shells(tmp_path):
+    settings = ActivationCacheSettings(PATH=tmp_path)
+    assert (
+        activated_shell_command("tcsh", "/bin/tcsh", ACTIVATION, {}, settings) is None
+    )
+
+
+def test_activated_zsh_loads_the_user_configuration(tmp_path):
+    settings = ActivationCacheSettings(PATH=tmp_path)
+
+    args, environ = activated_shell_command(
+        "zsh", "/bin/zsh", ACTIVATION, {"ZDOTDIR": "/home/me/zsh"}, settings
+    )
+
+    assert args == ["/bin/zsh", "-i"]
+    zshrc = (tmp_path / "scripts" / environ["ZDOTDIR"] / ".zshrc").read_text()
+    assert zshrc.startswith("ZDOTDIR=/home/me/zsh\n")
+    assert zshrc.endswith(activation_script(ACTIVATION, "zsh"))
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="bash is not installed")
+def test_activated_bash_applies_the_activation(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    settings = ActivationCacheSettings(PATH=tmp_path / "activation")
+    args, environ = activated_shell_command(
+        "bash", shutil.which("bash"), ACTIVATION, {"PATH": "/usr/bin:/bin"}, settings
+    )
+
+    output = subprocess.check_output(
+        args + ["-c", 'echo "$CONDA_PREFIX|$PATH"'],
+        env=environ,
+        stderr=subprocess.DEVNULL,
+    )
+
+    conda_prefix, path = output.decode().strip().split("|")
+    assert conda_prefix == "/envs/my env"
+    # the system configuration may add more directories to PATH
+    assert path.startswith("/envs/my env/bin:")
+    assert path.endswith(":/usr/bin:/bin")
@@ -0,0 +1,73 @@
+import os
+import time
+from pathlib import Path
+
+from pytest import fixture
+
+from senv.solve_cache import SolveCache, SolveCacheSettings
+
+
+@fixture()
+def solve_cache(tmp_path):
+    return SolveCache(SolveCacheSettings(PATH=tmp_path / "solves"))
+
+
+def test_solve_cache_returns_stored_tar_links(solve_cache):
+    assert solve_cache.get("key") is None
+    solve_cache.put("key", ["url1", "url2"])
+    assert solve_cache.get("key") == ["url1", "url2"]
+
+
+def test_solve_cache_expires_entries_older_than_ttl(solve_cache):
+    solve_cache.put("key", ["url1"])
+    solve_cache.settings.TTL = 0
+    time.sleep(0.01)
+    assert solve_cache.get("key") is None
+    assert not (solve_cache.settings.PATH / "key.json").exists()
+
+
+def test_solve_cache_evicts_least_recently_used_entries(solve_cache):
+    solve_cache.put("old", ["url1"])
+    solve_cache.put("new", ["url2"])
+    old_path = solve_cache.settings.PATH / "old.json"
+    new_path = solve_cache.settings.PATH / "new.json"
+    os.utime(old_path, (time.time() - 100, time.time() - 100))
+    # the size of the entries depends on their created_at, only one of them fits
+    entry_sizes = old_path.stat().st_size, new_path.stat().st_size
+    solve_cache.settings.MAX_BYTES = max(entry_sizes)
+
+    solve_cache.evict()
+
+    assert solve_cache.get("old") is None
+    assert solve_cache.get("new") == ["url2"]
+
+
+def test_solve_cache_with_no_budget_is_disabled(tmp_path):
+    solve_cache = SolveCache(SolveCacheSettings(PATH=tmp_path, MAX_BYTES=0))
+    solve_cache.put("key", ["url1"])
+    assert solve_cache.get("key") is None
+
+
+def test_solve_cache_errors_are_cache_misses(tmp_path):
+    not_a_dir = tmp_path / "file"
+    not_a_dir.write_text("")
+    solve_cache = SolveCache(SolveCacheSettings(PATH=not_a_dir))
+    solve_cache.put("key", ["url1"])
+    assert solve_cache.get("key") is None
+
+
+def test_solve_cache_tolerates_entries_removed_by_other_processes(solve_cache, mocker):
+    solve_cache.put("key", ["url1"])
+    solve_cache.settings.TTL = 0
+    time.sleep(0.01)
+    entry_path = solve_cache.settings.PATH / "key.json"
+    read_text = Path.read_text
+
+    def read_and_evict(self):
+        content = read_text(self)
+        self.unlink()
+        return content
+
+    mocker.patch.object(Path, "read_text", read_and_evict)
+    assert solve_cache.get("key") is None
+    assert not entry_path.exists()
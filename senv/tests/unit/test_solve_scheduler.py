@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from senv.errors import SenvSolveFailed, SenvSolveTimeout
+from senv.solve_scheduler import SolveScheduler, _terminate_solve_process
+
+
+def _touch(path: Path, delay: float = 0):
+    time.sleep(delay)
+    path.touch()
+
+
+def _spawn_solver(path: Path, delay: float):
+    # stands in for the conda process spawned by conda-lock
+    code = f"import time, pathlib; time.sleep({delay}); pathlib.Path({str(path)!r}).touch()"
+    subprocess.run([sys.executable, "-c", code])
+
+
+def _write_env(path: Path, name: str):
+    path.write_text(os.environ[name])
+
+
+def _fail():
+    raise RuntimeError("unsatisfiable")
+
+
+def test_scheduler_runs_all_the_solves(tmp_path):
+    scheduler = SolveScheduler(max_workers=2)
+    for platform in ["linux-64", "osx-64", "win-64"]:
+        scheduler.submit(platform, _touch, tmp_path / platform)
+
+    durations = scheduler.run()
+
+    assert set(durations.keys()) == {"linux-64", "osx-64", "win-64"}
+    assert all((tmp_path / p).exists() for p in durations)
+
+
+def test_scheduler_sets_the_env_only_in_the_solves(tmp_path):
+    scheduler = SolveScheduler(env={"SENV_TEST_SOLVE_ENV": "1"})
+    scheduler.submit("linux-64", _write_env, tmp_path / "env", "SENV_TEST_SOLVE_ENV")
+
+    scheduler.run()
+
+    assert (tmp_path / "env").read_text() == "1"
+    assert "SENV_TEST_SOLVE_ENV" not in os.environ
+
+
+def test_scheduler_raises_first_failure_and_cancels_the_rest(tmp_path):
+    scheduler = SolveScheduler(max_workers=2)
+    scheduler.submit("linux-64", _fail)
+    scheduler.submit("osx-64", _touch, tmp_path / "osx-64", delay=5)
+    scheduler.submit("win-64", _touch, tmp_path / "win-64")
+
+    start = time.monotonic()
+    with pytest.raises(SenvSolveFailed) as e:
+        scheduler.run()
+
+    assert time.monotonic() - start < 5
+    assert e.value.platform == "linux-64"
+    assert "unsatisfiable" in str(e.value)
+    assert not (tmp_path / "osx-64").exists()
+
+
+def test_scheduler_without_fail_fast_runs_the_other_solves(tmp_path):
+    scheduler = SolveScheduler(max_workers=2)
+    scheduler.submit("linux-64", _fail)
+    scheduler.submit("osx-64", _touch, tmp_path / "osx-64", delay=0.5)
+
+    durations = scheduler.run(fail_fast=False)
+
+    assert set(durations) == {"osx-64"}
+    assert set(scheduler.failures) == {"linux-64"}
+    assert "unsatisfiable" in str(scheduler.failures["linux-64"])
+    assert (tmp_path / "osx-64").exists()
+
+
+def test_scheduler_aborts_solves_exceeding_the_timeout(tmp_path):
+    scheduler = SolveScheduler(timeout=0.5)
+    scheduler.submit("linux-64", _touch, tmp_path / "linux-64", delay=5)
+
+    with pytest.raises(SenvSolveTimeout) as e:
+        scheduler.run()
+
+    assert e.value.platform == "linux-64"
+    assert not (tmp_path / "linux-64").exists()
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg"), reason="needs process groups")
+def test_scheduler_kills_the_processes_spawned_by_the_aborted_solves(tmp_path):
+    scheduler = SolveScheduler(timeout=0.5)
+    scheduler.submit("linux-64", _spawn_solver, tmp_path / "linux-64", delay=2)
+
+    with pytest.raises(SenvSolveTimeout):
+        scheduler.run()
+
+    time.sleep(3)
+    assert not (tmp_path / "linux-64").exists()
+
+
+def test_terminating_a_reaped_solve_does_not_kill_its_process_group(tmp_path, mocker):
+    process = multiprocessing.Process(target=_touch, args=(tmp_path / "done",))
+    process.start()
+    process.join()
+    killpg = mocker.patch("senv.solve_scheduler.os.killpg", create=True)
+
+    _terminate_solve_process(process)
+
+    assert killpg.call_count == 0
@@ -0,0 +1,25 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import senv
+
+HEAVY_MODULES = ["conda_lock", "ensureconda", "requests", "yaml", "pexpect", "poetry"]
+
+
+@pytest.mark.parametrize("module", HEAVY_MODULES)
+def test_cli_startup_does_not_import_heavy_modules(module):
+    modules = json.loads(
+        subprocess.check_output(
+            [
+                sys.executable,
+                "-c",
+                "import json, sys; import senv.main; print(json.dumps(list(sys.modules)))",
+            ],
+            cwd=Path(senv.__file__).parent.parent,
+        )
+    )
+    assert not any(m == module or m.startswith(f"{module}.") for m in modules)
@@ -0,0 +1,85 @@
+import gzip
+import json
+
+from senv.lock_index import LockIndex
+from senv.repodata_cache import RepodataCache, RepodataCacheSettings
+from senv.targeted_update import (
+    LockedDependsFinder,
+    build_platform_pins,
+    find_floating_packages,
+)
+
+CONDA_FORGE = "https://conda.anaconda.org/conda-forge"
+DEPENDS = {
+    "python": [],
+    "numpy": ["python >=3.8"],
+    "pandas": ["python >=3.8", "numpy >=1.20", "pytz"],
+    "pytz": ["python"],
+    "click": ["python"],
+}
+
+LOCK_INDEX = LockIndex(
+    {
+        "linux-64": [
+            f"{CONDA_FORGE}/linux-64/python-3.9.7-h1_0.tar.bz2#md5",
+            f"{CONDA_FORGE}/linux-64/numpy-1.21.0-py39_0.tar.bz2#md5",
+            f"{CONDA_FORGE}/linux-64/pandas-1.3.0-py39_0.tar.bz2#md5",
+            f"{CONDA_FORGE}/noarch/pytz-2021.1-py_0.tar.bz2#md5",
+            f"{CONDA_FORGE}/noarch/click-8.0.1-py_0.tar.bz2#md5",
+        ]
+    }
+)
+
+
+def _get_depends(package):
+    return DEPENDS[package.name]
+
+
+def test_find_floating_packages_includes_the_dependents():
+    packages = LOCK_INDEX.platform_packages["linux-64"]
+
+    assert find_floating_packages(packages, ["numpy"], _get_depends) == {
+        "numpy",
+        "pandas",
+    }
+    assert find_floating_packages(packages, ["click"], _get_depends) == {"click"}
+
+
+def test_find_floating_packages_updates_packages_with_unknown_depends():
+    packages = LOCK_INDEX.platform_packages["linux-64"]
+
+    def get_depends(package):
+        return None if package.name == "pytz" else DEPENDS[package.name]
+
+    assert find_floating_packages(packages, ["click"], get_depends) == {"click", "pytz"}
+
+
+def test_build_platform_pins_pins_the_packages_not_updated():
+    platform_pins = build_platform_pins(
+        LOCK_INDEX, ["numpy"], ["linux-64", "osx-64"], _get_depends
+    )
+
+    assert platform_pins == {
+        "linux-64": ["click==8.0.1", "python==3.9.7", "pytz==2021.1"]
+    }
+
+
+def test_locked_depends_finder_uses_the_repodata_cache(tmp_path):
+    cache = RepodataCache(RepodataCacheSettings(PATH=tmp_path / "repodata"))
+    repodata = {
+        "packages": {
+            "click-8.0.1-py_0.tar.bz2": {
+                "depends": ["python >=3.6"],
+                "constrains": ["colorama >=0.4"],
+            },
+        }
+    }
+    repodata_path, state_path = cache._paths(f"{CONDA_FORGE}/noarch")
+    repodata_path.parent.mkdir(parents=True)
+    repodata_path.write_bytes(gzip.compress(json.dumps(repodata).encode()))
+    state_path.write_text("{}")
+    get_depends = LockedDependsFinder([tmp_path / "pkgs"], [], cache)
+
+    click = LOCK_INDEX.get("click", "linux-64")
+    assert get_depends(click) == ["python >=3.6"]
+    assert get_depends.constrains(click) == ["colorama >=0.4"]
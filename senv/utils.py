@@ -1,10 +1,11 @@
 import contextlib
 import os
+import subprocess
 from pathlib import Path
 from sys import platform
 from tempfile import TemporaryDirectory
 from threading import Timer
-from typing import ContextManager
+from typing import ContextManager, Iterable, List, Union
 
 import typer
 from progress.spinner import PixelSpinner
@@ -78,6 +79,51 @@ def confirm(
     )
 
 
+def is_offline() -> bool:
+    return os.environ.get("SENV_OFFLINE", "").lower() in ("1", "true", "yes")
+
+
+def set_offline():
+    """
+    Offline mode is stored in the environment variables
+    so the solver processes and conda also run offline
+    """
+    os.environ["SENV_OFFLINE"] = "1"
+    os.environ["CONDA_OFFLINE"] = "true"
+
+
+def atomic_write(
+    path: Path, content: Union[str, bytes, Iterable[bytes]], best_effort: bool = False
+) -> bool:
+    """
+    Writes the file through a temporary file in the same directory,
+    so other senv processes never read a partially written file
+    :param content: the content, or its chunks to write big files without
+        keeping them in memory
+    :param best_effort: ignore the errors writing the file (e.g. for caches)
+    :return: if the file was written
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, str):
+            tmp_path.write_text(content)
+        elif isinstance(content, bytes):
+            tmp_path.write_bytes(content)
+        else:
+            with tmp_path.open("wb") as f:
+                for chunk in content:
+                    f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException as e:
+        with contextlib.suppress(OSError):
+            tmp_path.unlink()
+        if best_effort and isinstance(e, OSError):
+            return False
+        raise
+    return True
+
+
 def build_yes_option():
     return typer.Option(False, "--yes", "-y", help="Answer yes to all confirm prompts")
 
@@ -93,6 +139,27 @@ def get_current_platform() -> str:
         raise SenvNotSupportedPlatform(f"Platform {platform} not supported")
 
 
+def spawn_detached(args: List[str], log_path: Path) -> subprocess.Popen:
+    """
+    Starts a process that keeps running after senv exits
+    :param log_path: file where the stdout and stderr of the process are written
+    """
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    if platform == "win32":
+        flags = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+        detach_kwargs = dict(creationflags=flags)
+    else:
+        detach_kwargs = dict(start_new_session=True)
+    with log_path.open("w") as log_file:
+        return subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            **detach_kwargs,
+        )
+
+
 class MySpinner(PixelSpinner):
     def __init__(self, message="", **kwargs):
         super().__init__(message, **kwargs)